@@ -0,0 +1,196 @@
+"""Latency, throughput and queries per request for the orders API, as JSON to compare between commits.
+
+    python -m benchmarks.bench_api [--customers 1000] [--orders 100000] [--requests 500]
+                                   [--concurrency 1,20] [--scenarios create,list,retrieve]
+                                   [--mode wsgi|asgi] [--workers 2] [--gateway-latency 0.05]
+                                   [--output results.json] [--baseline previous.json]
+                                   [--database-url postgres://...]
+
+Seeds Customer/Order rows (the same rows for the same --seed), starts gunicorn
+against a stub SMS gateway and runs each scenario at each concurrency level:
+  create          POST /api/orders/ (/api/orders/async/ with --mode asgi)
+  list            GET /api/orders/?customer=<id>
+  retrieve        GET /api/orders/<id>/
+  customer_list   GET /api/customers/
+
+Queries per request are read from the server's /metrics (http_request_db_queries),
+so they count everything the request ran: authentication, throttling and the view.
+
+The JSON (stdout, or --output) records the commit, database and arguments with
+the results. Give an earlier file as --baseline to print the change per scenario.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.bench_order_queries import seed
+from benchmarks.common import scratch_database_url
+from benchmarks.load_test import BASE_DIR, SERVERS, create_order, free_port, prepare_database, run_level, start_server
+from orders_mgmt.tests.stub_gateway import StubGateway
+
+SCENARIOS = ('create', 'list', 'retrieve', 'customer_list')
+IGNORED_ROUTES = {'metrics'}
+METRICS_TOKEN = 'bench'  # the server's /metrics refuses scrapes without one
+
+
+def scenario_requests(name, create_path, customer_id, customer_ids, order_ids):
+    """(path, send) for a scenario; `send(client, url, i)` makes its i-th request."""
+    if name == 'create':
+        return create_path, create_order(customer_id)
+    if name == 'list':
+        return '/api/orders/', lambda client, url, i: client.get(url, params={'customer': customer_ids[i % len(customer_ids)]})
+    if name == 'retrieve':
+        return '/api/orders/', lambda client, url, i: client.get(f'{url}{order_ids[i % len(order_ids)]}/')
+    return '/api/customers/', lambda client, url, i: client.get(url)
+
+
+def query_totals(base_url):
+    """(queries, requests) recorded by the server so far, summed over routes."""
+    text = httpx.get(f'{base_url}/metrics', headers={'Authorization': f'Bearer {METRICS_TOKEN}'}, timeout=30).text
+    totals = {'sum': 0.0, 'count': 0.0}
+    for family in text_string_to_metric_families(text):
+        if family.name != 'http_request_db_queries':
+            continue
+        for sample in family.samples:
+            kind = sample.name.rsplit('_', 1)[-1]
+            if kind in totals and sample.labels.get('route') not in IGNORED_ROUTES:
+                totals[kind] += sample.value
+    return totals['sum'], totals['count']
+
+
+def measure(base_url, path, cookies, concurrency, total, send):
+    queries_before, requests_before = query_totals(base_url)
+    row = asyncio.run(run_level(f'{base_url}{path}', cookies, concurrency, total, send))
+    queries_after, requests_after = query_totals(base_url)
+    requests = requests_after - requests_before
+    row['queries_per_request'] = round((queries_after - queries_before) / requests, 2) if requests else None
+    return row
+
+
+def sample_ids(rng, ids, count):
+    return rng.sample(ids, min(count, len(ids)))
+
+
+def git_revision():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip()
+    return git('rev-parse', 'HEAD') or None, bool(git('status', '--porcelain', '--untracked-files=no'))
+
+
+def compare(results, baseline):
+    """Lines giving the change from `baseline` for each scenario and concurrency level in both."""
+    change = lambda new, old: f'{(new - old) / old * 100:+.1f}%' if new is not None and old else 'n/a'
+    lines = [f"vs {(baseline.get('commit') or 'unknown')[:12]}"]
+    lines.append(f"{'scenario':<14} {'concurrency':>11} {'rps':>10} {'p95':>10} {'queries':>13}")
+    for name, rows in results['results'].items():
+        previous = {row['concurrency']: row for row in baseline.get('results', {}).get(name, [])}
+        for row in rows:
+            old = previous.get(row['concurrency'])
+            if old is None:
+                continue
+            queries = f"{old['queries_per_request']} -> {row['queries_per_request']}"
+            lines.append(
+                f"{name:<14} {row['concurrency']:>11} {change(row['rps'], old['rps']):>10} "
+                f"{change(row['p95_ms'], old['p95_ms']):>10} {queries:>13}"
+            )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365, help='Spread seeded orders over this many days.')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario and concurrency level.')
+    parser.add_argument('--warmup', type=int, default=20, help='Unrecorded requests before each scenario.')
+    parser.add_argument('--concurrency', default='1,20')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--gateway-latency', type=float, default=0.05, help='Simulated SMS provider latency in seconds.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help='Defaults to a temporary SQLite file.')
+    parser.add_argument('--output', help='Write the JSON here instead of stdout.')
+    parser.add_argument('--baseline', help='JSON from an earlier run to compare against.')
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    commit, dirty = git_revision()
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    with scratch_database_url(args.database_url) as database_url, \
+            StubGateway(latency=args.gateway_latency) as gateway, \
+            tempfile.TemporaryDirectory() as metrics_dir:
+        env = dict(
+            os.environ,
+            DATABASE_URL=database_url,
+            AFRICASTALKING_MESSAGING_URL=gateway.url,
+            API_USER_THROTTLE_RATE='1000000/hour',
+            PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+            METRICS_TOKEN=METRICS_TOKEN,
+        )
+        # The runner's own process records nothing; only the server's workers write to metrics_dir
+        cookies, customer_id = prepare_database({k: v for k, v in env.items() if k != 'PROMETHEUS_MULTIPROC_DIR'})
+        from django.db import connection
+        from orders_mgmt.models import Customer, Order
+
+        random.seed(args.seed)
+        with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the JSON
+            seed(args.orders, args.customers, args.days)
+        rng = random.Random(args.seed)
+        customer_ids = sample_ids(rng, list(Customer.objects.values_list('id', flat=True)), args.requests)
+        order_ids = sample_ids(rng, list(Order.objects.values_list('id', flat=True)), args.requests)
+        vendor = connection.vendor
+        connection.close()
+
+        port = free_port()
+        server = start_server(args.mode, port, args.workers, env)
+        base_url = f'http://127.0.0.1:{port}'
+        results = {}
+        try:
+            for name in scenarios:
+                path, send = scenario_requests(name, SERVERS[args.mode][1], customer_id, customer_ids, order_ids)
+                if args.warmup:
+                    asyncio.run(run_level(f'{base_url}{path}', cookies, 1, args.warmup, send))
+                results[name] = [measure(base_url, path, cookies, level, args.requests, send) for level in levels]
+        finally:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'started_at': started_at,
+        'python': platform.python_version(),
+        'database': vendor,
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'database_url')},
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print('\n'.join(compare(report, baseline)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Per-message gateway latency: bare requests.post vs the pooled SMSGatewayClient.
+
+    python -m benchmarks.bench_gateway [--messages 500] [--latency 0.005] [--url URL]
+
+Without --url a local stub gateway is used, so the difference is the TCP
+connect per message. Against a real HTTPS endpoint the bare path also pays a
+TLS handshake per message.
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from orders_mgmt.gateway import SMSGatewayClient
+from orders_mgmt.tests.stub_gateway import StubGateway
+
+
+def bare_post(url):
+    # The pre-pool code path: new connection per call, no timeout.
+    headers = {'Accept': 'application/json', 'Content-Type': 'application/x-www-form-urlencoded', 'apiKey': 'key'}
+
+    def send(to, message):
+        return requests.post(url, headers=headers, data={'username': 'sandbox', 'to': to, 'message': message}).json()
+    return send
+
+
+def pooled_client(url):
+    return SMSGatewayClient(url=url, username='sandbox', api_key='key').send
+
+
+def measure(send, messages):
+    timings = []
+    for i in range(messages):
+        start = time.perf_counter()
+        send(f"+2547{i:08d}", "Hello, your order has been placed.")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summary(name, timings):
+    timings = sorted(timings)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'path': name,
+        'messages': len(timings),
+        'mean_ms': ms(statistics.mean(timings)),
+        'p50_ms': ms(timings[len(timings) // 2]),
+        'p95_ms': ms(timings[int(len(timings) * 0.95) - 1]),
+        'total_s': round(sum(timings), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated stub gateway latency in seconds.')
+    parser.add_argument('--url', help='Benchmark against this endpoint instead of the local stub.')
+    args = parser.parse_args()
+
+    def run(url):
+        results = [
+            summary('requests.post', measure(bare_post(url), args.messages)),
+            summary('SMSGatewayClient', measure(pooled_client(url), args.messages)),
+        ]
+        for result in results:
+            print('{path:>18}: mean {mean_ms}ms  p50 {p50_ms}ms  p95 {p95_ms}ms  total {total_s}s'.format(**result))
+
+    if args.url:
+        run(args.url)
+    else:
+        with StubGateway(latency=args.latency) as stub:
+            run(stub.url)
+            print(f"stub gateway accepted {stub.connections} connection(s) for {len(stub.requests)} request(s)")
+
+
+if __name__ == '__main__':
+    main()
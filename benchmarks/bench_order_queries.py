@@ -0,0 +1,90 @@
+"""Query plans and timings for the filtered order list on a seeded table.
+
+    python -m benchmarks.bench_order_queries [--rows 2000000] [--customers 20000] [--days 365]
+                                             [--database-url postgres://...] [--runs 20]
+
+Seeds Customer/Order rows (skipped when the table already has --rows orders),
+runs ANALYZE, then prints EXPLAIN output and median latency for the queries
+behind GET /api/orders/ with customer and time-range filters.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks.common import scratch_database_url, setup_django
+
+BATCH = 10000
+
+
+def seed(rows, customers, days):
+    from django.db import connection
+    from django.utils import timezone
+    from orders_mgmt.models import Customer, Order
+
+    if Order.objects.count() >= rows:
+        return
+    Customer.objects.bulk_create(
+        [Customer(name=f'Customer {i}', code=f'B{i:07d}', phone=f'+2547{i:08d}') for i in range(customers)],
+        batch_size=BATCH, ignore_conflicts=True,
+    )
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+    now = timezone.now()
+    span = days * 86400
+    started = time.perf_counter()
+    table = Order._meta.db_table
+    with connection.cursor() as cursor:
+        # Raw inserts: far quicker than bulk_create() for millions of rows
+        sql = f'INSERT INTO {table} (customer_id, item, quantity, time) VALUES (%s, %s, %s, %s)'
+        for start in range(0, rows, BATCH):
+            cursor.executemany(sql, [
+                (random.choice(customer_ids), f'item-{i % 50}', 1, now - timedelta(seconds=random.randrange(span)))
+                for i in range(start, min(start + BATCH, rows))
+            ])
+    print(f'seeded {rows} orders in {time.perf_counter() - started:.1f}s')
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def queries(days):
+    from django.utils import timezone
+    from orders_mgmt.models import Customer, Order
+
+    customer = Customer.objects.order_by('?').first()
+    since = timezone.now() - timedelta(days=min(days, 30))
+    newest = Order.objects.order_by('-time', '-id')
+    return {
+        'customer, last 30 days': newest.filter(customer=customer, time__gte=since),
+        'customer code, last 30 days': newest.filter(customer__code=customer.code, time__gte=since),
+        'all customers, last 30 days': newest.filter(time__gte=since),
+        'customer, all time': newest.filter(customer=customer),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--database-url', help='Defaults to a temporary SQLite file.')
+    args = parser.parse_args()
+
+    with scratch_database_url(args.database_url) as database_url:
+        setup_django(DATABASE_URL=database_url)
+        seed(args.rows, args.customers, args.days)
+        for name, queryset in queries(args.days).items():
+            page = queryset[:args.page_size]
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                list(page.all())  # fresh queryset, no result cache
+                timings.append(time.perf_counter() - start)
+            print(f'\n== {name}: median {statistics.median(timings) * 1000:.2f}ms over {args.runs} runs')
+            print(page.explain())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Rows/s for the order and customer list bodies: serializers vs values() + orjson.
+
+    python -m benchmarks.bench_serialization [--rows 100000] [--page-size 500] [--runs 5]
+                                             [--database-url postgres://...]
+
+Seeds --rows orders (see bench_order_queries.seed), then builds list pages of
+--page-size rows three ways, each from a fresh query:
+- serializer + JSONRenderer: what the list endpoints did before orjson;
+- serializer + orjson: ModelSerializer output rendered by ORJSONRenderer;
+- values + orjson: the FastListMixin path the list endpoints now take.
+All three produce the same bytes; that is checked before timing.
+"""
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.common import scratch_database_url, setup_django
+
+
+def pages(queryset, page_size):
+    # Offset slices stand in for cursor pages; every path runs the same queries
+    return [queryset[start:start + page_size] for start in range(0, queryset.count(), page_size)]
+
+
+def paths(viewset):
+    from rest_framework.renderers import JSONRenderer
+    from orders_mgmt.renderers import ORJSONRenderer
+
+    serializer_class = viewset.serializer_class
+    names, lookups = list(viewset.list_values), list(viewset.list_values.values())
+
+    def serialized(page):
+        return serializer_class(page, many=True).data
+
+    def values(page):
+        return [dict(zip(names, row.values())) for row in page.values(*lookups)]
+
+    return {
+        'serializer + JSONRenderer': lambda page: JSONRenderer().render(serialized(page)),
+        'serializer + orjson': lambda page: ORJSONRenderer().render(serialized(page)),
+        'values + orjson': lambda page: ORJSONRenderer().render(values(page)),
+    }
+
+
+def measure(endpoint, name, render, chunks, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for page in chunks:
+            render(page.all())
+        timings.append(time.perf_counter() - start)
+    rows = sum(len(page) for page in chunks)
+    return {
+        'endpoint': endpoint,
+        'path': name,
+        'rows': rows,
+        'rows_per_second': round(rows / statistics.median(timings)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    with scratch_database_url(args.database_url) as database_url:
+        setup_django(DATABASE_URL=database_url)
+        from benchmarks.bench_order_queries import seed
+        from orders_mgmt.models import Customer, Order
+        from orders_mgmt.views import CustomerViewSet, OrderViewSet
+
+        with contextlib.redirect_stdout(sys.stderr):
+            seed(args.rows, args.customers, days=365)
+        querysets = {
+            '/api/orders/': (OrderViewSet, Order.objects.annotate(delivery_status=OrderViewSet.delivery_status()).order_by('-time', '-id')),
+            '/api/customers/': (CustomerViewSet, Customer.objects.order_by('id')),
+        }
+        for endpoint, (viewset, queryset) in querysets.items():
+            chunks = pages(queryset, args.page_size)
+            renders = paths(viewset)
+            outputs = {render(chunks[0].all()) for render in renders.values()}
+            assert len(outputs) == 1, f'{endpoint}: the paths disagree'
+            for name, render in renders.items():
+                print(json.dumps(measure(endpoint, name, render, chunks, args.runs)))
+
+
+if __name__ == '__main__':
+    main()
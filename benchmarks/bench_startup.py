@@ -0,0 +1,91 @@
+"""Import time of process startup: django.setup() and the URLconf, as every gunicorn worker and manage.py call pays it.
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 20] [--json]
+
+Runs a fresh interpreter under -X importtime for each run. Prints the median
+total, then the slowest top-level packages by their own time and the slowest
+modules by cumulative time (including what they import) for the median run.
+orders_mgmt/tests/test_startup.py holds the total to a budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter, namedtuple
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+STARTUP_CODE = '''
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'orders_sms_service.settings')
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+'''
+
+Import = namedtuple('Import', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+
+def import_times(env=None):
+    """One startup in a new interpreter; the Import of every module it loaded, in -X importtime order."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix('import time:').split('|')
+        module = name.strip()
+        imports.append(Import(module, int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2))
+    return imports
+
+
+def total_seconds(imports):
+    return sum(i.cumulative_us for i in imports if i.depth == 0) / 1e6
+
+
+def by_package(imports):
+    """Own import time per top-level package, in seconds."""
+    totals = Counter()
+    for i in imports:
+        totals[i.module.split('.')[0]] += i.self_us / 1e6
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+    args = parser.parse_args()
+
+    runs = sorted((import_times(dict(os.environ)) for _ in range(args.runs)), key=total_seconds)
+    median = runs[len(runs) // 2]
+    packages = by_package(median).most_common(args.top)
+    modules = sorted(median, key=lambda i: i.cumulative_us, reverse=True)[:args.top]
+    result = {
+        'total_seconds': round(statistics.median(total_seconds(run) for run in runs), 4),
+        'modules_loaded': len(median),
+        'packages': {name: round(seconds, 4) for name, seconds in packages},
+        'modules': {i.module: round(i.cumulative_us / 1e6, 4) for i in modules},
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"startup imports: {result['total_seconds'] * 1000:.1f}ms median of {args.runs}, {result['modules_loaded']} modules")
+    print(f"\n{'package (own time)':<40} {'ms':>8}")
+    for name, seconds in result['packages'].items():
+        print(f'{name:<40} {seconds * 1000:>8.1f}')
+    print(f"\n{'module (cumulative)':<60} {'ms':>8}")
+    for name, seconds in result['modules'].items():
+        print(f'{name:<60} {seconds * 1000:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
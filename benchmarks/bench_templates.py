@@ -0,0 +1,97 @@
+"""Confirmation rendering for a batch of orders: per-message str.format vs compiled templates.
+
+    python -m benchmarks.bench_templates [--messages 10000] [--runs 5]
+
+Builds unsaved Order/Customer instances (half of them in a second language), then
+renders one confirmation per order the way the bulk path does. The baseline
+formats the template body from a dict of fields per message; the compiled path
+goes through orders_mgmt.sms_templates. Reports per-message time and the peak
+memory allocated while rendering, plus the cost of GSM-7/UCS-2 segment counting.
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks.common import scratch_database_url, setup_django
+
+BODIES = {
+    'en': "Hello {customer_name}, your order for {quantity} of {item} at {time} has been placed.",
+    'sw': "Habari {customer_name}, oda yako ya {quantity} {item} ya {time} imepokelewa.",
+}
+
+
+def make_orders(count):
+    from django.utils import timezone
+    from orders_mgmt.models import Customer, Order
+
+    now = timezone.now()
+    customers = [
+        Customer(id=i, name=f'Customer {i}', code=f'B{i:07d}', phone=f'+2547{i:08d}', language='sw' if i % 2 else 'en')
+        for i in range(100)
+    ]
+    return [Order(id=i, customer=customers[i % 100], item=f'item {i % 50}', quantity=Decimal(i % 9 + 1), time=now) for i in range(count)]
+
+
+def format_each(orders):
+    # Looks the body up and formats it from a fresh dict for every message
+    return [
+        BODIES[order.customer.language].format(
+            customer_name=order.customer.name, customer_code=order.customer.code, order_id=order.id,
+            item=order.item, quantity=order.quantity, time=order.time,
+        )
+        for order in orders
+    ]
+
+
+def compiled(orders):
+    from orders_mgmt.sms_templates import ORDER_CONFIRMATION, render
+    return [render(ORDER_CONFIRMATION, order) for order in orders]
+
+
+def segments(orders):
+    from orders_mgmt.sms_templates import count_segments
+    return [count_segments(message).count for message in compiled(orders)]
+
+
+def measure(name, func, orders, runs):
+    func(orders)  # warm up: template lookups, attribute caches
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(orders)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(orders)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'path': name,
+        'messages': len(orders),
+        'per_message_us': round(statistics.median(timings) / len(orders) * 1e6, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with scratch_database_url() as database_url:
+        setup_django(DATABASE_URL=database_url)
+        from orders_mgmt.models import MessageTemplate
+        from orders_mgmt.sms_templates import ORDER_CONFIRMATION
+
+        MessageTemplate.objects.bulk_create([MessageTemplate(name=ORDER_CONFIRMATION, language=lang, body=body) for lang, body in BODIES.items()])
+        orders = make_orders(args.messages)
+        assert format_each(orders) == compiled(orders)
+        for name, func in [('str.format', format_each), ('compiled', compiled), ('compiled + segments', segments)]:
+            print(json.dumps(measure(name, func, orders, args.runs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def scratch_database_url(database_url=None):
+    """Yield `database_url`, or a throwaway SQLite file URL when none is given.
+
+    The file goes in memory-backed storage where there is one, so fsync doesn't dominate.
+    """
+    if database_url:
+        yield database_url
+        return
+    tmp_root = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory(dir=tmp_root) as tmp:
+        yield f'sqlite:///{tmp}/bench.db'
+
+
+def setup_django(**env):
+    """Point settings at `env` (e.g. DATABASE_URL), run django.setup() and migrate."""
+    os.environ.update(env)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'orders_sms_service.settings')
+    import django
+    from django.core.management import call_command
+    from django.db import connection
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+    if connection.vendor == 'sqlite':
+        # WAL is persistent in the file, so other processes opening it get concurrent readers too
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
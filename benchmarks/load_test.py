@@ -0,0 +1,167 @@
+"""Concurrency vs latency for order creation under the sync (WSGI) and async (ASGI) servers.
+
+    python -m benchmarks.load_test [--mode wsgi|asgi|both] [--concurrency 1,10,50,100,200]
+                                   [--requests 400] [--gateway-latency 0.2] [--workers 2]
+                                   [--database-url postgres://...]
+
+Each mode starts gunicorn on a free local port against a stub SMS gateway and
+a throwaway database, then POSTs orders at each concurrency level:
+  wsgi -> sync workers, POST /api/orders/ (SMS queued for the worker)
+  asgi -> uvicorn workers, POST /api/orders/async/ (SMS sent inline, awaiting the gateway)
+
+SQLite serialises writes, so use --database-url with Postgres for numbers
+that reflect production.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import scratch_database_url, setup_django
+from orders_mgmt.tests.stub_gateway import StubGateway
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SERVERS = {
+    'wsgi': (['orders_sms_service.wsgi:application'], '/api/orders/'),
+    'asgi': (['orders_sms_service.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker'], '/api/orders/async/'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(env):
+    """Migrate the database and create a user, session and customer. Returns (cookies, customer_id)."""
+    setup_django(**env)
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from orders_mgmt.models import Customer
+
+    user, _ = User.objects.get_or_create(username='loadtest')
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session['oidc_id_token_expiration'] = time.time() + 86400  # or SessionRefresh redirects GETs to Auth0
+    session.save()
+    customer, _ = Customer.objects.get_or_create(code='LOAD001', defaults={'name': 'Load Test', 'phone': '+254700000000'})
+    csrf_token = secrets.token_hex(16)
+    return {'sessionid': session.session_key, 'csrftoken': csrf_token}, customer.id
+
+
+def start_server(mode, port, workers, env):
+    target, _ = SERVERS[mode]
+    command = [sys.executable, '-m', 'gunicorn', *target, '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def create_order(customer_id):
+    return lambda client, url, i: client.post(url, json={'customer': customer_id, 'item': f'item-{i}', 'quantity': 1})
+
+
+async def run_level(url, cookies, concurrency, total, send):
+    """Make `total` requests, at most `concurrency` at a time; `send(client, url, i)` makes the i-th one."""
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {'X-CSRFToken': cookies['csrftoken']}
+    async with httpx.AsyncClient(cookies=cookies, headers=headers, limits=limits, timeout=60) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await send(client, url, i)
+                    ok = response.is_success
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    pct = lambda p: round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 1) if latencies else None
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+    parser.add_argument('--concurrency', default='1,10,50,100,200')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per concurrency level.')
+    parser.add_argument('--gateway-latency', type=float, default=0.2, help='Simulated SMS provider latency in seconds.')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--database-url', help='Defaults to a temporary SQLite file.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+    modes = ['wsgi', 'asgi'] if args.mode == 'both' else [args.mode]
+
+    with scratch_database_url(args.database_url) as database_url, StubGateway(latency=args.gateway_latency) as gateway:
+        env = dict(
+            os.environ,
+            DATABASE_URL=database_url,
+            AFRICASTALKING_MESSAGING_URL=gateway.url,
+            API_USER_THROTTLE_RATE='1000000/hour',
+        )
+        cookies, customer_id = prepare_database(env)
+        results = {}
+        for mode in modes:
+            port = free_port()
+            server = start_server(mode, port, args.workers, env)
+            try:
+                url = f'http://127.0.0.1:{port}{SERVERS[mode][1]}'
+                results[mode] = [
+                    asyncio.run(run_level(url, cookies, level, args.requests, create_order(customer_id))) for level in levels
+                ]
+            finally:
+                server.terminate()
+                server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for mode, rows in results.items():
+        print(f"\n{mode} ({args.workers} workers, gateway latency {args.gateway_latency}s)")
+        print(f"{'concurrency':>11} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for row in rows:
+            print(f"{row['concurrency']:>11} {row['rps']:>8} {row['p50_ms']!s:>8} {row['p95_ms']!s:>8} {row['p99_ms']!s:>8} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
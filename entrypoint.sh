@@ -2,4 +2,11 @@
 set -e
 python manage.py migrate --no-input 
 python manage.py collectstatic --no-input # If this is where it times out, remove it
-exec gunicorn orders_sms_service.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+# Every gunicorn worker writes its metrics here and /metrics adds them up; start from an empty directory
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+# SERVER_MODE=asgi serves orders_sms_service.asgi through uvicorn workers, so /api/orders/async/ requests share an event loop
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec gunicorn orders_sms_service.asgi:application --worker-class uvicorn_worker.UvicornWorker --bind 0.0.0.0:$PORT
+fi
+exec gunicorn orders_sms_service.wsgi:application --bind 0.0.0.0:$PORT
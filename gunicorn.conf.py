@@ -0,0 +1,19 @@
+# Read by gunicorn from the working directory (entrypoint.sh, Procfile) or with -c (app.yaml)
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # Values left from an earlier run would be added to this one's; entrypoint.sh does the same for Docker
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    # Metrics files of a dead worker are kept (its counts stay in the totals) but its live gauges go
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
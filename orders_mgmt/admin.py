@@ -1,10 +1,83 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 # Register your models here.
-from orders_mgmt.models import Customer, Order
+from orders_mgmt.models import Customer, MessageTemplate, Order, OutboundSMS
+from orders_mgmt.phone import InvalidPhoneNumber, normalize as normalize_phone
 
-class OrderAdmin(admin.ModelAdmin):
+
+def estimated_row_count(model, using):
+    """PostgreSQL's row estimate for the model's table (from the last ANALYZE), or None elsewhere."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 until the table has been analyzed
+    return int(row[0]) if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    # An exact COUNT(*) reads the whole table on every changelist page; unfiltered lists of big
+    # tables show the planner's estimate instead. Filtered lists and small tables are counted.
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # no second COUNT(*) of the whole table when filtering
+
+
+class CustomerAdmin(LargeTableAdmin):
+    list_display = ('code', 'name', 'phone', 'language')
+    # Exact code and phone prefix, served by the unique code index and customer_phone_idx;
+    # the default icontains would scan the table
+    search_fields = ('code__exact', 'phone__startswith')
+    search_help_text = "Customer code, or the start of a phone number."
+    ordering = ('-id',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # A complete number in any format (0712 345 678) matches its stored E.164 form
+        try:
+            search_term = normalize_phone(search_term)
+        except InvalidPhoneNumber:
+            pass
+        return super().get_search_results(request, queryset, search_term)
+
+
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'item', 'quantity', 'time')
+    list_select_related = ('customer',)
+    autocomplete_fields = ('customer',)
+    search_fields = ('customer__code__exact',)
+    search_help_text = "Customer code."
+    date_hierarchy = 'time'
+    ordering = ('-time', '-id')  # order_time_idx
     readonly_fields = ('time',)
 
-admin.site.register(Customer)
-admin.site.register(Order, OrderAdmin)
\ No newline at end of file
+
+class OutboundSMSAdmin(LargeTableAdmin):
+    list_display = ('phone', 'status', 'delivery_status', 'segments', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'delivery_status')
+    raw_id_fields = ('order',)
+    readonly_fields = ('created_at', 'claimed_at', 'sent_at', 'response', 'delivery_reported_at')
+
+class MessageTemplateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'language', 'updated_at')
+    list_filter = ('name', 'language')
+
+admin.site.register(Customer, CustomerAdmin)
+admin.site.register(Order, OrderAdmin)
+admin.site.register(OutboundSMS, OutboundSMSAdmin)
+admin.site.register(MessageTemplate, MessageTemplateAdmin)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class OrdersMgmtConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders_mgmt'
+
+    def ready(self):
+        # Connect the signal handlers: compiled templates and cached customers are dropped when
+        # their rows change, and every new DB connection gets the metrics query wrapper
+        from orders_mgmt import customer_cache, metrics, sms_templates  # noqa: F401
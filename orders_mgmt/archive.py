@@ -0,0 +1,168 @@
+"""Cold storage for old orders: gzip NDJSON files, partitioned by day, under ORDERS_ARCHIVE_DIR.
+
+    <ORDERS_ARCHIVE_DIR>/date=2025-01-31/part-<first order id>.ndjson.gz
+
+Each line is an order in the /api/orders/export/ format (EXPORT_FIELDS), with its
+customer's code, name and phone as they were when it was archived. The day is
+the order's UTC date.
+
+archive_orders() moves a batch at a time, each in its own transaction. The
+batch's rows are locked, its files written and fsynced, and only then are the
+rows deleted. A crash can at worst leave a batch both archived and still in the
+table; the next run archives it again and readers skip the duplicate ids.
+
+read_orders() streams a time range back, opening only the partitions the range
+covers. It is meant for occasional look-ups, not for queries across years.
+"""
+import gzip
+import json
+import os
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection, transaction
+
+from orders_mgmt.export import EXPORT_FIELDS, format_value
+from orders_mgmt.models import Order
+
+PARTITION_PREFIX = 'date='
+FIELD_NAMES = list(EXPORT_FIELDS)
+
+ArchiveResult = namedtuple('ArchiveResult', ['rows', 'files', 'elapsed', 'rows_per_second'])
+
+
+def archive_dir():
+    if not settings.ORDERS_ARCHIVE_DIR:
+        raise ImproperlyConfigured('ORDERS_ARCHIVE_DIR must be set to durable storage before orders are archived.')
+    return Path(settings.ORDERS_ARCHIVE_DIR)
+
+
+def partition_path(day):
+    return archive_dir() / f'{PARTITION_PREFIX}{day.isoformat()}'
+
+
+def write_part(day, rows):
+    """Write one batch's rows for `day` as a new part file, durably, and return its path."""
+    directory = partition_path(day)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"part-{rows[0]['id']:012d}.ndjson.gz"
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            for row in rows:
+                f.write(json.dumps(row).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    # The rename itself must survive a crash before the rows are deleted
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+    return path
+
+
+def archive_orders(before, batch_size=1000, dry_run=False, on_batch=None):
+    """Move orders older than `before` into the archive, oldest first. Returns an ArchiveResult.
+
+    CustomerOrderStats keep counting archived orders; rebuild_order_stats, which reads the table, would drop them.
+    """
+    started = time.perf_counter()
+    rows_moved = files = 0
+    queryset = Order.objects.filter(time__lt=before).order_by('time', 'id')
+    last = None
+    while True:
+        with transaction.atomic():
+            if dry_run:
+                # Nothing is deleted, so page on (time, id) instead of re-reading the head
+                page = queryset if last is None else queryset.filter(time__gte=last[1]).exclude(time=last[1], id__lte=last[0])
+            else:
+                # Locked until deleted, so an edit made meanwhile can't be lost
+                page = queryset.select_for_update(of=('self',))
+            batch = list(page.values_list(*EXPORT_FIELDS.values())[:batch_size])
+            if not batch:
+                break
+            by_day = defaultdict(list)
+            for values in batch:
+                day = values[1].astimezone(dt_timezone.utc).date()
+                by_day[day].append(dict(zip(FIELD_NAMES, map(format_value, values))))
+            if not dry_run:
+                for day, rows in by_day.items():
+                    write_part(day, rows)
+                # Their SMS rows stay, with order set to NULL
+                Order.objects.filter(id__in=[values[0] for values in batch]).delete()
+        last = batch[-1]
+        rows_moved += len(batch)
+        files += len(by_day)
+        if on_batch is not None:
+            on_batch(rows_moved)
+    elapsed = time.perf_counter() - started
+    return ArchiveResult(rows_moved, files, elapsed, rows_moved / elapsed if elapsed else 0.0)
+
+
+def partitions(since, until):
+    """Partition directories whose day overlaps [since, until), in date order."""
+    first = since.astimezone(dt_timezone.utc).date()
+    last = (until - timedelta(microseconds=1)).astimezone(dt_timezone.utc).date()
+    if not settings.ORDERS_ARCHIVE_DIR:
+        return []  # nothing can have been archived
+    root = archive_dir()
+    if not root.is_dir():
+        return []
+    days = []
+    for entry in root.iterdir():
+        if not entry.name.startswith(PARTITION_PREFIX):
+            continue
+        day = datetime.strptime(entry.name.removeprefix(PARTITION_PREFIX), '%Y-%m-%d').date()
+        if first <= day <= last:
+            days.append((day, entry))
+    return [entry for _, entry in sorted(days)]
+
+
+def read_orders(since, until, customer_id=None, customer_code=None, item=None):
+    """Yield archived orders with since <= time < until as tuples in EXPORT_FIELDS order, oldest first.
+
+    One day's rows are held in memory at a time, to sort them and drop duplicates.
+    """
+    for directory in partitions(since, until):
+        rows = {}
+        for path in sorted(directory.glob('part-*.ndjson.gz')):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    if customer_id is not None and row['customer_id'] != customer_id:
+                        continue
+                    if customer_code is not None and row['customer_code'] != customer_code:
+                        continue
+                    if item is not None and row['item'] != item:
+                        continue
+                    row_time = datetime.fromisoformat(row['time'])
+                    if since <= row_time < until:
+                        rows[row['id']] = (row_time, row)
+        for _, row in sorted(rows.values(), key=lambda entry: (entry[0], entry[1]['id'])):
+            yield tuple(row[name] for name in FIELD_NAMES)
+
+
+def table_size(model):
+    """Bytes used by the model's table and its indexes, where the database can tell; else None."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s::regclass)', [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN '
+                    '(SELECT name FROM sqlite_master WHERE type = %s AND tbl_name = %s)',
+                    [table, 'index', table],
+                )
+            except OperationalError:  # SQLite built without the dbstat table
+                return None
+            return cursor.fetchone()[0]
+    return None
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousOperation
+from django.utils.encoding import smart_str
+from josepy.errors import DeserializationError
+from josepy.jws import JWS
+from mozilla_django_oidc.contrib.drf import OIDCAuthentication
+from rest_framework import exceptions
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_PREFIX = 'oidc:token:'
+JWKS_CACHE_KEY = 'oidc:jwks'
+JWKS_REFRESH_LOCK_KEY = 'oidc:jwks:refresh'
+
+
+@dataclass
+class TokenCacheStats:
+    hits: int = 0
+    misses: int = 0
+    jwks_fetches: int = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# Per-process counters for CachedOIDCAuthentication
+token_cache_stats = TokenCacheStats()
+_stats_lock = threading.Lock()
+
+
+def count(name):
+    with _stats_lock:
+        setattr(token_cache_stats, name, getattr(token_cache_stats, name) + 1)
+
+
+def token_cache_key(token):
+    # Never store the bearer token itself in the cache
+    return TOKEN_CACHE_PREFIX + hashlib.sha256(token.encode()).hexdigest()
+
+
+def fetch_jwks():
+    response = requests.get(
+        settings.OIDC_OP_JWKS_ENDPOINT,
+        verify=getattr(settings, 'OIDC_VERIFY_SSL', True),
+        timeout=getattr(settings, 'OIDC_TIMEOUT', None) or 10,
+    )
+    response.raise_for_status()
+    count('jwks_fetches')
+    return {smart_str(key.get('kid')): key for key in response.json().get('keys', [])}
+
+
+def get_signing_key(kid):
+    """Return the JWK for `kid` from the cached JWKS.
+
+    An unknown kid triggers one refetch (the IdP may have rotated keys), at most
+    once per OIDC_JWKS_MIN_REFRESH_INTERVAL so bogus kids can't hammer the IdP.
+    """
+    keys = cache.get(JWKS_CACHE_KEY)
+    if keys is None or (kid not in keys and cache.add(JWKS_REFRESH_LOCK_KEY, True, settings.OIDC_JWKS_MIN_REFRESH_INTERVAL)):
+        keys = fetch_jwks()
+        cache.set(JWKS_CACHE_KEY, keys, settings.OIDC_JWKS_CACHE_TTL)
+    return keys.get(kid)
+
+
+class CachedOIDCAuthentication(OIDCAuthentication):
+    """OIDCAuthentication that verifies each bearer token once, then serves it from the cache.
+
+    JWT access tokens are checked locally (signature against the cached JWKS, exp/nbf,
+    and aud when OIDC_TOKEN_AUDIENCE is set) before the one userinfo call that maps
+    them to a user. The user id is cached under the token's hash until the token
+    expires, capped at OIDC_TOKEN_CACHE_TTL; opaque tokens get the cap alone.
+    """
+
+    def authenticate(self, request):
+        access_token = self.get_access_token(request)
+        if not access_token:
+            return None
+        key = token_cache_key(access_token)
+        user_id = cache.get(key)
+        if user_id is not None:
+            user = self.backend.get_user(user_id)
+            if user is not None and user.is_active:
+                count('hits')
+                return user, access_token
+        count('misses')
+
+        expires_at = self.verify_jwt(access_token)
+        user, access_token = super().authenticate(request)
+        ttl = settings.OIDC_TOKEN_CACHE_TTL
+        if expires_at is not None:
+            ttl = min(ttl, int(expires_at - time.time()))
+        if ttl > 0:
+            cache.set(key, user.pk, ttl)
+        return user, access_token
+
+    def verify_jwt(self, token):
+        """Check a JWT's signature and validity window. Returns its exp, or None for non-JWT tokens."""
+        if token.count('.') != 2:
+            return None
+        try:
+            kid = smart_str(JWS.from_compact(token.encode()).signature.combined.kid)
+            key = get_signing_key(kid)
+            if key is None:
+                raise SuspiciousOperation(f"No signing key with kid {kid!r}.")
+            claims = json.loads(self.backend.get_payload_data(token.encode(), key))
+        except (DeserializationError, SuspiciousOperation, ValueError) as exc:
+            logger.info("Bearer token rejected: %s", exc)
+            raise exceptions.AuthenticationFailed("Invalid token.")
+        except requests.RequestException as exc:
+            logger.warning("Could not fetch the OIDC JWKS: %s", exc)
+            raise exceptions.AuthenticationFailed("Could not verify token.")
+
+        now = time.time()
+        leeway = settings.OIDC_TOKEN_LEEWAY
+        if 'exp' in claims and claims['exp'] + leeway <= now:
+            raise exceptions.AuthenticationFailed("Token has expired.")
+        if 'nbf' in claims and claims['nbf'] - leeway > now:
+            raise exceptions.AuthenticationFailed("Token is not yet valid.")
+        audience = settings.OIDC_TOKEN_AUDIENCE
+        if audience:
+            token_audience = claims.get('aud')
+            if audience not in (token_audience if isinstance(token_audience, list) else [token_audience]):
+                raise exceptions.AuthenticationFailed("Token audience mismatch.")
+        return claims.get('exp')
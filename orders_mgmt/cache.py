@@ -0,0 +1,165 @@
+"""Cache backends shared between worker processes, with increments that don't lose updates.
+
+Django's database and file caches implement add() and incr() as separate read and
+write steps, so two workers counting the same throttle key can both read 41 and
+both write 42. These subclasses make those operations atomic across processes.
+
+Django's backends also check the size of the cache on every write (a COUNT(*)
+of the table, a listing of the directory) and remove expired entries only once
+MAX_ENTRIES is passed. Here expired entries are purged, and MAX_ENTRIES
+enforced, at most once every PURGE_INTERVAL seconds per process, on a write.
+"""
+import base64
+import os
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache.backends import db, filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.files import locks
+from django.db import DatabaseError, connections, models, router, transaction
+from django.utils.timezone import now as tz_now
+
+_next_purge = {}  # (backend, location): time.monotonic() after which the next write purges
+
+
+class PeriodicPurge:
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self._purge_interval = params.get('OPTIONS', {}).get('PURGE_INTERVAL', 60)
+        self._purge_key = (type(self), location)
+
+    def _purge_due(self):
+        now = time.monotonic()
+        if now < _next_purge.get(self._purge_key, 0):
+            return False
+        _next_purge[self._purge_key] = now + self._purge_interval
+        return True
+
+
+def to_datetime(connection, value):
+    # An expires column value as the ORM would read it: aware or naive, per USE_TZ and the database
+    expression = models.Expression(output_field=models.DateTimeField())
+    for converter in connection.ops.get_db_converters(expression) + expression.get_db_converters(connection):
+        value = converter(value, expression, connection)
+    return value
+
+
+class DatabaseCache(PeriodicPurge, db.DatabaseCache):
+    def _base_set(self, mode, key, value, timeout=DEFAULT_TIMEOUT):
+        # Django's, without the COUNT(*) of the table on every write
+        timeout = self.get_backend_timeout(timeout)
+        database = router.db_for_write(self.cache_model_class)
+        connection = connections[database]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        cache_key, value_column, expires = quote_name('cache_key'), quote_name('value'), quote_name('expires')
+        now = tz_now().replace(microsecond=0)
+        if timeout is None:
+            expires_at = datetime.max
+        else:
+            expires_at = datetime.fromtimestamp(timeout, tz=dt_timezone.utc if settings.USE_TZ else None)
+        expires_at = connection.ops.adapt_datetimefield_value(expires_at.replace(microsecond=0))
+        encoded = base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+
+        with connection.cursor() as cursor:
+            if self._purge_due():
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                # Deletes the expired rows, then culls live ones if still over MAX_ENTRIES
+                self._cull(database, cursor, now, cursor.fetchone()[0])
+            try:
+                with transaction.atomic(using=database):
+                    cursor.execute(f"SELECT {expires} FROM {table} WHERE {cache_key} = %s", [key])
+                    row = cursor.fetchone()
+                    if row and mode == 'touch':
+                        cursor.execute(f"UPDATE {table} SET {expires} = %s WHERE {cache_key} = %s", [expires_at, key])
+                    elif row and (mode == 'set' or (mode == 'add' and to_datetime(connection, row[0]) < now)):
+                        cursor.execute(
+                            f"UPDATE {table} SET {value_column} = %s, {expires} = %s WHERE {cache_key} = %s",
+                            [encoded, expires_at, key],
+                        )
+                    elif row or mode == 'touch':
+                        return False
+                    else:
+                        cursor.execute(
+                            f"INSERT INTO {table} ({cache_key}, {value_column}, {expires}) VALUES (%s, %s, %s)",
+                            [key, encoded, expires_at],
+                        )
+            except DatabaseError:
+                # As in Django: losing a race to insert the same key fails the write quietly
+                return False
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        database = router.db_for_write(self.cache_model_class)
+        connection = connections[database]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        cache_key, value_column, expires = quote_name('cache_key'), quote_name('value'), quote_name('expires')
+
+        with transaction.atomic(using=database), connection.cursor() as cursor:
+            # A no-op write first: it takes the row lock on PostgreSQL and the write lock on
+            # SQLite, so concurrent increments of the key queue here instead of racing
+            cursor.execute(f"UPDATE {table} SET {expires} = {expires} WHERE {cache_key} = %s", [key])
+            if not cursor.rowcount:
+                raise ValueError(f"Key '{key}' not found")
+            cursor.execute(f"SELECT {value_column}, {expires} FROM {table} WHERE {cache_key} = %s", [key])
+            value, expires_at = cursor.fetchone()
+            if to_datetime(connection, expires_at) < tz_now():
+                raise ValueError(f"Key '{key}' not found")
+
+            value = pickle.loads(base64.b64decode(connection.ops.process_clob(value).encode())) + delta
+            encoded = base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+            cursor.execute(f"UPDATE {table} SET {value_column} = %s WHERE {cache_key} = %s", [encoded, key])
+        return value
+
+
+class FileBasedCache(PeriodicPurge, filebased.FileBasedCache):
+    lock_filename = 'atomic.lock'  # no cache suffix, so clear() and culling leave it alone
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_filename), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def _cull(self):
+        # Called by every set(); expired entries go first, then live ones if still over MAX_ENTRIES
+        if not self._purge_due():
+            return
+        for fname in self._list_cache_files():
+            try:
+                with open(fname, 'rb') as f:
+                    self._is_expired(f)
+            except FileNotFoundError:
+                pass
+        super()._cull()
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked():
+            try:
+                with open(fname, 'rb') as f:
+                    if self._is_expired(f):
+                        raise ValueError(f"Key '{key}' not found")
+                    f.seek(0)
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read())) + delta
+            except FileNotFoundError:
+                raise ValueError(f"Key '{key}' not found")
+            # Keep the key's original expiry rather than resetting it to the default timeout
+            self.set(key, value, None if expiry is None else max(expiry - time.time(), 0.001), version)
+        return value
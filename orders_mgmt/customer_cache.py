@@ -0,0 +1,133 @@
+"""Customers by code, through a per-process read-through cache.
+
+Integrations refer to customers by their code, and the busy ones do it on every
+order, so each worker keeps the most recently used customers in memory: an LRU
+of CUSTOMER_CACHE_SIZE entries, each trusted for CUSTOMER_CACHE_TTL seconds.
+Codes that don't exist are not cached, so a new customer is found at once.
+
+Saving or deleting a customer drops its entry in the process that did it. Other
+workers keep theirs until the TTL runs out, as they do after queryset update()
+and bulk_update() (e.g. the normalize_phones command), which send no signals.
+
+Lookups are counted as hits or misses in the customer_cache_lookups metric;
+stats() gives the figures for this process.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from orders_mgmt import metrics
+from orders_mgmt.models import Customer
+
+
+class CustomerCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # code -> (Customer, expires at), least recently used first
+        self.codes = {}  # pk -> code, so a customer whose code changed loses its old entry too
+        # Bumped by every invalidation; a load that started before one isn't stored, since it may have read the old row
+        self.generation = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get_many(self, codes):
+        """{code: Customer} for those of `codes` that exist, loading every miss in one query.
+
+        Each caller gets its own copy of the instance, so changes to it don't leak into the cache.
+        """
+        found, missing = {}, []
+        now = time.monotonic()
+        with self.lock:
+            for code in set(codes):
+                entry = self.entries.get(code)
+                if entry is not None and entry[1] > now:
+                    self.entries.move_to_end(code)
+                    found[code] = entry[0]
+                else:
+                    if entry is not None:
+                        del self.entries[code]
+                    missing.append(code)
+            self.hits += len(found)
+            self.misses += len(missing)
+            generation = self.generation
+        metrics.CUSTOMER_CACHE_LOOKUPS.labels('hit').inc(len(found))
+        if missing:
+            metrics.CUSTOMER_CACHE_LOOKUPS.labels('miss').inc(len(missing))
+            loaded = self.load(missing)
+            self.store(loaded, generation, now + settings.CUSTOMER_CACHE_TTL)
+            found.update((customer.code, customer) for customer in loaded)
+        return {code: copy.copy(customer) for code, customer in found.items()}
+
+    def load(self, codes):
+        # From the primary even in a request reading from the replica: entries outlive its lag
+        return list(Customer.objects.using(DEFAULT_DB_ALIAS).filter(code__in=codes))
+
+    def store(self, customers, generation, expires_at):
+        with self.lock:
+            if generation != self.generation:
+                return
+            for customer in customers:
+                self.entries[customer.code] = (customer, expires_at)
+                self.entries.move_to_end(customer.code)
+                self.codes[customer.pk] = customer.code
+            while len(self.entries) > settings.CUSTOMER_CACHE_SIZE:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.codes.pop(evicted.pk, None)
+                self.evictions += 1
+
+    def invalidate(self, pk, code):
+        with self.lock:
+            self.generation += 1
+            for stale in (self.codes.pop(pk, None), code):
+                self.entries.pop(stale, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.codes.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+_cache = CustomerCache()
+
+
+def get(code):
+    """The customer with `code`, or None."""
+    return _cache.get_many([code]).get(code)
+
+
+def get_many(codes):
+    return _cache.get_many(codes)
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+@receiver([post_save, post_delete], sender=Customer, dispatch_uid='customer_cache_invalidate')
+def invalidate(sender, instance, **kwargs):
+    pk, code = instance.pk, instance.code  # delete() clears instance.pk before the commit
+    _cache.invalidate(pk, code)
+    # Again once committed: until then another thread can still read the old row and cache it
+    transaction.on_commit(lambda: _cache.invalidate(pk, code))
@@ -0,0 +1,156 @@
+"""Delivery reports from Africa's Talking, applied to OutboundSMS rows in batches.
+
+The gateway posts one callback per message and status change, which during a
+campaign can be thousands a second. The webhook only adds each report to a
+per-process buffer; the buffer is written out when it holds SMS_DELIVERY_BATCH_SIZE
+reports, or by a background thread every SMS_DELIVERY_FLUSH_INTERVAL seconds.
+A flush runs one UPDATE per distinct status (and failure reason), matching rows
+by `provider_message_id`, rather than one write per callback.
+
+Reports are kept in memory until flushed, so a worker that dies can lose up to
+one interval's worth; the message's gateway status (`status`) is unaffected.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from orders_mgmt.models import OutboundSMS
+
+logger = logging.getLogger(__name__)
+
+DeliveryStatus = OutboundSMS.DeliveryStatus
+# Africa's Talking delivery report statuses
+GATEWAY_STATUSES = {
+    'Sent': DeliveryStatus.SUBMITTED,
+    'Submitted': DeliveryStatus.SUBMITTED,
+    'Buffered': DeliveryStatus.SUBMITTED,
+    'Success': DeliveryStatus.DELIVERED,
+    'Failed': DeliveryStatus.FAILED,
+    'Rejected': DeliveryStatus.FAILED,
+    'AbsentSubscriber': DeliveryStatus.FAILED,
+    'Expired': DeliveryStatus.FAILED,
+}
+FINAL_STATUSES = {DeliveryStatus.DELIVERED, DeliveryStatus.FAILED}
+UPDATE_CHUNK_SIZE = 500  # message ids per IN (...) list
+
+Report = namedtuple('Report', ['message_id', 'status', 'error', 'received_at'])
+
+
+def parse_report(data):
+    message_id = data.get('id')
+    gateway_status = data.get('status')
+    if not message_id or gateway_status not in GATEWAY_STATUSES:
+        raise ValidationError("A delivery report needs an `id` and a known `status`.")
+    status = GATEWAY_STATUSES[gateway_status]
+    error = ''
+    if status == DeliveryStatus.FAILED:
+        # e.g. "Rejected: InsufficientCredit"; the failure reason alone doesn't say which status it was
+        error = ': '.join(filter(None, [gateway_status, data.get('failureReason')]))
+    max_length = OutboundSMS._meta.get_field('delivery_error').max_length
+    return Report(message_id, status, error[:max_length], time.monotonic())
+
+
+def supersedes(report, current):
+    # A final status is never replaced by an intermediate one that arrived late
+    return current is None or report.status in FINAL_STATUSES or current.status not in FINAL_STATUSES
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_reports(reports):
+    """Write reports to their messages. Returns the message ids that matched a row."""
+    groups = defaultdict(list)
+    for report in reports:
+        groups[report.status, report.error].append(report.message_id)
+    now = timezone.now()
+    message_ids = [report.message_id for report in reports]
+    with transaction.atomic():
+        for (status, error), ids in groups.items():
+            for chunk in chunked(ids, UPDATE_CHUNK_SIZE):
+                rows = OutboundSMS.objects.filter(provider_message_id__in=chunk)
+                if status not in FINAL_STATUSES:
+                    rows = rows.exclude(delivery_status__in=FINAL_STATUSES)
+                rows.update(delivery_status=status, delivery_error=error, delivery_reported_at=now)
+        matched = set()
+        for chunk in chunked(message_ids, UPDATE_CHUNK_SIZE):
+            matched.update(OutboundSMS.objects.filter(provider_message_id__in=chunk).values_list('provider_message_id', flat=True))
+    return matched
+
+
+class ReportBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # one flush at a time per process
+        self.pending = {}  # message id -> latest Report
+        self.flusher = None
+
+    def add(self, report):
+        with self.lock:
+            if supersedes(report, self.pending.get(report.message_id)):
+                self.pending[report.message_id] = report
+            full = len(self.pending) >= settings.SMS_DELIVERY_BATCH_SIZE
+        if full or settings.SMS_DELIVERY_FLUSH_INTERVAL <= 0:
+            self.flush()
+        else:
+            self.start()
+
+    def flush(self):
+        """Apply the buffered reports. Returns how many matched a message."""
+        with self.flush_lock:
+            with self.lock:
+                reports, self.pending = self.pending, {}
+            if not reports:
+                return 0
+            try:
+                matched = apply_reports(list(reports.values()))
+            except Exception:
+                self.requeue(reports.values())
+                raise
+            # A report can beat the send_sms worker, which stores the message id once the
+            # gateway has replied; keep it for later flushes until it's too old to be one of those
+            cutoff = time.monotonic() - settings.SMS_DELIVERY_REPORT_MAX_AGE
+            unmatched = [report for message_id, report in reports.items() if message_id not in matched]
+            self.requeue(report for report in unmatched if report.received_at > cutoff)
+            expired = sum(report.received_at <= cutoff for report in unmatched)
+            if expired:
+                logger.warning("Dropped %s delivery report(s) for unknown message ids", expired)
+            return len(matched)
+
+    def requeue(self, reports):
+        with self.lock:
+            for report in reports:
+                if supersedes(report, self.pending.get(report.message_id)):
+                    self.pending[report.message_id] = report
+
+    def start(self):
+        if self.flusher is None or not self.flusher.is_alive():
+            with self.lock:
+                if self.flusher is None or not self.flusher.is_alive():
+                    self.flusher = threading.Thread(target=self.run, name='delivery-report-flusher', daemon=True)
+                    self.flusher.start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.SMS_DELIVERY_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Applying delivery reports failed; retrying on the next flush")
+            finally:
+                # Don't hold a connection while sleeping; on PostgreSQL it goes back to the pool
+                connections.close_all()
+
+
+buffer = ReportBuffer()
+# Don't leave a partial batch behind when the worker shuts down cleanly
+atexit.register(lambda: buffer.pending and buffer.flush())
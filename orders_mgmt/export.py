@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+# Column name -> Order lookup; one JOIN to customer, no model instances
+EXPORT_FIELDS = {
+    'id': 'id',
+    'time': 'time',
+    'customer_id': 'customer_id',
+    'customer_code': 'customer__code',
+    'customer_name': 'customer__name',
+    'customer_phone': 'customer__phone',
+    'item': 'item',
+    'quantity': 'quantity',
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_rows(queryset, chunk_size):
+    """Yield order rows as tuples in EXPORT_FIELDS order, `chunk_size` rows per DB fetch.
+
+    .iterator() uses a server-side cursor on PostgreSQL, so memory stays flat however many rows match.
+    """
+    return queryset.order_by('time', 'id').values_list(*EXPORT_FIELDS.values()).iterator(chunk_size=chunk_size)
+
+
+def format_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value if isinstance(value, (int, str)) else str(value)
+
+
+def stream_csv(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([format_value(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows, chunk_size):
+    names = list(EXPORT_FIELDS)
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(names, map(format_value, row)))))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def stream_rows(rows, output, chunk_size):
+    if output == 'ndjson':
+        return stream_ndjson(rows, chunk_size)
+    return stream_csv(rows, chunk_size)
+
+
+def stream_export(queryset, output, chunk_size):
+    return stream_rows(export_rows(queryset, chunk_size), output, chunk_size)
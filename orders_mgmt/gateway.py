@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+import weakref
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from orders_mgmt import metrics
+
+logger = logging.getLogger(__name__)
+
+# Gateway replies worth another attempt; anything else is returned or raised as-is.
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+
+class GatewayError(Exception):
+    pass
+
+
+def backoff_delay(attempt, base, cap):
+    # "Full jitter" exponential backoff: spreads retries from many workers over the window.
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_error(status_code):
+    return f'http_{status_code}' if status_code >= 400 else None
+
+
+def may_have_been_sent(error):
+    """Whether a failed send may still have been accepted: the request went out but the reply timed out."""
+    if isinstance(error, requests.ReadTimeout):
+        return True
+    httpx = sys.modules.get('httpx')  # loaded only by the async client, so an httpx error implies it's there
+    return httpx is not None and isinstance(error, httpx.ReadTimeout)
+
+
+class BaseGatewayClient:
+    """Settings and retry policy shared by the sync and async gateway clients.
+
+    Only connection errors and 5xx replies are retried. A read timeout is not,
+    because the gateway may already have accepted the message.
+    """
+
+    def __init__(self, url, username, api_key, connect_timeout=3.05, read_timeout=10,
+                 max_retries=3, backoff_base=0.5, backoff_max=8, pool_size=10):
+        self.url = url
+        self.username = username
+        self.api_key = api_key or ''
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            url=settings.MESSAGING_URL,
+            username=settings.AFRICASTALKING_USERNAME,
+            api_key=settings.AFRICASTALKING_API_KEY,
+            connect_timeout=settings.SMS_GATEWAY_CONNECT_TIMEOUT,
+            read_timeout=settings.SMS_GATEWAY_READ_TIMEOUT,
+            max_retries=settings.SMS_GATEWAY_MAX_RETRIES,
+            backoff_base=settings.SMS_GATEWAY_BACKOFF_BASE,
+            backoff_max=settings.SMS_GATEWAY_BACKOFF_MAX,
+            pool_size=settings.SMS_GATEWAY_POOL_SIZE,
+        )
+
+    @property
+    def headers(self):
+        return {'Accept': 'application/json', 'apiKey': self.api_key}
+
+    def payload(self, to, message):
+        return {'username': self.username, 'to': to, 'message': message}
+
+    def retry_delay(self, attempt, error):
+        """Seconds to wait before retrying, or re-raise `error` once retries are used up."""
+        if attempt >= self.max_retries:
+            raise error
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        logger.info("SMS gateway attempt %s failed (%s), retrying in %.2fs", attempt + 1, error, delay)
+        return delay
+
+
+class SMSGatewayClient(BaseGatewayClient):
+    """Africa's Talking messaging client with a keep-alive connection pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.headers)
+
+    def send(self, to, message):
+        """POST one message to `to` (a number or comma-separated list) and return the JSON reply."""
+        data = self.payload(to, message)
+        timeout = (self.connect_timeout, self.read_timeout)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url, data=data, timeout=timeout)
+            except Exception as e:
+                metrics.observe_gateway_call('sync', started, type(e).__name__)
+                if not isinstance(e, requests.ConnectionError):
+                    raise
+                error = e
+            else:
+                metrics.observe_gateway_call('sync', started, call_error(response.status_code))
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = GatewayError(f"Gateway returned {response.status_code}")
+            time.sleep(self.retry_delay(attempt, error))
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncSMSGatewayClient(BaseGatewayClient):
+    """httpx-based counterpart of SMSGatewayClient for async views."""
+
+    def __init__(self, *args, **kwargs):
+        import httpx  # only async views need it, so WSGI workers and manage.py don't load it
+
+        super().__init__(*args, **kwargs)
+        self.connect_errors = (httpx.ConnectError, httpx.ConnectTimeout)
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+        )
+
+    async def send(self, to, message):
+        data = self.payload(to, message)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(self.url, data=data)
+            except Exception as e:
+                metrics.observe_gateway_call('async', started, type(e).__name__)
+                if not isinstance(e, self.connect_errors):
+                    raise
+                error = e
+            else:
+                metrics.observe_gateway_call('async', started, call_error(response.status_code))
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = GatewayError(f"Gateway returned {response.status_code}")
+            await asyncio.sleep(self.retry_delay(attempt, error))
+            attempt += 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_pid = None
+
+
+def get_client():
+    """Return this process's shared client, creating it on first use.
+
+    Keyed on the pid so a forked gunicorn worker never reuses its parent's sockets.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = SMSGatewayClient.from_settings()
+        _client_pid = os.getpid()
+    return _client
+
+
+def reset_client():
+    global _client, _client_pid
+    if _client is not None:
+        _client.close()
+    _client = _client_pid = None
+    _async_clients.clear()
+
+
+# httpx connections belong to the event loop that opened them, so each loop gets its own client.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the async client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncSMSGatewayClient.from_settings()
+    return client
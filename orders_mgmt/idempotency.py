@@ -0,0 +1,154 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from orders_mgmt.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+POLL_INTERVAL = 0.1  # seconds between checks while another request holds the key
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed. Retry later."
+    default_code = 'idempotency_key_in_use'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = 'idempotency_key_reused'
+
+
+def request_fingerprint(request):
+    # Hash the parsed payload rather than the raw bytes: the body stream may already have been
+    # read, and a retry that reorders keys or whitespace is still the same request
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())  # form and multipart bodies
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256('\n'.join([request.method, request.path, payload]).encode()).hexdigest()
+
+
+def cache_key(user_id, key):
+    return f'idempotency:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def replay(stored):
+    return Response(stored['body'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
+
+
+def remember(user_id, key, stored, expires_at):
+    timeout = (expires_at - timezone.now()).total_seconds()
+    if timeout > 0:
+        cache.set(cache_key(user_id, key), stored, timeout)
+
+
+def begin(request):
+    """Claim the request's Idempotency-Key.
+
+    Returns (claim, None) for a new key, (None, response) when the key has already been
+    used for the same request, or (None, None) when there is no header. A request that
+    finds the key held by one still in progress waits up to IDEMPOTENCY_WAIT_TIMEOUT
+    for its response, then gets a 409.
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None, None
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({HEADER: [f"Must be 1 to {MAX_KEY_LENGTH} characters."]})
+    user = request.user
+    fingerprint = request_fingerprint(request)
+
+    # Completed keys are replayed from the cache, without touching the orders tables
+    stored = cache.get(cache_key(user.pk, key))
+    if stored is not None:
+        if stored['request_hash'] != fingerprint:
+            raise IdempotencyKeyReused()
+        return None, replay(stored)
+
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                claim = IdempotencyKey.objects.create(
+                    user=user, key=key, request_hash=fingerprint, created_at=now,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+            return claim, None
+        except IntegrityError:
+            pass
+
+        existing = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if existing is None:
+            continue  # released by a failed request in the meantime
+        abandoned = existing.status_code is None and existing.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        if existing.expires_at <= now or abandoned:
+            IdempotencyKey.objects.filter(pk=existing.pk, status_code=existing.status_code).delete()
+            continue
+        if existing.request_hash != fingerprint:
+            raise IdempotencyKeyReused()
+        if existing.status_code is not None:
+            stored = {'request_hash': existing.request_hash, 'status': existing.status_code, 'body': existing.response_body}
+            remember(user.pk, key, stored, existing.expires_at)
+            return None, replay(stored)
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInUse()
+        time.sleep(POLL_INTERVAL)
+
+
+def complete(claim, response):
+    """Store a successful response against its claim. Call inside the transaction that saved the orders."""
+    if not status.is_success(response.status_code):
+        return False
+    claim.status_code = response.status_code
+    claim.response_body = response.data
+    claim.save(update_fields=['status_code', 'response_body'])
+    stored = {'request_hash': claim.request_hash, 'status': claim.status_code, 'body': response.data}
+    transaction.on_commit(lambda: remember(claim.user_id, claim.key, stored, claim.expires_at))
+    return True
+
+
+def release(claim):
+    """Give up a claim so the client can retry with the same key, e.g. after a validation error."""
+    IdempotencyKey.objects.filter(pk=claim.pk, status_code__isnull=True).delete()
+
+
+def idempotent(handler):
+    """Make a viewset handler honour the Idempotency-Key header.
+
+    The handler's writes and the stored response commit in one transaction, so a replay
+    can never miss orders that were created. Only successful responses are kept; errors
+    release the key.
+    """
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        claim, response = begin(request)
+        if response is not None:
+            return response
+        if claim is None:
+            return handler(view, request, *args, **kwargs)
+        try:
+            with transaction.atomic():
+                response = handler(view, request, *args, **kwargs)
+                completed = complete(claim, response)
+        except Exception:
+            release(claim)
+            raise
+        if not completed:
+            release(claim)
+        return response
+    return wrapper
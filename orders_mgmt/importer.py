@@ -0,0 +1,148 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from orders_mgmt.phone import InvalidPhoneNumber, normalize as normalize_phone
+from orders_mgmt.models import Customer, Order
+from orders_mgmt.sms import enqueue_confirmations
+from orders_mgmt.stats import record_orders
+
+
+class ImportRowSerializer(serializers.Serializer):
+    # One input row: a customer, optionally with one of their orders. The column names match
+    # /api/orders/export/, so an export can be loaded back as is (id and customer_id are ignored).
+    customer_code = serializers.CharField(max_length=20)
+    customer_name = serializers.CharField(max_length=100, required=False)
+    customer_phone = serializers.CharField(max_length=32, required=False)
+    item = serializers.CharField(max_length=100, required=False)
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    time = serializers.DateTimeField(required=False)
+
+    def to_internal_value(self, data):
+        # CSV has no nulls; treat empty cells as missing columns
+        return super().to_internal_value({key: value for key, value in data.items() if value not in ('', None)})
+
+    def validate_customer_phone(self, value):
+        try:
+            return normalize_phone(value)
+        except InvalidPhoneNumber as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, attrs):
+        if ('customer_name' in attrs) != ('customer_phone' in attrs):
+            raise serializers.ValidationError("customer_name and customer_phone must be given together.")
+        if ('item' in attrs) != ('quantity' in attrs):
+            raise serializers.ValidationError("item and quantity must be given together.")
+        return attrs
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    customers: int = 0
+    orders: int = 0
+    rejected: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(stream, input_format):
+    """Yield (line number, row dict) from a CSV or NDJSON text stream, one line at a time."""
+    if input_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = {'__raw__': line.rstrip('\n'), '__error__': f"Invalid JSON: {exc}"}
+        if not isinstance(row, dict):
+            row = {'__raw__': line.rstrip('\n'), '__error__': "Expected a JSON object."}
+        yield line_number, row
+
+
+def import_chunk(rows, send_sms=True):
+    """Validate and write one chunk of (line number, row) pairs in a single transaction.
+
+    Customers are upserted on `code`; rows that name a customer without its name and phone
+    must refer to one that already exists. Returns (customers upserted, orders created,
+    rejected rows as (line number, row, errors)).
+    """
+    # One serializer for the whole chunk: building its fields per row costs more than validating
+    validator = ImportRowSerializer()
+    valid, rejected = [], []
+    for line_number, row in rows:
+        if '__error__' in row:
+            rejected.append((line_number, row, {'non_field_errors': [row['__error__']]}))
+            continue
+        try:
+            valid.append((line_number, row, validator.run_validation(row)))
+        except serializers.ValidationError as exc:
+            rejected.append((line_number, row, exc.detail))
+
+    # Last row wins when a chunk carries the same customer twice
+    upserts = {
+        attrs['customer_code']: Customer(code=attrs['customer_code'], name=attrs['customer_name'], phone=attrs['customer_phone'])
+        for _, _, attrs in valid if 'customer_name' in attrs
+    }
+    with transaction.atomic():
+        if upserts:
+            Customer.objects.bulk_create(
+                upserts.values(), update_conflicts=True, unique_fields=['code'], update_fields=['name', 'phone'],
+            )
+        customers = Customer.objects.in_bulk({attrs['customer_code'] for _, _, attrs in valid}, field_name='code')
+        orders = []
+        for line_number, row, attrs in valid:
+            customer = customers.get(attrs['customer_code'])
+            if customer is None:
+                rejected.append((line_number, row, {'customer_code': ["Unknown customer; give customer_name and customer_phone to create it."]}))
+            elif 'item' in attrs:
+                order = Order(customer=customer, item=attrs['item'], quantity=attrs['quantity'])
+                if 'time' in attrs:
+                    order.time = attrs['time']
+                orders.append(order)
+        if orders:
+            orders = Order.objects.bulk_create(orders)
+            record_orders(orders)
+            if send_sms:
+                enqueue_confirmations(orders)
+    rejected.sort(key=lambda rejection: rejection[0])
+    return len(upserts), len(orders), rejected
+
+
+def import_rows(rows, chunk_size=1000, send_sms=True, on_reject=None, on_chunk=None):
+    """Import an iterable of (line number, row) pairs `chunk_size` rows per transaction.
+
+    `on_reject(line_number, row, errors)` is called for each rejected row and
+    `on_chunk(result)` after each committed chunk.
+    """
+    result = ImportResult()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        customers, orders, rejected = import_chunk(chunk, send_sms)
+        result.rows += len(chunk)
+        result.customers += customers
+        result.orders += orders
+        result.rejected += len(rejected)
+        if on_reject:
+            for rejection in rejected:
+                on_reject(*rejection)
+        if on_chunk:
+            on_chunk(result)
+    return result
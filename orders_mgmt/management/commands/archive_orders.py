@@ -0,0 +1,56 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from orders_mgmt.archive import archive_orders, table_size
+from orders_mgmt.models import Order
+
+
+def parse_before(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        parsed = day and datetime.combine(day, time.min)
+    if parsed is None:
+        raise CommandError(f"--before: {value!r} is not an ISO 8601 date or datetime.")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Move orders older than --before out of the Order table into gzip NDJSON files under "
+        "ORDERS_ARCHIVE_DIR, one directory per day. GET /api/orders/archived/ reads them back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='ISO date or datetime; a bare date means midnight in TIME_ZONE.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders archived and deleted per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be archived without writing or deleting.')
+
+    def handle(self, *args, **options):
+        if not settings.ORDERS_ARCHIVE_DIR:
+            # Deleted rows must land somewhere that outlives the instance and stays out of the image
+            raise CommandError("Set ORDERS_ARCHIVE_DIR to durable storage outside the app directory (e.g. a mounted bucket or volume).")
+        before, dry_run = parse_before(options['before']), options['dry_run']
+        rows_before, size_before = Order.objects.count(), table_size(Order)
+
+        def on_batch(rows):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{rows} orders")
+
+        result = archive_orders(before, options['batch_size'], dry_run=dry_run, on_batch=on_batch)
+        if dry_run:
+            self.stdout.write(f"Would archive {result.rows} of {rows_before} order(s) from before {before.isoformat()}.")
+            return
+        share = result.rows / rows_before * 100 if rows_before else 0
+        self.stdout.write(
+            f"Archived {result.rows} order(s) into {result.files} file(s) in {result.elapsed:.1f}s "
+            f"({result.rows_per_second:.0f} rows/s); the table went from {rows_before} to {rows_before - result.rows} rows (-{share:.1f}%)."
+        )
+        size_after = table_size(Order)
+        if size_before is not None and size_after is not None:
+            # PostgreSQL keeps the freed pages for new rows until VACUUM FULL; autovacuum makes them reusable
+            self.stdout.write(f"Table and indexes: {size_before / 2**20:.1f} MiB -> {size_after / 2**20:.1f} MiB.")
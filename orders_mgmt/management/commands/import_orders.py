@@ -0,0 +1,63 @@
+import json
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders_mgmt.importer import import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Load customers and orders from a CSV or NDJSON file. Columns: customer_code, customer_name, "
+        "customer_phone, item, quantity, time (the /api/orders/export/ format)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Input format. Defaults to the file extension, or csv for stdin.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows validated and committed per transaction.')
+        parser.add_argument('--no-sms', action='store_true', help="Don't queue confirmation SMS (historical data).")
+        parser.add_argument('--errors', help='Where to write rejected rows as NDJSON. Defaults to <path>.errors.ndjson.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        errors_path = Path(options['errors'] or ('import.errors.ndjson' if path == '-' else f'{path}.errors.ndjson'))
+        if path != '-' and not Path(path).is_file():
+            raise CommandError(f"{path} does not exist.")
+
+        errors_file = None
+
+        def on_reject(line_number, row, errors):
+            nonlocal errors_file
+            if errors_file is None:
+                errors_file = errors_path.open('w')
+            errors_file.write(json.dumps({'line': line_number, 'errors': errors, 'row': row}, default=str) + '\n')
+
+        def on_chunk(result):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{result.rows} rows, {result.rows_per_second:.0f} rows/s")
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            result = import_rows(
+                read_rows(stream, input_format),
+                chunk_size=options['chunk_size'],
+                send_sms=not options['no_sms'],
+                on_reject=on_reject,
+                on_chunk=on_chunk,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if errors_file is not None:
+                errors_file.close()
+
+        self.stdout.write(
+            f"Imported {result.rows} row(s) in {result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/s): "
+            f"{result.customers} customer(s) upserted, {result.orders} order(s) created, {result.rejected} rejected."
+        )
+        if result.rejected:
+            self.stdout.write(f"Rejected rows written to {errors_path}.")
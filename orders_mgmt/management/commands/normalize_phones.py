@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders_mgmt.models import Customer
+from orders_mgmt.phone import InvalidPhoneNumber, normalize
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite customers' phone numbers in E.164 form, a batch at a time. Numbers that can't be "
+        "delivered to are listed and left as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Customers read and written per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing.')
+
+    def handle(self, *args, **options):
+        batch_size, dry_run = options['batch_size'], options['dry_run']
+        checked = updated = invalid = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination on pk, so each batch is an index range scan however far in we are
+            batch = list(Customer.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'code', 'phone')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            changed = []
+            for pk, code, phone in batch:
+                try:
+                    normalized = normalize(phone)
+                except InvalidPhoneNumber as e:
+                    invalid += 1
+                    self.stderr.write(f"{code}: {phone!r}: {e}")
+                    continue
+                if normalized != phone:
+                    changed.append(Customer(pk=pk, phone=normalized))
+            if changed and not dry_run:
+                with transaction.atomic():
+                    Customer.objects.bulk_update(changed, ['phone'])
+            checked += len(batch)
+            updated += len(changed)
+        verb = "Would normalize" if dry_run else "Normalized"
+        self.stdout.write(f"{verb} {updated} of {checked} phone number(s); {invalid} undeliverable.")
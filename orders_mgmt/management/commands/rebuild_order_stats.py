@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders_mgmt.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every customer's order count, total quantity and last order time from the Order table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read and written per batch.')
+
+    def handle(self, *args, **options):
+        written = rebuild_stats(options['batch_size'])
+        self.stdout.write(f"Rebuilt stats for {written} customer(s).")
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders_mgmt.metrics import start_metrics_server
+from orders_mgmt.sms import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Drain the outbound SMS queue, sending batches of queued messages through Africa's Talking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SMS_BATCH_SIZE, help='Messages claimed per batch.')
+        parser.add_argument('--max-wait', type=float, default=settings.SMS_BATCH_MAX_WAIT,
+                            help='Seconds to wait for a partial batch to fill before sending it.')
+        parser.add_argument('--interval', type=float, default=settings.SMS_WORKER_POLL_INTERVAL,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--metrics-port', type=int, default=settings.SMS_WORKER_METRICS_PORT,
+                            help='Port to serve Prometheus metrics on; 0 to not serve them.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        if options['metrics_port']:
+            start_metrics_server(options['metrics_port'])
+        try:
+            while True:
+                claimed = dispatch_pending(batch_size, options['max_wait'])
+                total += claimed
+                # A short batch means the queue is drained; failed sends wait for the next poll.
+                if claimed == batch_size:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Processed {total} message(s).")
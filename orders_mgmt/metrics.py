@@ -0,0 +1,235 @@
+"""Prometheus metrics: request latency, DB work per request and SMS gateway calls.
+
+Every gunicorn worker records into its own registry. With PROMETHEUS_MULTIPROC_DIR
+set (entrypoint.sh does), prometheus_client keeps the values in per-process files
+in that directory instead of in memory, and /metrics adds up the files of every
+worker, so a scrape sees the whole instance rather than whichever worker answered.
+The directory must be emptied when the server starts.
+
+The send_sms worker runs outside gunicorn, so its gateway and SMS metrics are
+served by start_metrics_server() on a port of its own. Both it and /metrics
+require METRICS_TOKEN.
+
+DB queries are counted by an execute wrapper installed on every connection. It
+adds to the stats of the request being handled, which are kept in a context
+variable so they follow the request into sync_to_async threads on ASGI.
+
+The PostgreSQL connection pool (orders_sms_service.postgresql) reports the wait
+for each connection and its size through observe_db_pool().
+"""
+import hmac
+import os
+import threading
+import time
+from contextvars import ContextVar
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, make_wsgi_app, multiprocess
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.',
+    ['method', 'route', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run while handling a request.',
+    ['route'], buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries while handling a request.',
+    ['route'],
+)
+GATEWAY_LATENCY = Histogram(
+    'sms_gateway_request_duration_seconds', 'Duration of each HTTP call to the SMS gateway, retries included separately.',
+    ['client', 'outcome'],
+)
+GATEWAY_ERRORS = Counter(
+    'sms_gateway_errors', 'SMS gateway calls that failed, by kind of failure.',
+    ['client', 'error'],
+)
+SMS_RESULTS = Counter(
+    'sms_messages', 'Outbound messages by the result of their send attempt.',
+    ['result'],
+)
+CUSTOMER_CACHE_LOOKUPS = Counter(
+    'customer_cache_lookups', 'Customer lookups by code, by whether the per-process cache had the customer.',
+    ['result'],
+)
+DB_POOL_WAIT = Histogram(
+    'db_pool_wait_seconds', 'Time taken to get a connection from the pool, a new connection included.',
+    ['alias'], buckets=POOL_WAIT_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts', 'Requests that gave up waiting for a pooled connection after DATABASE_POOL_TIMEOUT.',
+    ['alias'],
+)
+DB_POOL_CONNECTIONS_LOST = Counter(
+    'db_pool_connections_lost', 'Pooled connections found dead by the health check and replaced.',
+    ['alias'],
+)
+# Per worker, summed over the live ones; in_use / max is the pools' utilization
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections', 'Connections held by the workers\' pools: open, in use, and the most allowed.',
+    ['alias', 'state'], multiprocess_mode='livesum',
+)
+
+UNMATCHED_ROUTE = '<unmatched>'
+SMS_RESULT_NAMES = {'sent': 'sent', 'failed': 'failed', 'pending': 'retry'}  # OutboundSMS.status after an attempt
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created, dispatch_uid='metrics_instrument_connection')
+def instrument_new_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    # URL names rather than paths, so /api/orders/1/ and /api/orders/2/ share one series
+    return (match.view_name or match.route) if match else UNMATCHED_ROUTE
+
+
+def observe_request(request, response, started, stats):
+    route = route_of(request)
+    REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    REQUEST_QUERIES.labels(route).observe(stats.queries)
+    REQUEST_DB_TIME.labels(route).observe(stats.db_seconds)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    # Put first in MIDDLEWARE so the latency covers the rest of the stack. Streaming responses
+    # are timed to their first byte, since the body is produced after this returns.
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started, stats = time.perf_counter(), RequestStats()
+            token = _request_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                _request_stats.reset(token)
+            observe_request(request, response, started, stats)
+            return response
+    else:
+        def middleware(request):
+            started, stats = time.perf_counter(), RequestStats()
+            token = _request_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                _request_stats.reset(token)
+            observe_request(request, response, started, stats)
+            return response
+    return middleware
+
+
+def observe_gateway_call(client, started, error=None):
+    """Record one HTTP call to the gateway; `error` names the failure, e.g. 'ConnectError' or 'http_503'."""
+    GATEWAY_LATENCY.labels(client, 'error' if error else 'ok').observe(time.perf_counter() - started)
+    if error:
+        GATEWAY_ERRORS.labels(client, error).inc()
+
+
+def count_sms_results(messages):
+    """Count send attempts by outcome; a message given back to the queue counts as a retry."""
+    for sms in messages:
+        SMS_RESULTS.labels(SMS_RESULT_NAMES.get(sms.status, sms.status)).inc()
+
+
+def observe_db_pool(alias, stats, waited=None, timed_out=False):
+    """Record a pool's state from its pop_stats(), after a checkout that took `waited` seconds or a return."""
+    if waited is not None:
+        DB_POOL_WAIT.labels(alias).observe(waited)
+    if timed_out:
+        DB_POOL_TIMEOUTS.labels(alias).inc()
+    if stats.get('connections_lost'):
+        DB_POOL_CONNECTIONS_LOST.labels(alias).inc(stats['connections_lost'])
+    DB_POOL_CONNECTIONS.labels(alias, 'open').set(stats['pool_size'])
+    DB_POOL_CONNECTIONS.labels(alias, 'in_use').set(stats['pool_size'] - stats['pool_available'])
+    DB_POOL_CONNECTIONS.labels(alias, 'max').set(stats['pool_max'])
+
+
+def registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    return REGISTRY
+
+
+def authorized(authorization):
+    # Scrapes need METRICS_TOKEN as a bearer token; while it is unset, nothing is served
+    expected = settings.METRICS_TOKEN
+    supplied = authorization.removeprefix('Bearer ')
+    return bool(expected) and hmac.compare_digest(supplied.encode(), expected.encode())
+
+
+def metrics_view(request):
+    # GET /metrics in the Prometheus text format
+    if not authorized(request.headers.get('Authorization', '')):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, addr='0.0.0.0'):
+    """Serve this process's metrics on `port` from a daemon thread, for processes without a web server such as the SMS worker."""
+    app = make_wsgi_app(registry())
+
+    def protected(environ, start_response):
+        # Anything but /metrics is a 404, which App Engine accepts as the answer to /_ah/start
+        if environ.get('PATH_INFO') != '/metrics':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'']
+        if not authorized(environ.get('HTTP_AUTHORIZATION', '')):
+            start_response('403 Forbidden', [('Content-Type', 'text/plain')])
+            return [b'']
+        return app(environ, start_response)
+
+    server = make_server(addr, port, protected, ThreadingWSGIServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
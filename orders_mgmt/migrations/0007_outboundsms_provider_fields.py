@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0006_outboundsms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundsms',
+            name='cost',
+            field=models.CharField(blank=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='outboundsms',
+            name='provider_message_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0007_outboundsms_provider_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='orders_mgmt.customer'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'time', 'id'], name='order_customer_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['time', 'id'], name='order_time_idx'),
+        ),
+    ]
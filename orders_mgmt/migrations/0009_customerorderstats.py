@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def build_stats(apps, schema_editor):
+    Order = apps.get_model('orders_mgmt', 'Order')
+    CustomerOrderStats = apps.get_model('orders_mgmt', 'CustomerOrderStats')
+    totals = (
+        Order.objects.order_by()
+        .values('customer_id')
+        .annotate(order_count=Count('id'), total_quantity=Sum('quantity'), last_order_time=Max('time'))
+    )
+    CustomerOrderStats.objects.bulk_create([CustomerOrderStats(**row) for row in totals], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0008_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerOrderStats',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_stats', serialize=False, to='orders_mgmt.customer')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_quantity', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('last_order_time', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'customer order stats',
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
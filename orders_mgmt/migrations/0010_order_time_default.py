@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0009_customerorderstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='time',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
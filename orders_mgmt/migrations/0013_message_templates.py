@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0012_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='language',
+            field=models.CharField(default='en', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='outboundsms',
+            name='segments',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='MessageTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('language', models.CharField(max_length=10)),
+                ('body', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'language'), name='message_template_name_language_uniq')],
+            },
+        ),
+    ]
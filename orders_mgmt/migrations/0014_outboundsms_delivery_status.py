@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0013_message_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundsms',
+            name='delivery_error',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='outboundsms',
+            name='delivery_reported_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboundsms',
+            name='delivery_status',
+            field=models.CharField(blank=True, choices=[('submitted', 'Submitted'), ('delivered', 'Delivered'), ('failed', 'Failed')], max_length=10),
+        ),
+    ]
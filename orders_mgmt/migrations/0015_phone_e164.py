@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0014_outboundsms_delivery_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(max_length=16),
+        ),
+        migrations.AlterField(
+            model_name='outboundsms',
+            name='phone',
+            field=models.CharField(max_length=16),
+        ),
+    ]
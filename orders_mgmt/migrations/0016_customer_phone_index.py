@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders_mgmt', '0015_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone'], name='customer_phone_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -1,19 +1,143 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 
 class Customer(models.Model):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20, unique=True)
-    phone = models.CharField(max_length=15)
+    phone = models.CharField(max_length=16)  # E.164, normalized by CustomerSerializer (orders_mgmt.phone)
+    # Picks the MessageTemplate variant for the customer's SMS (see orders_mgmt.sms_templates)
+    language = models.CharField(max_length=10, default='en')
+
+    class Meta:
+        indexes = [
+            # Prefix search on phone in the admin; pattern ops so PostgreSQL can use it for LIKE '+2547%'
+            models.Index(fields=['phone'], name='customer_phone_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.code} - {self.phone}"
     
 class Order(models.Model):
-    customer = models.ForeignKey('orders_mgmt.Customer', on_delete=models.CASCADE)
+    # Lookups by customer use the leading column of order_customer_time_idx, so the FK needs no index of its own
+    customer = models.ForeignKey('orders_mgmt.Customer', on_delete=models.CASCADE, db_index=False)
     item = models.CharField(max_length=100)
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
-    time = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so import_orders can load historical orders with their original time
+    time = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # "orders for customer X in the last N days", newest first
+            models.Index(fields=['customer', 'time', 'id'], name='order_customer_time_idx'),
+            # time-range filters and the (time, id) cursor pagination
+            models.Index(fields=['time', 'id'], name='order_time_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.customer} - {self.item} - {self.quantity} - {self.time}"
\ No newline at end of file
+        return f"{self.customer} - {self.item} - {self.quantity} - {self.time}"
+
+
+class CustomerOrderStats(models.Model):
+    # Running totals per customer, maintained by orders_mgmt.stats as orders are created and
+    # deleted; `python manage.py rebuild_order_stats` recomputes them from the Order table.
+    customer = models.OneToOneField('orders_mgmt.Customer', on_delete=models.CASCADE, primary_key=True, related_name='order_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    last_order_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'customer order stats'
+
+    def __str__(self):
+        return f"{self.customer_id} - {self.order_count} - {self.total_quantity}"
+
+
+class OutboundSMS(models.Model):
+    # Durable outbox for gateway sends: rows are written in the order's transaction
+    # and drained by the send_sms management command.
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    class DeliveryStatus(models.TextChoices):
+        # From the gateway's delivery reports (orders_mgmt.delivery), once the message is sent
+        SUBMITTED = 'submitted', 'Submitted'
+        DELIVERED = 'delivered', 'Delivered'
+        FAILED = 'failed', 'Failed'
+
+    order = models.ForeignKey('orders_mgmt.Order', null=True, blank=True, on_delete=models.SET_NULL, related_name='sms_messages')
+    phone = models.CharField(max_length=16)
+    message = models.TextField()
+    segments = models.PositiveSmallIntegerField(default=1)  # SMS parts the message is billed as
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    provider_message_id = models.CharField(max_length=100, blank=True, db_index=True)
+    cost = models.CharField(max_length=30, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    delivery_status = models.CharField(max_length=10, choices=DeliveryStatus.choices, blank=True)
+    delivery_error = models.CharField(max_length=100, blank=True)
+    delivery_reported_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'outbound SMS'
+        verbose_name_plural = 'outbound SMS'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.phone} - {self.status} - {self.created_at}"
+
+
+class MessageTemplate(models.Model):
+    # Text of an SMS the service sends, per language; body placeholders are listed in
+    # orders_mgmt.sms_templates.PLACEHOLDERS.
+    name = models.CharField(max_length=50)
+    language = models.CharField(max_length=10)
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'language'], name='message_template_name_language_uniq'),
+        ]
+
+    def clean(self):
+        from orders_mgmt.sms_templates import CompiledTemplate
+        try:
+            CompiledTemplate(self.body)
+        except ValidationError as e:
+            raise ValidationError({'body': e.messages})
+
+    def __str__(self):
+        return f"{self.name} - {self.language}"
+
+
+class IdempotencyKey(models.Model):
+    # Idempotency-Key header of an order-creating POST (orders_mgmt.idempotency): claimed before
+    # the handler runs, then completed with the response in the transaction that saves the orders.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # null while in progress
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key} - {self.status_code}"
@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    # Newest first. DRF's cursor encodes the position on `time`; `id` breaks ties
+    # between orders created in the same instant (e.g. by /api/orders/bulk/).
+    ordering = ('-time', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class CustomerCursorPagination(CursorPagination):
+    ordering = ('id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,82 @@
+"""Phone numbers: normalization to E.164 and a prefix table of the mobile ranges we can deliver to.
+
+data/phone_prefixes.csv lists the number ranges the SMS gateway delivers to, with
+the country, carrier and cost tier of each and the full length of its numbers.
+Update the file as ranges are allocated; numbers outside it are rejected before
+a message is queued, instead of failing (and being charged) at the gateway.
+
+The table is loaded once per process and every prefix is expanded to the same
+length, so looking a number up is a single dict probe on its leading digits.
+"""
+import csv
+import re
+from collections import namedtuple
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+
+from django.conf import settings
+
+PREFIX_FILE = Path(__file__).resolve().parent / 'data' / 'phone_prefixes.csv'
+SEPARATORS = re.compile(r'[\s\-.()]')
+MAX_DIGITS = 15  # E.164
+
+PrefixInfo = namedtuple('PrefixInfo', ['country', 'carrier', 'cost_tier', 'length'])
+
+
+class InvalidPhoneNumber(ValueError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def prefix_table():
+    """(key length, {leading digits: PrefixInfo}), built from PREFIX_FILE on first use."""
+    with open(PREFIX_FILE, newline='') as f:
+        rows = list(csv.DictReader(f))
+    key_length = max(len(row['prefix']) for row in rows)
+    table = {}
+    # Shorter prefixes first, so a more specific range overrides the one it falls in
+    for row in sorted(rows, key=lambda row: len(row['prefix'])):
+        info = PrefixInfo(row['country'], row['carrier'], row['cost_tier'], int(row['length']))
+        for tail in product('0123456789', repeat=key_length - len(row['prefix'])):
+            table[row['prefix'] + ''.join(tail)] = info
+    return key_length, table
+
+
+def lookup(digits):
+    """PrefixInfo for an E.164 number's digits (no '+'), or None if we don't deliver to it."""
+    key_length, table = prefix_table()
+    info = table.get(digits[:key_length])
+    if info is None or len(digits) != info.length:
+        return None
+    return info
+
+
+def parse(raw):
+    """Normalize `raw` to E.164 and look it up. Returns (number, PrefixInfo).
+
+    Accepts '+254 712 345 678', '00254712345678', '254712345678' and the national
+    forms '0712345678' / '712345678' (in PHONE_DEFAULT_COUNTRY_CODE). Raises
+    InvalidPhoneNumber for anything that isn't a deliverable mobile number.
+    """
+    cleaned = SEPARATORS.sub('', raw or '')
+    if cleaned.startswith('+'):
+        candidates = [cleaned[1:]]
+    elif cleaned.startswith('00'):
+        candidates = [cleaned[2:]]
+    elif cleaned.startswith('0'):
+        candidates = [settings.PHONE_DEFAULT_COUNTRY_CODE + cleaned[1:]]
+    else:
+        # Either international without the '+' or national without the trunk 0
+        candidates = [cleaned, settings.PHONE_DEFAULT_COUNTRY_CODE + cleaned]
+    if not candidates[0].isdigit() or len(candidates[0]) > MAX_DIGITS:
+        raise InvalidPhoneNumber("Enter a phone number in international format, e.g. +254712345678.")
+    for digits in candidates:
+        info = lookup(digits)
+        if info is not None:
+            return f'+{digits}', info
+    raise InvalidPhoneNumber("Not a mobile number we can deliver SMS to.")
+
+
+def normalize(raw):
+    return parse(raw)[0]
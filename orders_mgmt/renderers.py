@@ -0,0 +1,37 @@
+"""JSON renderer built on orjson, for the hot read endpoints.
+
+orjson encodes dicts, lists, str, int and datetimes in C. Its output matches
+DRF's JSONRenderer for the data our views return:
+- compact, UTF-8, with U+2028/U+2029 escaped;
+- UTC datetimes end in 'Z';
+- Decimals are strings, as DecimalField renders them, so the values()-based list
+  pages (see FastListMixin in views.py) can pass model values straight through.
+Anything orjson doesn't know is handed to DRF's encoder.
+"""
+from decimal import Decimal
+
+import orjson
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+_drf_encoder = encoders.JSONEncoder()
+
+
+def default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return _drf_encoder.default(value)
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = OPTIONS
+        # orjson only indents by two; any ?indent / BrowsableAPI indent gets that
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=default, option=options)
+        # Escaped as DRF does, so the output stays a strict JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
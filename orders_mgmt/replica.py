@@ -0,0 +1,84 @@
+"""Safe reads of the order and customer API from a read replica.
+
+With DATABASE_REPLICA_URL set, settings adds a `replica` database. Views that
+opt in (ReplicaReadMixin in views.py) read this app's models from it while
+handling GET, HEAD and OPTIONS requests. That covers list, retrieve, export,
+stats and the dashboard's API calls.
+
+A replica lags the primary a little. A client that has just written is pinned:
+for REPLICA_PIN_SECONDS its reads stay on the primary, so it sees its own
+writes. Pins are kept in the shared cache, per user, so they hold across
+workers.
+
+ReplicaRouter sends every write to the primary. A read inside a transaction
+also goes to the primary, so a transaction sees its own writes. Other apps'
+tables, such as sessions, users and the database cache, always use the primary.
+Nothing is migrated on the replica; it is a copy of the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+REPLICA_APPS = {'orders_mgmt'}
+PIN_KEY = 'replica-pin:{}'
+
+_reads_from_replica = ContextVar('reads_from_replica', default=False)
+
+
+def configured():
+    return REPLICA in connections
+
+
+def pin(user):
+    """Keep `user`'s reads on the primary for REPLICA_PIN_SECONDS, after a write."""
+    if configured() and user.is_authenticated:
+        cache.set(PIN_KEY.format(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    # Anonymous clients can't be told apart, so they are never sent to the replica
+    return not user.is_authenticated or cache.get(PIN_KEY.format(user.pk), False)
+
+
+@contextmanager
+def request_scope():
+    """Reads go to the primary unless read_from_replica() is called inside; restored on exit."""
+    token = _reads_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _reads_from_replica.reset(token)
+
+
+def read_from_replica(user):
+    """Send the rest of the request's reads to the replica, if there is one and `user` isn't pinned."""
+    if configured() and not is_pinned(user):
+        _reads_from_replica.set(True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _reads_from_replica.get() or model._meta.app_label not in REPLICA_APPS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # Explicit, since Django would otherwise save an instance to the database it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same rows on both sides
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            return False
+        return None
@@ -1,12 +1,106 @@
+from django.conf import settings
 from rest_framework import serializers
-from orders_mgmt.models import Customer, Order
+from orders_mgmt import customer_cache
+from orders_mgmt.phone import InvalidPhoneNumber, normalize as normalize_phone
+from orders_mgmt.models import Customer, CustomerOrderStats, Order, OutboundSMS
 
 class CustomerSerializer(serializers.ModelSerializer):
+    phone = serializers.CharField(max_length=32)  # as entered; stored as E.164
+
     class Meta:
         model = Customer
-        fields = ['id', 'name', 'code', 'phone']
+        fields = ['id', 'name', 'code', 'phone', 'language']
+
+    def validate_phone(self, value):
+        try:
+            return normalize_phone(value)
+        except InvalidPhoneNumber as e:
+            raise serializers.ValidationError(str(e))
+
+class CustomerOrderStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomerOrderStats
+        fields = ['customer', 'order_count', 'total_quantity', 'last_order_time']
+
+class CustomerField(serializers.PrimaryKeyRelatedField):
+    # Resolves against customers preloaded by OrderListSerializer when present,
+    # so a bulk request does one customer query instead of one per row.
+    def to_internal_value(self, data):
+        customers = self.context.get('customers')
+        if customers is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            customer = customers.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if customer is None:
+            self.fail('does_not_exist', pk_value=data)
+        return customer
+
+class OrderListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids, codes = set(), set()
+            for item in data:
+                try:
+                    ids.add(int(item['customer']))
+                except (TypeError, ValueError, KeyError):
+                    pass  # reported by the row's own validation
+                try:
+                    codes.add(str(item['customer_code']))
+                except (TypeError, KeyError):
+                    pass
+            self.context['customers'] = Customer.objects.in_bulk(ids)
+            self.context['customers_by_code'] = customer_cache.get_many(codes)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        return Order.objects.bulk_create([Order(**attrs) for attrs in validated_data])
 
 class OrderSerializer(serializers.ModelSerializer):
+    customer = CustomerField(queryset=Customer.objects.all(), required=False)
+    # Alternative to `customer` for integrations that only know the code
+    customer_code = serializers.CharField(max_length=20, write_only=True, required=False)
+    delivery_status = serializers.SerializerMethodField()
+
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'item', 'quantity', 'time']        
\ No newline at end of file
+        fields = ['id', 'customer', 'customer_code', 'item', 'quantity', 'time', 'delivery_status']
+        list_serializer_class = OrderListSerializer
+
+    def validate_customer_code(self, value):
+        # From the per-process cache (orders_mgmt.customer_cache), or the codes OrderListSerializer preloaded
+        customers = self.context.get('customers_by_code')
+        customer = customers.get(value) if customers is not None else customer_cache.get(value)
+        if customer is None:
+            raise serializers.ValidationError(f"No customer with code '{value}'.")
+        return customer
+
+    def validate(self, attrs):
+        by_code = attrs.pop('customer_code', None)
+        if by_code is not None:
+            if 'customer' in attrs and attrs['customer'].pk != by_code.pk:
+                raise serializers.ValidationError({'customer_code': "Does not match the customer given."})
+            attrs['customer'] = by_code
+        elif 'customer' not in attrs and not self.partial:
+            raise serializers.ValidationError({'customer': "Either customer or customer_code is required."})
+        return attrs
+
+    def get_delivery_status(self, order):
+        # Annotated by OrderViewSet.get_queryset; an order saved by this request has just queued its SMS
+        return getattr(order, 'delivery_status', OutboundSMS.Status.PENDING)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # ?expand=customer inlines the customer; the view select_related()s it for this case
+        if 'customer' in self.context.get('expand', ()):
+            fields['customer'] = CustomerSerializer(read_only=True)
+        return fields
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        kwargs.setdefault('allow_empty', False)
+        kwargs.setdefault('max_length', settings.ORDERS_BULK_MAX_SIZE)
+        return super().many_init(*args, **kwargs)
@@ -0,0 +1,189 @@
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from orders_mgmt import metrics, phone, sms_templates
+from orders_mgmt.gateway import get_async_client, get_client, may_have_been_sent
+from orders_mgmt.models import OutboundSMS
+
+logger = logging.getLogger(__name__)
+
+BATCH_POLL_INTERVAL = 0.1  # seconds between claims while a batch is filling
+# Africa's Talking statusCodes for a recipient the gateway accepted (Processed, Sent, Queued)
+ACCEPTED_STATUS_CODES = {100, 101, 102}
+RESULT_FIELDS = ['status', 'sent_at', 'provider_message_id', 'cost', 'response', 'error']
+
+
+def confirmation_message(order):
+    return sms_templates.render(sms_templates.ORDER_CONFIRMATION, order)
+
+
+def confirmation(order):
+    message = confirmation_message(order)
+    sms = OutboundSMS(order=order, phone=order.customer.phone, message=message, segments=sms_templates.count_segments(message).count)
+    try:
+        sms.phone = phone.normalize(sms.phone)
+    except phone.InvalidPhoneNumber as e:
+        # Recorded but never queued: the gateway would reject the number and still charge for it
+        sms.status = OutboundSMS.Status.FAILED
+        sms.error = str(e)
+    return sms
+
+
+def enqueue_confirmation(order, claimed=False):
+    # Must run inside the transaction that saves the order so both rows commit together.
+    # `claimed` rows are sent by the caller straight away; workers only pick them up
+    # if the caller never records a result (see claim_pending).
+    sms = confirmation(order)
+    if claimed and sms.status == OutboundSMS.Status.PENDING:
+        sms.status = OutboundSMS.Status.SENDING
+        sms.claimed_at = timezone.now()
+        sms.attempts = 1
+    sms.save()
+    return sms
+
+
+def enqueue_confirmations(orders):
+    # Bulk counterpart of enqueue_confirmation; same transaction rule applies.
+    return OutboundSMS.objects.bulk_create([confirmation(order) for order in orders])
+
+
+def send_sms(to, message):
+    return get_client().send(to, message)
+
+
+def claim_pending(limit):
+    """Mark up to `limit` queued messages as sending and return them.
+
+    Rows left in `sending` by a worker that died are picked up again once
+    SMS_CLAIM_TIMEOUT has passed.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.SMS_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        ids = list(
+            OutboundSMS.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status=OutboundSMS.Status.PENDING) | Q(status=OutboundSMS.Status.SENDING, claimed_at__lt=stale))
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboundSMS.objects.filter(id__in=ids).update(
+            status=OutboundSMS.Status.SENDING,
+            claimed_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+    return list(OutboundSMS.objects.filter(id__in=ids).order_by('id'))
+
+
+def collect_batch(batch_size, max_wait=0):
+    """Claim messages until `batch_size` are held or `max_wait` seconds have passed."""
+    deadline = time.monotonic() + max_wait
+    batch = claim_pending(batch_size)
+    while len(batch) < batch_size and time.monotonic() < deadline:
+        time.sleep(min(BATCH_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        batch += claim_pending(batch_size - len(batch))
+    return batch
+
+
+def group_by_message(batch):
+    groups = defaultdict(list)
+    for sms in batch:
+        groups[sms.message].append(sms)
+    return groups
+
+
+def recipients_by_number(response_data):
+    recipients = defaultdict(deque)
+    for recipient in response_data.get('SMSMessageData', {}).get('Recipients', []):
+        recipients[recipient.get('number')].append(recipient)
+    return recipients
+
+
+def mark_sent(sms, recipient, now):
+    sms.status = OutboundSMS.Status.SENT
+    sms.sent_at = now
+    sms.provider_message_id = recipient.get('messageId', '')
+    sms.cost = recipient.get('cost', '')
+    sms.response = recipient
+    sms.error = ''
+
+
+def mark_failed(sms, error, response=None, retry=True):
+    # Give the message back to the queue until it runs out of attempts. `retry=False` is for
+    # failures after which the gateway may already have the message: sending again could bill twice.
+    if retry and sms.attempts < settings.SMS_MAX_ATTEMPTS:
+        sms.status = OutboundSMS.Status.PENDING
+    else:
+        sms.status = OutboundSMS.Status.FAILED
+    sms.response = response
+    sms.error = str(error)
+
+
+def record_result(sms, response_data, recipients, now):
+    queue = recipients.get(sms.phone)
+    if not queue:
+        # The gateway took the call, so it may have sent this one under a number written differently
+        logger.warning("SMS %s to %s has no recipient entry in the gateway reply: %s", sms.id, sms.phone, response_data)
+        mark_failed(sms, "No recipient entry in gateway response", response_data, retry=False)
+        return
+    recipient = queue.popleft()
+    if recipient.get('statusCode') in ACCEPTED_STATUS_CODES:
+        mark_sent(sms, recipient, now)
+    else:
+        mark_failed(sms, recipient.get('status', 'Rejected by gateway'), recipient)
+
+
+def dispatch_batch(batch):
+    """Send claimed messages, one gateway call per distinct message body.
+
+    Africa's Talking takes a comma-separated `to` list, so every message with
+    the same text goes out in a single request. Each recipient entry in the
+    reply is matched back to its row by phone number. Returns the number of
+    gateway calls made.
+    """
+    now = timezone.now()
+    groups = group_by_message(batch)
+    for message, messages in groups.items():
+        try:
+            response_data = send_sms(','.join(sms.phone for sms in messages), message)
+        except Exception as e:
+            logger.warning("SMS batch of %s to gateway failed: %s", len(messages), e)
+            for sms in messages:
+                mark_failed(sms, e, retry=not may_have_been_sent(e))
+            continue
+        recipients = recipients_by_number(response_data)
+        for sms in messages:
+            record_result(sms, response_data, recipients, now)
+    OutboundSMS.objects.bulk_update(batch, RESULT_FIELDS)
+    metrics.count_sms_results(batch)
+    return len(groups)
+
+
+def dispatch_pending(limit=None, max_wait=0):
+    """Send one batch of queued messages. Returns how many were claimed."""
+    batch = collect_batch(limit or settings.SMS_BATCH_SIZE, max_wait)
+    if batch:
+        dispatch_batch(batch)
+    return len(batch)
+
+
+async def send_claimed_async(sms):
+    """Send a message claimed by the caller through the async gateway client and save the result."""
+    try:
+        response_data = await get_async_client().send(sms.phone, sms.message)
+    except Exception as e:
+        logger.warning("SMS %s to %s failed: %s", sms.id, sms.phone, e)
+        mark_failed(sms, e, retry=not may_have_been_sent(e))
+    else:
+        record_result(sms, response_data, recipients_by_number(response_data), timezone.now())
+    await sms.asave(update_fields=RESULT_FIELDS)
+    metrics.count_sms_results([sms])
+    return sms
@@ -0,0 +1,143 @@
+"""Confirmation texts from MessageTemplate rows, compiled once per process.
+
+A template body uses `{placeholder}` fields from PLACEHOLDERS, e.g.
+"Hello {customer_name}, your order for {quantity} of {item} has been placed." It is
+compiled into a %-format string and one attrgetter that fetches every placeholder
+in a single C call, so rendering a message is that call and one % operation.
+
+The template for each (name, language) is resolved, with its fallbacks, and kept
+per process for SMS_TEMPLATE_CACHE_TTL seconds. Saving or deleting a template drops
+the copies in the process that made the change at once; other workers pick the
+change up when their copies expire.
+"""
+import string
+import time
+from collections import namedtuple
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from orders_mgmt.models import MessageTemplate
+
+ORDER_CONFIRMATION = 'order_confirmation'
+# Used when no MessageTemplate row exists for the name in the customer's or the default language
+DEFAULT_BODIES = {
+    # No {order_id} or {time}: those make every body unique, and only identical bodies share a gateway call
+    ORDER_CONFIRMATION: "Hello {customer_name}, your order for {quantity} of {item} has been placed.",
+}
+# Placeholder -> attribute path on the Order
+PLACEHOLDERS = {
+    'customer_name': 'customer.name',
+    'customer_code': 'customer.code',
+    'order_id': 'id',
+    'item': 'item',
+    'quantity': 'quantity',
+    'time': 'time',
+}
+
+_formatter = string.Formatter()
+_resolved = {}  # (name, language) -> (CompiledTemplate, expires at)
+
+
+class CompiledTemplate:
+    __slots__ = ('text', 'values', 'single')
+
+    def __init__(self, body):
+        chunks, paths = [], []
+        try:
+            parsed = list(_formatter.parse(body))
+        except ValueError as e:
+            raise ValidationError(f"Invalid template: {e}.")
+        for literal, field, spec, conversion in parsed:
+            chunks.append(literal.replace('%', '%%'))
+            if field is None:
+                continue
+            if field not in PLACEHOLDERS:
+                raise ValidationError(f"Unknown placeholder {{{field}}}. Use one of: {', '.join(PLACEHOLDERS)}.")
+            if spec or conversion:
+                raise ValidationError(f"Placeholder {{{field}}} can't have a format spec or conversion.")
+            chunks.append('%s')
+            paths.append(PLACEHOLDERS[field])
+        self.text = ''.join(chunks)
+        self.values = attrgetter(*paths) if paths else None
+        self.single = len(paths) == 1  # attrgetter returns a bare value rather than a tuple
+
+    def render(self, order):
+        if self.values is None:
+            return self.text % ()
+        values = self.values(order)
+        return self.text % ((values,) if self.single else values)
+
+
+def load(name, language):
+    languages = {language, settings.SMS_DEFAULT_LANGUAGE}
+    bodies = dict(MessageTemplate.objects.filter(name=name, language__in=languages).values_list('language', 'body'))
+    body = bodies.get(language) or bodies.get(settings.SMS_DEFAULT_LANGUAGE) or DEFAULT_BODIES[name]
+    return CompiledTemplate(body)
+
+
+def resolve(name, language):
+    """The template for `language`, falling back to SMS_DEFAULT_LANGUAGE, then the built-in text."""
+    key = (name, language)
+    entry = _resolved.get(key)
+    now = time.monotonic()
+    if entry is None or entry[1] < now:
+        entry = _resolved[key] = (load(name, language), now + settings.SMS_TEMPLATE_CACHE_TTL)
+    return entry[0]
+
+
+def render(name, order):
+    return resolve(name, order.customer.language).render(order)
+
+
+def clear_cache():
+    _resolved.clear()
+
+
+@receiver([post_save, post_delete], sender=MessageTemplate, dispatch_uid='sms_templates_invalidate')
+def invalidate(sender, instance, **kwargs):
+    # Other languages may have fallen back to this row, so drop them all; edits are rare
+    clear_cache()
+
+
+# GSM 03.38: the basic character set costs one septet, the extension table two (escape + char)
+GSM_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM_EXTENDED = frozenset("^{}\\[~]|€\f")
+GSM_CHARS = GSM_BASIC | GSM_EXTENDED
+# Characters per SMS: (single message, each part of a concatenated one, whose header takes the rest)
+GSM7_LIMITS = (160, 153)
+UCS2_LIMITS = (70, 67)
+
+Segments = namedtuple('Segments', ['encoding', 'units', 'count'])
+
+
+def count_segments(text):
+    """How many SMS parts `text` is sent as, and in which encoding.
+
+    `units` is septets for GSM-7 and UTF-16 code units for UCS-2. A two-unit character
+    (GSM extension or UCS-2 surrogate pair) is never split across parts.
+    """
+    if GSM_CHARS.issuperset(text):
+        encoding, single, part = 'GSM-7', *GSM7_LIMITS
+        widths = [2 if ch in GSM_EXTENDED else 1 for ch in text] if not GSM_EXTENDED.isdisjoint(text) else None
+    else:
+        encoding, single, part = 'UCS-2', *UCS2_LIMITS
+        astral = not text.isascii() and any(ord(ch) > 0xFFFF for ch in text)
+        widths = [2 if ord(ch) > 0xFFFF else 1 for ch in text] if astral else None
+    units = len(text) if widths is None else sum(widths)
+    if units <= single:
+        return Segments(encoding, units, 1 if units else 0)
+    if widths is None:
+        return Segments(encoding, units, -(-units // part))
+    count, used = 1, 0
+    for width in widths:
+        if used + width > part:
+            count, used = count + 1, 0
+        used += width
+    return Segments(encoding, units, count)
@@ -0,0 +1,86 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+
+from orders_mgmt.models import CustomerOrderStats, Order
+
+STATS_TABLE = CustomerOrderStats._meta.db_table
+
+# One statement per batch of customers: new rows are inserted, existing ones have the deltas
+# added. ON CONFLICT ... DO UPDATE is shared by PostgreSQL and SQLite (3.24+).
+UPSERT_SQL = f"""
+    INSERT INTO {STATS_TABLE} (customer_id, order_count, total_quantity, last_order_time)
+    VALUES {{values}}
+    ON CONFLICT (customer_id) DO UPDATE SET
+        order_count = {STATS_TABLE}.order_count + excluded.order_count,
+        total_quantity = {STATS_TABLE}.total_quantity + excluded.total_quantity,
+        last_order_time = CASE
+            WHEN {STATS_TABLE}.last_order_time IS NULL OR excluded.last_order_time > {STATS_TABLE}.last_order_time
+            THEN excluded.last_order_time
+            ELSE {STATS_TABLE}.last_order_time
+        END
+"""
+UPSERT_BATCH_SIZE = 500
+
+
+def summarize(orders):
+    totals = defaultdict(lambda: [0, Decimal(0), None])
+    for order in orders:
+        total = totals[order.customer_id]
+        total[0] += 1
+        total[1] += Decimal(order.quantity)
+        if total[2] is None or order.time > total[2]:
+            total[2] = order.time
+    return totals
+
+
+def record_orders(orders):
+    """Add newly created orders to their customers' stats. Call inside the creating transaction."""
+    field = CustomerOrderStats._meta.get_field
+    ops = connection.ops
+    rows = [
+        (
+            customer_id,
+            count,
+            ops.adapt_decimalfield_value(quantity, field('total_quantity').max_digits, field('total_quantity').decimal_places),
+            ops.adapt_datetimefield_value(last_time),
+        )
+        for customer_id, (count, quantity, last_time) in summarize(orders).items()
+    ]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            cursor.execute(UPSERT_SQL.format(values=values), [value for row in batch for value in row])
+
+
+def remove_orders(orders):
+    """Take deleted orders out of their customers' stats. Call after the delete, in its transaction."""
+    for customer_id, (count, quantity, last_time) in summarize(orders).items():
+        stats = CustomerOrderStats.objects.select_for_update().filter(customer_id=customer_id).first()
+        if stats is None:
+            continue
+        stats.order_count = max(stats.order_count - count, 0)
+        stats.total_quantity -= quantity
+        if stats.last_order_time is not None and last_time >= stats.last_order_time:
+            # Latest order went away; one index lookup on (customer, time) finds the new latest
+            stats.last_order_time = Order.objects.filter(customer_id=customer_id).aggregate(Max('time'))['time__max']
+        stats.save()
+
+
+def rebuild_stats(batch_size=1000):
+    """Recompute every customer's stats from the Order table. Returns the number of rows written."""
+    totals = (
+        Order.objects.order_by()
+        .values('customer_id')
+        .annotate(order_count=Count('id'), total_quantity=Sum('quantity'), last_order_time=Max('time'))
+    )
+    with transaction.atomic():
+        CustomerOrderStats.objects.all().delete()
+        written = CustomerOrderStats.objects.bulk_create(
+            (CustomerOrderStats(**row) for row in totals.iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+        )
+    return len(written)
@@ -0,0 +1,23 @@
+import pytest
+from django.core.cache import cache
+from orders_mgmt import customer_cache, sms_templates
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    # A fresh in-process cache per test keeps throttle counters and cached tokens out of the
+    # query counts and away from other tests; test_cache.py switches to the shared backends.
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_templates():
+    # Compiled templates outlive the test transaction that created their rows
+    sms_templates.clear_cache()
+
+
+@pytest.fixture(autouse=True)
+def fresh_customer_cache():
+    # Cached customers would otherwise carry ids from one test's rolled-back rows into the next
+    customer_cache.clear_cache()
@@ -0,0 +1,81 @@
+"""Local stand-in for the Africa's Talking messaging endpoint.
+
+Runs an HTTP/1.1 server on a background thread and answers every POST with
+an Africa's Talking style reply, one accepted recipient per number in `to`.
+Used by the tests and the benchmarks in /benchmarks.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateway
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        gateway = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        data = {key: values[0] for key, values in parse_qs(body).items()}
+        with gateway.lock:
+            gateway.requests.append(data)
+            failure = gateway.failures.pop(0) if gateway.failures else None
+        if gateway.latency:
+            time.sleep(gateway.latency)
+        if failure:
+            return self.reply(failure, {'error': 'stub failure'})
+        recipients = [
+            {
+                'statusCode': 101,
+                'number': number,
+                'status': 'Success',
+                'cost': 'KES 0.8000',
+                'messageId': f"ATXid_stub_{next(gateway.message_ids)}",
+            }
+            for number in data.get('to', '').split(',')
+        ]
+        self.reply(201, {'SMSMessageData': {'Message': f"Sent to {len(recipients)}", 'Recipients': recipients}})
+
+    def reply(self, status, payload):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), StubGatewayHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = []
+        self.failures = []  # status codes to return for the next N requests
+        self.connections = 0
+        self.message_ids = itertools.count(1)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/version1/messaging"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
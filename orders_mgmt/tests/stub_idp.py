@@ -0,0 +1,103 @@
+"""Local stand-in for the OIDC identity provider (Auth0).
+
+Serves a JWKS document and a userinfo endpoint on a background thread and
+signs RS256 access tokens with its own keys. Every request is recorded in
+`requests` as (method, path) so tests can check which calls reached the IdP.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+from josepy import JWKRSA, JWS, RS256
+
+
+class StubIdPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        idp = self.server
+        with idp.lock:
+            idp.requests.append(('GET', self.path))
+        if self.path == '/.well-known/jwks.json':
+            return self.reply(200, {'keys': [jwk for _, jwk in idp.keys.values()]})
+        if self.path == '/userinfo':
+            token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+            claims = idp.userinfo.get(token)
+            if claims is None:
+                return self.reply(401, {}, {'WWW-Authenticate': 'Bearer error="invalid_token", error_description="Unknown token"'})
+            return self.reply(200, claims)
+        self.reply(404, {})
+
+    def reply(self, status, payload, headers=None):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubIdP(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubIdPHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.keys = {}  # kid -> (private JWK, public JWK json)
+        self.userinfo = {}  # access token -> claims returned by /userinfo
+        self.kid = self.add_key('key-1')
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def jwks_url(self):
+        return f"{self.base_url}/.well-known/jwks.json"
+
+    @property
+    def userinfo_url(self):
+        return f"{self.base_url}/userinfo"
+
+    def add_key(self, kid):
+        private = JWKRSA(key=rsa.generate_private_key(public_exponent=65537, key_size=2048))
+        public = dict(private.public_key().to_json(), kid=kid, alg='RS256', use='sig')
+        self.keys[kid] = (private, public)
+        return kid
+
+    def rotate(self, kid):
+        """Start signing with a new key; the old one stays in the JWKS."""
+        self.kid = self.add_key(kid)
+
+    def issue(self, email, expires_in=3600, kid=None, register=True, **claims):
+        """Sign an access token for `email`. Registered tokens are accepted by /userinfo."""
+        kid = kid or self.kid
+        claims = {'sub': f"auth0|{email}", 'exp': int(time.time()) + expires_in, **claims}
+        token = JWS.sign(
+            json.dumps(claims).encode(), key=self.keys[kid][0], alg=RS256,
+            include_jwk=False, kid=kid, protect=frozenset(['alg', 'kid']),
+        ).to_compact().decode()
+        if register:
+            self.userinfo[token] = {'sub': claims['sub'], 'email': email}
+        return token
+
+    def calls(self, path):
+        with self.lock:
+            return sum(1 for _, requested in self.requests if requested == path)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,79 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from orders_mgmt.models import Customer, Order
+
+
+@pytest.fixture
+def superuser_client(client):
+    client.force_login(User.objects.create_superuser('admin', password="x"))
+    session = client.session
+    session['oidc_id_token_expiration'] = 2 ** 40  # or SessionRefresh sends the GETs to Auth0
+    session.save()
+    return client
+
+
+def add_orders(count):
+    customers = Customer.objects.bulk_create([
+        Customer(name=f"Customer {i}", code=f"A{Customer.objects.count() + i:04d}", phone=f"+2547123{i:05d}") for i in range(count)
+    ])
+    Order.objects.bulk_create([Order(customer=customer, item="phone", quantity=1) for customer in customers])
+
+
+@pytest.mark.django_db
+class TestAdmin:
+    def changelist_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get(url).status_code == 200
+        return len(queries)
+
+    def test_order_changelist_queries_do_not_grow_with_rows(self, superuser_client):
+        url = reverse('admin:orders_mgmt_order_changelist')
+        add_orders(3)
+        few = self.changelist_queries(superuser_client, url)
+        add_orders(40)
+        assert self.changelist_queries(superuser_client, url) == few
+        # Session, user, count, rows joined with their customers, and the date hierarchy's range and years
+        assert few <= 6
+
+    def test_customer_changelist_queries_do_not_grow_with_rows(self, superuser_client):
+        url = reverse('admin:orders_mgmt_customer_changelist')
+        add_orders(3)
+        few = self.changelist_queries(superuser_client, url)
+        add_orders(40)
+        assert self.changelist_queries(superuser_client, url) == few
+
+    def test_order_form_uses_autocomplete(self, superuser_client):
+        add_orders(5)
+        content = superuser_client.get(reverse('admin:orders_mgmt_order_add')).content.decode()
+        assert 'admin-autocomplete' in content
+        assert "Customer 4" not in content
+        response = superuser_client.get(reverse('admin:autocomplete'), {
+            'app_label': 'orders_mgmt', 'model_name': 'order', 'field_name': 'customer', 'term': "A0003",
+        })
+        assert [row['text'] for row in response.json()['results']] == [str(Customer.objects.get(code="A0003"))]
+
+    @pytest.mark.parametrize('term, codes', [
+        ("A0001", ["A0001"]),
+        ("A000", []),  # codes match exactly
+        ("+25471230000", ["A0000", "A0001", "A0002"]),
+        ("0712300001", ["A0001"]),  # complete numbers in national format too
+    ])
+    def test_customer_search(self, superuser_client, term, codes):
+        add_orders(3)
+        response = superuser_client.get(reverse('admin:orders_mgmt_customer_changelist'), {'q': term})
+        assert sorted(customer.code for customer in response.context['cl'].result_list) == codes
+
+    def test_estimated_count_for_big_tables(self, superuser_client, mocker, settings):
+        settings.ADMIN_EXACT_COUNT_LIMIT = 1000
+        add_orders(3)
+        estimate = mocker.patch('orders_mgmt.admin.estimated_row_count', return_value=2000000)
+        url = reverse('admin:orders_mgmt_order_changelist')
+        assert superuser_client.get(url).context['cl'].result_count == 2000000
+        # Filtered lists are counted exactly
+        assert superuser_client.get(url, {'q': "A0001"}).context['cl'].result_count == 1
+        # and so are tables the estimate says are small
+        estimate.return_value = 500
+        assert superuser_client.get(url).context['cl'].result_count == 3
@@ -0,0 +1,117 @@
+import gzip
+import json
+import pytest
+from datetime import datetime, timezone
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt.models import Customer, CustomerOrderStats, Order, OutboundSMS
+from orders_mgmt.stats import record_orders
+
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def archive_dir(settings, tmp_path):
+    settings.ORDERS_ARCHIVE_DIR = str(tmp_path / "archive")
+    return tmp_path / "archive"
+
+
+@pytest.mark.django_db
+class TestArchiveOrders:
+    def setup_method(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+        self.customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        self.other = Customer.objects.create(name="Jane Doe", code="C002", phone="+254700000001")
+        self.orders = Order.objects.bulk_create([
+            Order(customer=self.customer, item="phone", quantity=1, time=at(2025, 1, 1, 10)),
+            Order(customer=self.other, item="case", quantity=2, time=at(2025, 1, 1, 23, 59)),
+            Order(customer=self.customer, item="charger", quantity=3, time=at(2025, 1, 2, 0, 30)),
+            Order(customer=self.customer, item="phone", quantity=1, time=at(2025, 3, 15, 8)),
+            Order(customer=self.customer, item="phone", quantity=1, time=at(2025, 7, 1)),
+        ])
+        record_orders(self.orders)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_orders', *args, stdout=out)
+        return out.getvalue()
+
+    def fetch(self, **params):
+        response = self.client.get(reverse('order-archived'), {'output': 'ndjson', **params})
+        assert response.status_code == status.HTTP_200_OK
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_moves_old_orders_to_daily_files(self, archive_dir):
+        sms = OutboundSMS.objects.create(order=self.orders[0], phone=self.customer.phone, message="Hi")
+        output = self.archive('--before', '2025-06-01', '--batch-size', '2')
+        assert list(Order.objects.values_list('id', flat=True)) == [self.orders[4].id]
+        assert "Archived 4 order(s)" in output
+        assert "rows/s" in output and "from 5 to 1 rows (-80.0%)" in output
+        assert sorted(path.name for path in archive_dir.iterdir()) == ["date=2025-01-01", "date=2025-01-02", "date=2025-03-15"]
+        with gzip.open(next((archive_dir / "date=2025-01-01").glob("*.ndjson.gz")), 'rt') as f:
+            assert json.loads(f.readline())["customer_code"] == "C001"
+        # The SMS history stays, and so do the customer's all-time stats
+        sms.refresh_from_db()
+        assert sms.order_id is None
+        assert CustomerOrderStats.objects.get(customer=self.customer).order_count == 4
+
+    def test_archived_rows_match_the_export(self, archive_dir):
+        params = {'since': "2025-01-01", 'until': "2025-06-01", 'output': 'ndjson'}
+        exported = b''.join(self.client.get(reverse('order-export'), params).streaming_content)
+        self.archive('--before', '2025-06-01')
+        archived = b''.join(self.client.get(reverse('order-archived'), params).streaming_content)
+        assert archived == exported
+
+    def test_reads_only_the_range_asked_for(self, archive_dir):
+        self.archive('--before', '2025-06-01')
+        rows = self.fetch(since="2025-01-01T12:00:00Z", until="2025-01-02T01:00:00Z")
+        assert [row['item'] for row in rows] == ["case", "charger"]
+        assert [row['item'] for row in self.fetch(since="2025-01-01", until="2025-12-31", customer_code="C002")] == ["case"]
+        assert len(self.fetch(since="2025-01-01", until="2025-12-31", customer=self.customer.id, item="phone")) == 2
+        response = self.client.get(reverse('order-archived'), {'since': "2025-01-01", 'until': "2025-01-02"})
+        assert response['Content-Type'] == 'text/csv'
+        assert len(b''.join(response.streaming_content).decode().splitlines()) == 3  # header and 2 rows
+
+    def test_range_is_required(self, archive_dir):
+        response = self.client.get(reverse('order-archived'), {'since': "2025-01-01"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'until' in response.data
+        assert self.fetch(since="2020-01-01", until="2020-02-01") == []
+
+    def test_dry_run(self, archive_dir):
+        output = self.archive('--before', '2025-06-01', '--batch-size', '1', '--dry-run')
+        assert "Would archive 4 of 5" in output
+        assert Order.objects.count() == 5
+        assert not archive_dir.exists()
+
+    def test_interrupted_run_is_not_duplicated(self, archive_dir, mocker):
+        mocker.patch('django.db.models.query.QuerySet.delete', side_effect=RuntimeError("connection lost"))
+        with pytest.raises(RuntimeError):
+            self.archive('--before', '2025-06-01', '--batch-size', '3')
+        assert Order.objects.count() == 5
+        mocker.stopall()
+        # An import of older orders in between shifts the next run's batches, so its files overlap the first run's
+        earlier = Order.objects.create(customer=self.customer, item="sim", quantity=1, time=at(2025, 1, 1, 9))
+        self.archive('--before', '2025-06-01', '--batch-size', '3')
+        assert len(list(archive_dir.glob("date=2025-01-01/*.ndjson.gz"))) == 2
+        rows = self.fetch(since="2025-01-01", until="2025-06-01")
+        assert [row['id'] for row in rows] == [earlier.id] + [order.id for order in self.orders[:4]]
+
+    def test_archive_dir_must_be_set(self, settings):
+        settings.ORDERS_ARCHIVE_DIR = ''
+        with pytest.raises(CommandError, match="ORDERS_ARCHIVE_DIR"):
+            self.archive('--before', '2025-06-01')
+        assert Order.objects.count() == 5
+        assert self.fetch(since="2025-01-01", until="2025-06-01") == []
+
+    def test_invalid_before(self, archive_dir):
+        with pytest.raises(CommandError):
+            self.archive('--before', 'last year')
@@ -0,0 +1,77 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.urls import reverse
+from orders_mgmt.gateway import reset_client
+from orders_mgmt.models import Customer, Order, OutboundSMS
+from orders_mgmt.tests.stub_gateway import StubGateway
+
+
+@pytest.fixture
+def gateway(settings):
+    with StubGateway() as stub:
+        settings.MESSAGING_URL = stub.url
+        reset_client()
+        yield stub
+    reset_client()
+
+
+@pytest.mark.django_db
+class TestAsyncOrderCreate:
+    def setup_method(self):
+        self.client = AsyncClient()
+        self.url = reverse('order-create-async')
+
+    @pytest.fixture
+    def customer(self):
+        return Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+
+    def post(self, data):
+        return async_to_sync(self.client.post)(self.url, data, content_type='application/json')
+
+    def login(self):
+        self.client.force_login(User.objects.create_user('staff'))
+
+    def test_unauthenticated(self, customer):
+        response = self.post({"customer": customer.id, "item": "phone", "quantity": 99})
+        assert response.status_code == 401
+        assert not Order.objects.exists()
+
+    def test_invalid_data(self, customer):
+        self.login()
+        response = self.post({"customer": customer.id, "quantity": 99})
+        assert response.status_code == 400
+        assert "item" in response.json()
+
+    def test_create_sends_inline(self, customer, gateway):
+        self.login()
+        response = self.post({"customer": customer.id, "item": "phone", "quantity": 99})
+        assert response.status_code == 201
+        assert response.json()['item'] == "phone"
+        order = Order.objects.get()
+        sms = OutboundSMS.objects.get()
+        assert sms.order == order
+        assert sms.status == OutboundSMS.Status.SENT
+        assert sms.provider_message_id.startswith("ATXid_stub_")
+        assert gateway.requests[0]['to'] == customer.phone
+
+    def test_failed_inline_send_stays_queued(self, customer, gateway, settings):
+        settings.SMS_GATEWAY_MAX_RETRIES = 0
+        reset_client()
+        gateway.failures = [503]
+        self.login()
+        response = self.post({"customer": customer.id, "item": "phone", "quantity": 99})
+        assert response.status_code == 201
+        sms = OutboundSMS.objects.get()
+        assert sms.status == OutboundSMS.Status.PENDING
+        assert sms.attempts == 1
+
+    def test_inline_send_disabled(self, customer, settings, mocker):
+        settings.SMS_ASYNC_INLINE_SEND = False
+        send = mocker.patch('orders_mgmt.views.send_claimed_async')
+        self.login()
+        response = self.post({"customer": customer.id, "item": "phone", "quantity": 99})
+        assert response.status_code == 201
+        assert OutboundSMS.objects.get().status == OutboundSMS.Status.PENDING
+        send.assert_not_called()
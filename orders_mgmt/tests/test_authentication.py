@@ -0,0 +1,108 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import authentication
+from orders_mgmt.authentication import TokenCacheStats, token_cache_key
+from orders_mgmt.tests.stub_idp import StubIdP
+
+USERINFO = '/userinfo'
+JWKS = '/.well-known/jwks.json'
+
+
+@pytest.fixture
+def idp(settings, monkeypatch):
+    with StubIdP() as stub:
+        settings.OIDC_OP_JWKS_ENDPOINT = stub.jwks_url
+        settings.OIDC_OP_USER_ENDPOINT = stub.userinfo_url
+        settings.OIDC_TOKEN_AUDIENCE = None
+        cache.clear()
+        monkeypatch.setattr(authentication, 'token_cache_stats', TokenCacheStats())
+        yield stub
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestCachedOIDCAuthentication:
+    def get(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client.get(reverse('order-list'))
+
+    def test_warm_token_makes_no_outbound_calls(self, idp):
+        token = idp.issue("jane@example.com")
+        assert self.get(token).status_code == status.HTTP_200_OK
+        assert (idp.calls(JWKS), idp.calls(USERINFO)) == (1, 1)
+        user = User.objects.get(email="jane@example.com")
+
+        for _ in range(5):
+            response = self.get(token)
+            assert response.status_code == status.HTTP_200_OK
+        assert len(idp.requests) == 2
+        stats = authentication.token_cache_stats
+        assert (stats.hits, stats.misses, stats.jwks_fetches) == (5, 1, 1)
+        assert stats.hit_rate == pytest.approx(5 / 6)
+        assert cache.get(token_cache_key(token)) == user.pk
+
+    def test_new_tokens_reuse_cached_jwks(self, idp):
+        for i in range(3):
+            assert self.get(idp.issue(f"user{i}@example.com")).status_code == status.HTTP_200_OK
+        assert (idp.calls(JWKS), idp.calls(USERINFO)) == (1, 3)
+
+    def test_cache_ttl_bounded_by_exp(self, idp, mocker):
+        cache_set = mocker.spy(authentication.cache, 'set')
+        self.get(idp.issue("jane@example.com", expires_in=120))
+        ttls = [call.args[2] for call in cache_set.call_args_list if call.args[0].startswith(authentication.TOKEN_CACHE_PREFIX)]
+        assert len(ttls) == 1 and 110 <= ttls[0] <= 120
+
+    def test_bad_signature_rejected_without_userinfo(self, idp):
+        header, payload, _ = idp.issue("jane@example.com").split('.')
+        forged = f"{header}.{payload}.{idp.issue('eve@example.com').split('.')[2]}"
+        assert self.get(forged).status_code == status.HTTP_401_UNAUTHORIZED
+        assert idp.calls(USERINFO) == 0
+
+    def test_expired_token_rejected(self, idp):
+        token = idp.issue("jane@example.com", expires_in=-3600)
+        response = self.get(token)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data['detail'] == "Token has expired."
+        assert idp.calls(USERINFO) == 0
+
+    def test_audience_checked_when_configured(self, idp, settings):
+        settings.OIDC_TOKEN_AUDIENCE = "https://orders-api"
+        assert self.get(idp.issue("jane@example.com", aud="https://other")).status_code == status.HTTP_401_UNAUTHORIZED
+        assert self.get(idp.issue("jane@example.com", aud=["https://orders-api"])).status_code == status.HTTP_200_OK
+
+    def test_unknown_kid_refreshes_jwks_once(self, idp, settings):
+        assert self.get(idp.issue("jane@example.com")).status_code == status.HTTP_200_OK
+        idp.rotate('key-2')
+        assert self.get(idp.issue("jane@example.com")).status_code == status.HTTP_200_OK
+        assert idp.calls(JWKS) == 2
+        # Kids the IdP doesn't publish can't force more fetches within the refresh interval
+        for i in range(3):
+            idp.add_key(f'unpublished-{i}')
+            token = idp.issue("jane@example.com", kid=f'unpublished-{i}')
+            idp.keys.pop(f'unpublished-{i}')
+            assert self.get(token).status_code == status.HTTP_401_UNAUTHORIZED
+        assert idp.calls(JWKS) == 2
+
+    def test_userinfo_rejection(self, idp):
+        token = idp.issue("jane@example.com", register=False)
+        response = self.get(token)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert cache.get(token_cache_key(token)) is None
+
+    def test_opaque_token_uses_userinfo_then_cache(self, idp):
+        idp.userinfo["opaque-token"] = {'sub': "auth0|jane", 'email': "jane@example.com"}
+        assert self.get("opaque-token").status_code == status.HTTP_200_OK
+        assert self.get("opaque-token").status_code == status.HTTP_200_OK
+        assert (idp.calls(JWKS), idp.calls(USERINFO)) == (0, 1)
+
+    def test_deactivated_user_is_reverified(self, idp):
+        token = idp.issue("jane@example.com")
+        self.get(token)
+        User.objects.filter(email="jane@example.com").update(is_active=False)
+        self.get(token)
+        assert idp.calls(USERINFO) == 2
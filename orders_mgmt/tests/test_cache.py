@@ -0,0 +1,172 @@
+import multiprocessing
+import time
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import cache as cache_backends
+from orders_mgmt.cache import FileBasedCache
+from orders_mgmt.tests import workers
+from orders_mgmt.throttling import SlidingWindowThrottle
+
+WORKERS = 4
+LIMIT = 30
+
+
+def fake_request(pk=1):
+    return SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=pk), META={})
+
+
+def use_cache(settings, backend, location):
+    options = {'MAX_ENTRIES': settings.CACHE_MAX_ENTRIES, 'PURGE_INTERVAL': settings.CACHE_PURGE_INTERVAL}
+    settings.CACHES = {'default': {'BACKEND': backend, 'LOCATION': location, 'OPTIONS': options}}
+
+
+def entry_count(backend):
+    if isinstance(backend, FileBasedCache):
+        return len(backend._list_cache_files())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM django_cache")
+        return cursor.fetchone()[0]
+
+
+@pytest.fixture(params=['database', 'file'])
+def shared_cache(request, settings, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_backends, '_next_purge', {})
+    if request.param == 'database':
+        request.getfixturevalue('db')
+        use_cache(settings, 'orders_mgmt.cache.DatabaseCache', 'django_cache')
+        call_command('createcachetable')
+    else:
+        use_cache(settings, 'orders_mgmt.cache.FileBasedCache', str(tmp_path / 'cache'))
+    return cache
+
+
+class TestSharedCacheBackends:
+    def test_incr(self, shared_cache):
+        assert shared_cache.add('counter', 1, 60)
+        assert not shared_cache.add('counter', 5, 60)
+        assert shared_cache.incr('counter') == 2
+        assert shared_cache.incr('counter', 3) == 5
+        assert shared_cache.get('counter') == 5
+
+    def test_incr_missing_or_expired_key(self, shared_cache):
+        with pytest.raises(ValueError):
+            shared_cache.incr('missing')
+        shared_cache.set('expired', 1, -1)
+        with pytest.raises(ValueError):
+            shared_cache.incr('expired')
+
+    def test_incr_keeps_expiry(self, shared_cache):
+        shared_cache.add('counter', 1, 2)
+        assert shared_cache.incr('counter') == 2
+        time.sleep(2.1)
+        assert shared_cache.get('counter') is None
+
+    def test_counters_survive_past_300_keys(self, shared_cache):
+        # Django's default MAX_ENTRIES; beyond it, culling would drop live counters
+        for i in range(400):
+            shared_cache.add(f'counter:{i}', 1, 60)
+            shared_cache.incr(f'counter:{i}')
+        assert [shared_cache.get(f'counter:{i}') for i in range(400)] == [2] * 400
+
+    def test_expired_entries_are_purged(self, shared_cache, mocker):
+        # The first write of the process purges; the next one only after PURGE_INTERVAL
+        for i in range(5):
+            shared_cache.set(f'expired:{i}', i, -1)
+        shared_cache.set('live', 1, 600)
+        assert entry_count(caches['default']) == 6
+        mocker.patch('orders_mgmt.cache.time.monotonic', return_value=time.monotonic() + 61)
+        shared_cache.set('new', 1, 600)
+        assert entry_count(caches['default']) == 2
+        assert shared_cache.get('live') == 1
+
+    @pytest.mark.django_db
+    def test_database_writes_skip_the_count(self, settings):
+        use_cache(settings, 'orders_mgmt.cache.DatabaseCache', 'django_cache')
+        call_command('createcachetable')
+        cache.set('first', 1, 60)
+        with CaptureQueriesContext(connection) as queries:
+            cache.set('key', 1, 60)
+            assert cache.add('other', 1, 60)
+            assert not cache.add('other', 2, 60)
+            assert cache.touch('key', 120)
+        assert not [query for query in queries if 'COUNT(' in query['sql']]
+        assert cache.get('other') == 1
+
+
+class TestSlidingWindowThrottle:
+    def make(self, settings, now, rate='10/min'):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'orders': rate, 'customers': rate, 'user': rate}}
+        throttle = SlidingWindowThrottle()
+        throttle.timer = lambda: now
+        return throttle
+
+    def attempt(self, settings, now, scope='orders', pk=1):
+        throttle = self.make(settings, now)
+        return throttle.allow_request(fake_request(pk), SimpleNamespace(throttle_scope=scope)), throttle
+
+    def test_limit_within_window(self, settings):
+        results = [self.attempt(settings, 600 + i)[0] for i in range(11)]
+        assert results == [True] * 10 + [False]
+        _, throttle = self.attempt(settings, 630)
+        assert throttle.wait() == pytest.approx(30)
+
+    def test_previous_window_slides_out(self, settings):
+        for i in range(10):
+            self.attempt(settings, 600 + i)
+        # Halfway through the next window half of the previous 10 still count
+        results = [self.attempt(settings, 690)[0] for _ in range(6)]
+        assert results == [True] * 5 + [False]
+        # 7 in this window: the previous one must weigh 3 or less, 70% of the way through
+        _, throttle = self.attempt(settings, 690)
+        assert throttle.wait() == pytest.approx(12)
+        assert self.attempt(settings, 780)[0]
+
+    def test_scopes_and_users_are_separate(self, settings):
+        for _ in range(10):
+            self.attempt(settings, 600)
+        assert not self.attempt(settings, 600)[0]
+        assert self.attempt(settings, 600, scope='customers')[0]
+        assert self.attempt(settings, 600, pk=2)[0]
+
+    def test_no_rate_for_scope(self, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        assert SlidingWindowThrottle().allow_request(fake_request(), SimpleNamespace(throttle_scope='orders'))
+
+    @pytest.mark.django_db
+    def test_per_endpoint_rates_through_api(self, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'orders': '2/min', 'customers': '5/min'}}
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('staff'))
+        assert [client.get(reverse('order-list')).status_code for _ in range(3)] == [200, 200, 429]
+        response = client.get(reverse('order-list'))
+        assert int(response['Retry-After']) > 0
+        assert client.get(reverse('customer-list')).status_code == status.HTTP_200_OK
+
+
+class TestThrottleAcrossProcesses:
+    @pytest.mark.parametrize('backend', ['database', 'file'])
+    def test_limit_holds_across_workers(self, backend, tmp_path, monkeypatch):
+        monkeypatch.setenv('API_ORDERS_THROTTLE_RATE', f'{LIMIT}/day')
+        monkeypatch.setenv('CACHE_BACKEND', backend)
+        if backend == 'database':
+            monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'cache.db'}")
+        else:
+            monkeypatch.setenv('CACHE_LOCATION', str(tmp_path / 'cache'))
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(WORKERS, mp_context=context, initializer=workers.setup) as pool:
+            if backend == 'database':
+                pool.submit(workers.create_cache_table).result()
+            start_at = time.time() + 2  # let every worker finish starting up first
+            allowed = list(pool.map(workers.run_throttle, [start_at] * WORKERS))
+        # Each worker alone would allow all 25 of its requests; together they share one limit of 30
+        assert sum(allowed) == LIMIT
@@ -0,0 +1,138 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import customer_cache
+from orders_mgmt.models import Customer, Order
+
+
+@pytest.mark.django_db
+class TestCustomerByCode:
+    def setup_method(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+        self.customer = Customer.objects.create(name="John Doe", code="C001", phone="+254712345678")
+
+    def lookup(self, code):
+        return self.client.get(reverse('customer-by-code', args=[code]))
+
+    def test_lookup_is_cached(self, django_assert_num_queries):
+        response = self.lookup("C001")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"id": self.customer.id, "name": "John Doe", "code": "C001", "phone": "+254712345678", "language": "en"}
+        with django_assert_num_queries(0):
+            assert self.lookup("C001").data["id"] == self.customer.id
+        assert customer_cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5}
+
+    def test_unknown_code(self):
+        assert self.lookup("C404").status_code == status.HTTP_404_NOT_FOUND
+        # Not cached: a customer created afterwards is found straight away
+        Customer.objects.create(name="Jane Doe", code="C404", phone="+254733123456")
+        assert self.lookup("C404").status_code == status.HTTP_200_OK
+
+    def test_invalidated_across_updates(self):
+        assert self.lookup("C001").data["phone"] == "+254712345678"
+        self.client.patch(reverse('customer-detail', args=[self.customer.id]), {"phone": "+254733123456"}, format='json')
+        assert self.lookup("C001").data["phone"] == "+254733123456"
+
+        self.client.patch(reverse('customer-detail', args=[self.customer.id]), {"code": "C002"}, format='json')
+        assert self.lookup("C001").status_code == status.HTTP_404_NOT_FOUND
+        assert self.lookup("C002").data["id"] == self.customer.id
+
+        customer = Customer.objects.get()
+        customer.name = "Johnny Doe"
+        customer.save()
+        assert self.lookup("C002").data["name"] == "Johnny Doe"
+
+        self.client.delete(reverse('customer-detail', args=[self.customer.id]))
+        assert self.lookup("C002").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_load_racing_an_update_is_not_stored(self, monkeypatch):
+        load = customer_cache._cache.load
+
+        def load_then_update(codes):
+            stale = load(codes)
+            Customer.objects.filter(pk=self.customer.pk).update(name="Renamed")
+            customer_cache.invalidate(Customer, Customer.objects.get(pk=self.customer.pk))
+            return stale
+
+        monkeypatch.setattr(customer_cache._cache, 'load', load_then_update)
+        assert customer_cache.get("C001").name == "John Doe"
+        monkeypatch.setattr(customer_cache._cache, 'load', load)
+        assert customer_cache.get("C001").name == "Renamed"
+
+    def test_entries_expire(self, settings, mocker):
+        settings.CUSTOMER_CACHE_TTL = 30
+        customer_cache.get("C001")
+        Customer.objects.filter(pk=self.customer.pk).update(name="Renamed")  # no signal
+        assert customer_cache.get("C001").name == "John Doe"
+        later = customer_cache.time.monotonic() + 31
+        mocker.patch('orders_mgmt.customer_cache.time.monotonic', return_value=later)
+        assert customer_cache.get("C001").name == "Renamed"
+
+    def test_least_recently_used_evicted(self, settings, django_assert_num_queries):
+        settings.CUSTOMER_CACHE_SIZE = 2
+        Customer.objects.bulk_create([Customer(name=f"Customer {i}", code=f"C00{i}", phone="+254712345678") for i in (2, 3)])
+        customer_cache.get("C001")
+        customer_cache.get("C002")
+        customer_cache.get("C001")
+        customer_cache.get("C003")
+        with django_assert_num_queries(0):
+            assert customer_cache.get("C001") is not None
+        with django_assert_num_queries(1):
+            assert customer_cache.get("C002") is not None
+        assert customer_cache.stats()["evictions"] == 2
+
+    def test_callers_get_copies(self):
+        customer_cache.get("C001").name = "Changed"
+        assert customer_cache.get("C001").name == "John Doe"
+
+    def test_hit_metric(self):
+        before = REGISTRY.get_sample_value('customer_cache_lookups_total', {'result': 'hit'}) or 0
+        for _ in range(3):
+            customer_cache.get("C001")
+        assert REGISTRY.get_sample_value('customer_cache_lookups_total', {'result': 'hit'}) == before + 2
+
+
+@pytest.mark.django_db
+class TestOrderByCustomerCode:
+    def setup_method(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+        self.customer = Customer.objects.create(name="John Doe", code="C001", phone="+254712345678")
+
+    def test_create(self):
+        response = self.client.post(reverse('order-list'), {"customer_code": "C001", "item": "phone", "quantity": 1}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["customer"] == self.customer.id
+        assert "customer_code" not in response.data
+        assert Order.objects.get().customer_id == self.customer.id
+
+    @pytest.mark.parametrize('data, field', [
+        ({"customer_code": "C404", "item": "phone", "quantity": 1}, "customer_code"),
+        ({"item": "phone", "quantity": 1}, "customer"),
+    ])
+    def test_rejected(self, data, field):
+        response = self.client.post(reverse('order-list'), data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert field in response.data
+
+    def test_code_and_id_must_agree(self):
+        other = Customer.objects.create(name="Jane Doe", code="C002", phone="+254733123456")
+        data = {"customer": other.id, "customer_code": "C001", "item": "phone", "quantity": 1}
+        response = self.client.post(reverse('order-list'), data, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        data["customer"] = self.customer.id
+        assert self.client.post(reverse('order-list'), data, format='json').status_code == status.HTTP_201_CREATED
+
+    def test_bulk_loads_codes_once(self, django_assert_max_num_queries):
+        Customer.objects.bulk_create([Customer(name=f"Customer {i}", code=f"B{i:03d}", phone="+254712345678") for i in range(20)])
+        rows = [{"customer_code": f"B{i % 20:03d}", "item": "phone", "quantity": 1} for i in range(100)]
+        # One query loads the 20 codes; the rest is the same as a bulk create by id
+        with django_assert_max_num_queries(13):
+            response = self.client.post(reverse('order-bulk'), rows, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Order.objects.count() == 100
+        assert customer_cache.stats()["misses"] == 20
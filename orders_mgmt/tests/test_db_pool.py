@@ -0,0 +1,103 @@
+import os
+import time
+import uuid
+import dj_database_url
+import pytest
+from django.conf import settings
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from prometheus_client import REGISTRY
+from orders_sms_service.postgresql import ENGINE, pooled
+
+# The tests that need a server run against this database, e.g. postgres://postgres@localhost/postgres
+TEST_POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+needs_postgres = pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+
+
+def sample(name, alias, **labels):
+    return REGISTRY.get_sample_value(name, {'alias': alias, **labels}) or 0
+
+
+@pytest.fixture
+def pooled_connection():
+    # A connection of its own, outside DATABASES, under an alias no other test's pool uses
+    created = []
+
+    def make(url, health_checks=True, **options):
+        alias = f'pool_{uuid.uuid4().hex[:8]}'
+        config = pooled(dj_database_url.parse(url, conn_health_checks=health_checks), **options)
+        connection = ConnectionHandler({'default': dict(settings.DATABASES['default']), alias: config})[alias]
+        created.append(connection)
+        return connection
+
+    yield make
+    for connection in created:
+        connection.close()
+        connection.close_pool()
+
+
+def test_pooled_config():
+    config = pooled(dj_database_url.parse("postgres://orders:secret@db:5432/orders", conn_max_age=600), max_size=4, timeout=10)
+    assert config['ENGINE'] == ENGINE
+    assert config['CONN_MAX_AGE'] == 0
+    assert config['OPTIONS'] == {'pool': {'max_size': 4, 'timeout': 10}}
+    sqlite = dj_database_url.parse("sqlite:////tmp/orders.db")
+    assert pooled(sqlite, max_size=4) == sqlite
+
+
+@pytest.mark.django_db
+def test_unreachable_database_times_out(pooled_connection):
+    # Nothing listens on port 1: every attempt fails, and the request gives up after the pool timeout
+    connection = pooled_connection("postgres://orders@127.0.0.1:1/orders", min_size=0, max_size=1, timeout=0.5)
+    started = time.perf_counter()
+    with pytest.raises(OperationalError):
+        connection.ensure_connection()
+    assert 0.5 <= time.perf_counter() - started < 5
+    assert sample('db_pool_timeouts_total', connection.alias) == 1
+    assert sample('db_pool_wait_seconds_count', connection.alias) == 1
+
+
+@needs_postgres
+@pytest.mark.django_db
+class TestPostgresPool:
+    def backend_pid(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def terminate(self, pids):
+        import psycopg
+        with psycopg.connect(TEST_POSTGRES_URL, autocommit=True) as admin:
+            admin.execute('SELECT pg_terminate_backend(pid) FROM unnest(%s::int[]) AS pid', [list(pids)])
+
+    def test_survives_connections_killed_mid_run(self, pooled_connection):
+        connection = pooled_connection(TEST_POSTGRES_URL, min_size=1, max_size=2, timeout=5)
+        pids = set()
+        for request in range(30):
+            # A request: check a connection out, query, give it back
+            pids.add(self.backend_pid(connection))
+            connection.close()
+            if request % 10 == 9:
+                # A failover, as the pool sees it: every server connection dropped while idle
+                self.terminate(pids)
+        assert len(pids) > 1
+        assert sample('db_pool_connections_lost_total', connection.alias) >= 2
+        assert sample('db_pool_wait_seconds_count', connection.alias) == 30
+        assert sample('db_pool_connections', connection.alias, state='in_use') == 0
+        assert sample('db_pool_connections', connection.alias, state='max') == 2
+
+    def test_without_health_checks_the_request_fails(self, pooled_connection):
+        connection = pooled_connection(TEST_POSTGRES_URL, health_checks=False, min_size=1, max_size=1, timeout=5)
+        pid = self.backend_pid(connection)
+        connection.close()
+        self.terminate([pid])
+        with pytest.raises(OperationalError):
+            self.backend_pid(connection)
+
+    def test_utilization(self, pooled_connection):
+        connection = pooled_connection(TEST_POSTGRES_URL, min_size=1, max_size=2, timeout=5)
+        self.backend_pid(connection)
+        assert sample('db_pool_connections', connection.alias, state='in_use') == 1
+        connection.close()
+        assert sample('db_pool_connections', connection.alias, state='in_use') == 0
+        assert sample('db_pool_connections', connection.alias, state='open') >= 1
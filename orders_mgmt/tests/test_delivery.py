@@ -0,0 +1,171 @@
+import threading
+from urllib.parse import urlencode
+import pytest
+from django.contrib.auth.models import User
+from django.db import connections
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import delivery
+from orders_mgmt.models import Customer, Order, OutboundSMS
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def reports(settings):
+    settings.SMS_DELIVERY_REPORT_TOKEN = TOKEN
+    settings.SMS_DELIVERY_FLUSH_INTERVAL = 60
+    settings.SMS_DELIVERY_BATCH_SIZE = 1000
+    buffer = delivery.ReportBuffer()
+    buffer.start = lambda: None  # flushed by the tests rather than a background thread
+    delivery.buffer, previous = buffer, delivery.buffer
+    yield buffer
+    delivery.buffer = previous
+
+
+@pytest.fixture
+def messages():
+    customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+    orders = Order.objects.bulk_create([Order(customer=customer, item=f"item {i}", quantity=1) for i in range(3)])
+    return OutboundSMS.objects.bulk_create([
+        OutboundSMS(order=order, phone=customer.phone, message="Hi", status=OutboundSMS.Status.SENT, provider_message_id=f"ATXid_{i}")
+        for i, order in enumerate(orders)
+    ])
+
+
+@pytest.mark.django_db
+class TestDeliveryReports:
+    url = reverse('sms-delivery-reports')
+
+    def post(self, data, token=TOKEN, format=None):
+        url = f"{self.url}?token={token}"
+        if format is None:
+            # Africa's Talking posts form-encoded callbacks
+            return APIClient().post(url, urlencode(data), content_type='application/x-www-form-urlencoded')
+        return APIClient().post(url, data, format=format)
+
+    def states(self):
+        return dict(OutboundSMS.objects.values_list('provider_message_id', 'delivery_status'))
+
+    def test_reports_are_buffered_then_applied(self, reports, messages):
+        assert self.post({"id": "ATXid_0", "status": "Success", "phoneNumber": "+254700000000"}).status_code == status.HTTP_200_OK
+        assert self.post({"id": "ATXid_1", "status": "Rejected", "failureReason": "InsufficientCredit"}).status_code == status.HTTP_200_OK
+        assert self.post({"id": "ATXid_2", "status": "Buffered"}, format='json').status_code == status.HTTP_200_OK
+        assert self.states() == {"ATXid_0": "", "ATXid_1": "", "ATXid_2": ""}
+        assert reports.flush() == 3
+        assert self.states() == {"ATXid_0": "delivered", "ATXid_1": "failed", "ATXid_2": "submitted"}
+        failed = OutboundSMS.objects.get(provider_message_id="ATXid_1")
+        assert failed.delivery_error == "Rejected: InsufficientCredit"
+        assert failed.delivery_reported_at is not None
+        assert failed.status == OutboundSMS.Status.SENT
+
+    def test_token_required(self, reports, messages, settings):
+        assert self.post({"id": "ATXid_0", "status": "Success"}, token="wrong").status_code == status.HTTP_403_FORBIDDEN
+        settings.SMS_DELIVERY_REPORT_TOKEN = ""
+        assert self.post({"id": "ATXid_0", "status": "Success"}, token="").status_code == status.HTTP_403_FORBIDDEN
+        assert not reports.pending
+
+    @pytest.mark.parametrize('data', [{"status": "Success"}, {"id": "ATXid_0", "status": "Teleported"}])
+    def test_invalid_report(self, reports, data):
+        assert self.post(data).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_flush_when_batch_is_full(self, reports, messages, settings):
+        settings.SMS_DELIVERY_BATCH_SIZE = 2
+        self.post({"id": "ATXid_0", "status": "Success"})
+        assert self.states()["ATXid_0"] == ""
+        self.post({"id": "ATXid_1", "status": "Success"})
+        assert self.states() == {"ATXid_0": "delivered", "ATXid_1": "delivered", "ATXid_2": ""}
+        assert not reports.pending
+
+    def test_burst_is_a_few_statements(self, reports, settings, django_assert_max_num_queries):
+        settings.SMS_DELIVERY_BATCH_SIZE = 5000
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        OutboundSMS.objects.bulk_create([OutboundSMS(phone=customer.phone, message="Hi", provider_message_id=f"ATXid_{i}") for i in range(2000)])
+        for i in range(2000):
+            reports.add(delivery.parse_report({"id": f"ATXid_{i}", "status": "Success" if i % 4 else "Failed"}))
+        # UPDATEs of up to 500 ids: 3 for the 1500 delivered and 1 for the 500 failed, then 4 SELECTs of the matched ids
+        with django_assert_max_num_queries(10):
+            assert reports.flush() == 2000
+        assert OutboundSMS.objects.filter(delivery_status="delivered").count() == 1500
+
+    def test_final_status_not_overwritten(self, reports, messages):
+        reports.add(delivery.parse_report({"id": "ATXid_0", "status": "Success"}))
+        reports.add(delivery.parse_report({"id": "ATXid_0", "status": "Sent"}))
+        reports.add(delivery.parse_report({"id": "ATXid_1", "status": "Sent"}))
+        reports.add(delivery.parse_report({"id": "ATXid_1", "status": "Success"}))
+        reports.flush()
+        reports.add(delivery.parse_report({"id": "ATXid_0", "status": "Buffered"}))
+        reports.flush()
+        assert self.states() == {"ATXid_0": "delivered", "ATXid_1": "delivered", "ATXid_2": ""}
+
+    def test_report_before_message_id_is_stored(self, reports, messages, settings, mocker):
+        # The gateway can report before the send_sms worker has saved its reply
+        reports.add(delivery.parse_report({"id": "ATXid_9", "status": "Success"}))
+        assert reports.flush() == 0
+        assert "ATXid_9" in reports.pending
+        OutboundSMS.objects.filter(pk=messages[0].pk).update(provider_message_id="ATXid_9")
+        assert reports.flush() == 1
+        assert OutboundSMS.objects.get(pk=messages[0].pk).delivery_status == "delivered"
+
+        reports.add(delivery.parse_report({"id": "ATXid_unknown", "status": "Success"}))
+        later = delivery.time.monotonic() + settings.SMS_DELIVERY_REPORT_MAX_AGE + 1
+        mocker.patch('orders_mgmt.delivery.time.monotonic', return_value=later)
+        assert reports.flush() == 0
+        assert not reports.pending
+
+    def test_failed_flush_keeps_reports(self, reports, messages, mocker):
+        reports.add(delivery.parse_report({"id": "ATXid_0", "status": "Success"}))
+        mocker.patch('orders_mgmt.delivery.apply_reports', side_effect=RuntimeError("database unavailable"))
+        with pytest.raises(RuntimeError):
+            reports.flush()
+        assert "ATXid_0" in reports.pending
+
+    def test_order_api_delivery_status(self, reports, messages, django_assert_num_queries):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('staff'))
+        OutboundSMS.objects.filter(pk=messages[2].pk).update(status=OutboundSMS.Status.PENDING)
+        reports.add(delivery.parse_report({"id": "ATXid_0", "status": "Success"}))
+        reports.flush()
+        with django_assert_num_queries(1):
+            rows = client.get(reverse('order-list')).data['results']
+        assert {row['item']: row['delivery_status'] for row in rows} == {"item 0": "delivered", "item 1": "sent", "item 2": "pending"}
+        assert client.get(reverse('order-detail', args=[messages[0].order_id])).data['delivery_status'] == "delivered"
+        response = client.post(reverse('order-list'), {"customer": messages[0].order.customer_id, "item": "phone", "quantity": 1}, format='json')
+        assert response.data['delivery_status'] == "pending"
+
+
+class StopFlusher(Exception):
+    pass
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flusher_returns_its_connection_between_flushes(reports, messages, mocker):
+    # A connection held while the thread sleeps would keep one of the process's pool checked out.
+    # SQLite's in-memory test database ignores close(), so count the releases instead.
+    close_all = mocker.spy(delivery.connections, 'close_all')
+    released = []
+    statuses = iter(["Buffered", "Success"])
+
+    def sleep(seconds):
+        released.append(close_all.call_count)
+        status = next(statuses, None)
+        if status is None:
+            raise StopFlusher
+        reports.add(delivery.parse_report({"id": "ATXid_0", "status": status}))
+
+    def run():
+        try:
+            reports.run()
+        except StopFlusher:
+            pass
+        finally:
+            # close() leaves the in-memory database's handle open, so close it by hand
+            connections['default'].connection.close()
+
+    mocker.patch('orders_mgmt.delivery.time.sleep', side_effect=sleep)
+    flusher = threading.Thread(target=run)
+    flusher.start()
+    flusher.join(10)
+    assert released == [0, 1, 2]
+    assert OutboundSMS.objects.get(provider_message_id="ATXid_0").delivery_status == "delivered"
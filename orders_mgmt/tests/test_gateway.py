@@ -0,0 +1,83 @@
+import pytest
+import requests
+from orders_mgmt.gateway import GatewayError, SMSGatewayClient, backoff_delay, get_client, reset_client
+from orders_mgmt.tests.stub_gateway import StubGateway
+
+
+@pytest.fixture
+def gateway():
+    with StubGateway() as stub:
+        yield stub
+
+
+def make_client(url, **kwargs):
+    return SMSGatewayClient(url=url, username='sandbox', api_key='key', **kwargs)
+
+
+class TestSMSGatewayClient:
+    @pytest.fixture(autouse=True)
+    def no_backoff(self, mocker):
+        return mocker.patch('orders_mgmt.gateway.backoff_delay', return_value=0)
+
+    def test_send_returns_recipients(self, gateway):
+        reply = make_client(gateway.url).send('+254700000001,+254700000002', 'Hello')
+        recipients = reply['SMSMessageData']['Recipients']
+        assert [r['number'] for r in recipients] == ['+254700000001', '+254700000002']
+        assert gateway.requests == [{'username': 'sandbox', 'to': '+254700000001,+254700000002', 'message': 'Hello'}]
+
+    def test_connection_is_reused(self, gateway):
+        client = make_client(gateway.url)
+        for _ in range(5):
+            client.send('+254700000001', 'Hello')
+        assert len(gateway.requests) == 5
+        assert gateway.connections == 1
+
+    def test_retries_5xx_with_backoff(self, gateway, no_backoff):
+        gateway.failures = [503, 502]
+        reply = make_client(gateway.url, max_retries=3).send('+254700000001', 'Hello')
+        assert reply['SMSMessageData']['Recipients'][0]['status'] == 'Success'
+        assert len(gateway.requests) == 3
+        assert no_backoff.call_count == 2
+
+    def test_gives_up_after_max_retries(self, gateway):
+        gateway.failures = [500] * 5
+        with pytest.raises(GatewayError):
+            make_client(gateway.url, max_retries=2).send('+254700000001', 'Hello')
+        assert len(gateway.requests) == 3
+
+    def test_client_errors_are_not_retried(self, gateway):
+        gateway.failures = [401]
+        with pytest.raises(requests.HTTPError):
+            make_client(gateway.url).send('+254700000001', 'Hello')
+        assert len(gateway.requests) == 1
+
+    def test_retries_connection_errors(self):
+        client = make_client('http://127.0.0.1:9/unreachable', max_retries=1)
+        with pytest.raises(requests.ConnectionError):
+            client.send('+254700000001', 'Hello')
+
+    def test_read_timeout_is_not_retried(self, gateway):
+        gateway.latency = 0.5
+        with pytest.raises(requests.ReadTimeout):
+            make_client(gateway.url, read_timeout=0.05).send('+254700000001', 'Hello')
+        assert len(gateway.requests) == 1
+
+
+class TestBackoffDelay:
+    def test_backoff_delay_is_capped(self, mocker):
+        mocker.patch('orders_mgmt.gateway.random.uniform', side_effect=lambda low, high: high)
+        assert backoff_delay(0, 0.5, 8) == 0.5
+        assert backoff_delay(3, 0.5, 8) == 4
+        assert backoff_delay(10, 0.5, 8) == 8
+
+
+class TestGetClient:
+    def test_client_is_shared_per_process(self, settings, mocker):
+        settings.MESSAGING_URL = 'http://127.0.0.1:9/messaging'
+        reset_client()
+        client = get_client()
+        assert get_client() is client
+        assert client.url == settings.MESSAGING_URL
+        mocker.patch('orders_mgmt.gateway.os.getpid', return_value=-1)  # as seen from a forked worker
+        assert get_client() is not client
+        reset_client()
@@ -0,0 +1,188 @@
+import multiprocessing
+import time
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import idempotency
+from orders_mgmt.models import Customer, IdempotencyKey, Order, OutboundSMS
+from orders_mgmt.tests import workers
+
+WORKERS = 4
+
+
+@pytest.fixture
+def customer():
+    return Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+
+
+@pytest.mark.django_db
+class TestIdempotentOrderCreate:
+    def setup_method(self):
+        self.user = User.objects.create_user('staff')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def post(self, data, key="key-1", url=None, client=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return (client or self.client).post(url or reverse('order-list'), data, format='json', **headers)
+
+    def test_retry_replays_stored_response(self, customer):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        first = self.post(data)
+        second = self.post(data)
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second.data == first.data
+        assert second['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first
+        assert Order.objects.count() == 1
+        assert OutboundSMS.objects.count() == 1
+
+    def test_replay_from_cache_skips_database(self, customer, django_assert_num_queries, django_capture_on_commit_callbacks):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        with django_capture_on_commit_callbacks(execute=True):
+            self.post(data)
+        with django_assert_num_queries(0):
+            assert self.post(data).status_code == status.HTTP_201_CREATED
+
+    def test_replay_from_database_when_cache_is_cold(self, customer):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        first = self.post(data)
+        cache.clear()
+        second = self.post(data)
+        assert second.data == first.data
+        assert second['Idempotent-Replayed'] == 'true'
+        assert cache.get(idempotency.cache_key(self.user.pk, "key-1")) is not None
+        assert Order.objects.count() == 1
+
+    def test_without_key_creates_each_time(self, customer):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        self.post(data, key=None)
+        self.post(data, key=None)
+        assert Order.objects.count() == 2
+        assert not IdempotencyKey.objects.exists()
+
+    def test_key_reused_for_different_request(self, customer):
+        self.post({"customer": customer.id, "item": "phone", "quantity": 2})
+        response = self.post({"customer": customer.id, "item": "phone", "quantity": 3})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        cache.clear()
+        assert self.post({"customer": customer.id, "item": "phone", "quantity": 3}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Order.objects.count() == 1
+
+    def test_failed_request_releases_key(self, customer):
+        assert self.post({"customer": customer.id, "item": "phone"}).status_code == status.HTTP_400_BAD_REQUEST
+        assert not IdempotencyKey.objects.exists()
+        assert self.post({"customer": customer.id, "item": "phone", "quantity": 1}).status_code == status.HTTP_201_CREATED
+
+    def test_keys_are_per_user(self, customer):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        self.post(data)
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user('other'))
+        response = self.post(data, client=other)
+        assert 'Idempotent-Replayed' not in response
+        assert Order.objects.count() == 2
+
+    def test_invalid_key(self, customer):
+        response = self.post({"customer": customer.id, "item": "phone", "quantity": 2}, key="x" * 256)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'Idempotency-Key' in response.data
+
+    def test_waits_for_request_in_flight(self, customer, mocker):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        request = SimpleNamespace(method='POST', path=reverse('order-list'), data=data)
+        claim = IdempotencyKey.objects.create(
+            user=self.user, key="key-1", request_hash=idempotency.request_fingerprint(request), expires_at=timezone.now() + timedelta(days=1),
+        )
+
+        def finish_first_request(seconds):
+            IdempotencyKey.objects.filter(pk=claim.pk).update(status_code=201, response_body={"id": 12345})
+        sleep = mocker.patch('orders_mgmt.idempotency.time.sleep', side_effect=finish_first_request)
+        response = self.post(data)
+        assert sleep.call_count == 1
+        assert (response.status_code, response.data) == (status.HTTP_201_CREATED, {"id": 12345})
+        assert not Order.objects.exists()
+
+    def test_conflict_when_request_in_flight_too_long(self, customer, settings):
+        settings.IDEMPOTENCY_WAIT_TIMEOUT = 0
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        self.post(data)
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+        cache.clear()
+        assert self.post(data).status_code == status.HTTP_409_CONFLICT
+
+    def test_abandoned_claim_is_taken_over(self, customer, settings):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        self.post(data)
+        IdempotencyKey.objects.update(status_code=None, created_at=timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT + 1))
+        cache.clear()
+        response = self.post(data)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'Idempotent-Replayed' not in response
+        assert IdempotencyKey.objects.get().status_code == 201
+
+    def test_expired_key_runs_again(self, customer):
+        data = {"customer": customer.id, "item": "phone", "quantity": 2}
+        self.post(data)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        cache.clear()
+        assert 'Idempotent-Replayed' not in self.post(data)
+        assert Order.objects.count() == 2
+
+    def test_purge_command(self, customer, capsys):
+        self.post({"customer": customer.id, "item": "phone", "quantity": 2}, key="old")
+        self.post({"customer": customer.id, "item": "phone", "quantity": 2}, key="new")
+        IdempotencyKey.objects.filter(key="old").update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_idempotency_keys')
+        assert list(IdempotencyKey.objects.values_list('key', flat=True)) == ["new"]
+        assert "Deleted 1" in capsys.readouterr().out
+
+    def test_bulk(self, customer):
+        data = [{"customer": customer.id, "item": "phone", "quantity": 1}, {"customer": customer.id, "item": "cable", "quantity": 2}]
+        first = self.post(data, url=reverse('order-bulk'))
+        second = self.post(data, url=reverse('order-bulk'))
+        assert second.data == first.data
+        assert Order.objects.count() == 2
+
+    def test_async_endpoint(self, customer, settings):
+        settings.SMS_ASYNC_INLINE_SEND = False
+        client = AsyncClient()
+        client.force_login(self.user)
+        post = lambda: async_to_sync(client.post)(
+            reverse('order-create-async'), {"customer": customer.id, "item": "phone", "quantity": 2},
+            content_type='application/json', headers={'Idempotency-Key': "async-1"},
+        )
+        first, second = post(), post()
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second.json() == first.json()
+        assert second['Idempotent-Replayed'] == 'true'
+        assert Order.objects.count() == 1
+
+
+def test_concurrent_duplicates_create_one_order(tmp_path, monkeypatch):
+    # Separate worker processes against one SQLite file, as gunicorn workers would share a database
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'orders.db'}")
+    monkeypatch.setenv('CACHE_BACKEND', 'locmem')
+    monkeypatch.setenv('SMS_ASYNC_INLINE_SEND', 'false')
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(WORKERS, mp_context=context, initializer=workers.setup) as pool:
+        user_id, customer_id = pool.submit(workers.prepare_orders_database).result()
+        data = {"customer": customer_id, "item": "phone", "quantity": 2}
+        start_at = time.time() + 2  # let every worker finish starting up first
+        results = list(pool.map(workers.post_order, [start_at] * WORKERS, [user_id] * WORKERS, [data] * WORKERS, ["key-1"] * WORKERS))
+        rows = pool.submit(workers.count_rows).result()
+
+    assert [status_code for status_code, _, _ in results] == [status.HTTP_201_CREATED] * WORKERS
+    assert sum(not replayed for _, replayed, _ in results) == 1
+    assert len({order_id for _, _, order_id in results}) == 1
+    assert rows == (1, 1)
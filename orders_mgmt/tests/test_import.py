@@ -0,0 +1,115 @@
+import json
+import pytest
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+from orders_mgmt.models import Customer, CustomerOrderStats, Order, OutboundSMS
+
+CSV_HEADER = "customer_code,customer_name,customer_phone,item,quantity,time\n"
+
+
+@pytest.fixture
+def write_file(tmp_path):
+    def write(name, content):
+        path = tmp_path / name
+        path.write_text(content)
+        return path
+    return write
+
+
+def run_import(path, *args):
+    call_command('import_orders', str(path), *args)
+
+
+@pytest.mark.django_db
+class TestImportOrders:
+    def test_csv_upserts_customers_and_keeps_order_time(self, write_file, capsys):
+        Customer.objects.create(name="Old Name", code="C001", phone="+254700000009")
+        path = write_file("orders.csv", CSV_HEADER + (
+            "C001,John Doe,+254700000000,phone,2,2024-01-15T10:00:00Z\n"
+            "C002,Jane Doe,+254700000001,laptop,1.5,2024-02-01T08:30:00+03:00\n"
+            "C003,New Customer,+254700000002,,,\n"
+        ))
+        run_import(path, '--no-sms')
+
+        john = Customer.objects.get(code="C001")
+        assert (john.name, john.phone) == ("John Doe", "+254700000000")
+        assert Customer.objects.filter(code="C003").exists()
+        assert Order.objects.count() == 2
+        order = Order.objects.get(customer=john)
+        assert order.time == datetime(2024, 1, 15, 10, tzinfo=dt_timezone.utc)
+        assert OutboundSMS.objects.count() == 0
+        out = capsys.readouterr().out
+        assert "Imported 3 row(s)" in out
+        assert "3 customer(s) upserted, 2 order(s) created, 0 rejected" in out
+        assert "rows/s" in out
+
+    def test_ndjson_queues_sms_and_updates_stats(self, write_file):
+        rows = [
+            {"customer_code": "C001", "customer_name": "John Doe", "customer_phone": "+254700000000", "item": "phone", "quantity": 2},
+            {"customer_code": "C001", "item": "cable", "quantity": "3.25"},
+        ]
+        path = write_file("orders.ndjson", "".join(json.dumps(row) + "\n" for row in rows))
+        run_import(path)
+        customer = Customer.objects.get(code="C001")
+        assert OutboundSMS.objects.filter(phone="+254700000000").count() == 2
+        stats = CustomerOrderStats.objects.get(customer=customer)
+        assert (stats.order_count, stats.total_quantity) == (2, Decimal("5.25"))
+
+    def test_rejected_rows_written_to_errors_file(self, write_file, tmp_path, capsys):
+        path = write_file("orders.ndjson", "\n".join([
+            json.dumps({"customer_code": "C001", "customer_name": "John Doe", "customer_phone": "+254700000000", "item": "phone", "quantity": 1}),
+            json.dumps({"customer_code": "C404", "item": "phone", "quantity": 1}),
+            json.dumps({"customer_code": "C001", "item": "phone", "quantity": "many"}),
+            json.dumps({"customer_code": "C001", "item": "phone"}),
+            "{not json",
+            "[1, 2]",
+            json.dumps({"customer_code": "C002", "customer_name": "Jane Doe", "customer_phone": "020 123456", "item": "phone", "quantity": 1}),
+        ]) + "\n")
+        errors_path = tmp_path / "rejected.ndjson"
+        run_import(path, '--no-sms', '--errors', str(errors_path), '--chunk-size', '2')
+
+        assert Order.objects.count() == 1
+        rejected = [json.loads(line) for line in errors_path.read_text().splitlines()]
+        assert [row["line"] for row in rejected] == [2, 3, 4, 5, 6, 7]
+        assert "customer_code" in rejected[0]["errors"]
+        assert "quantity" in rejected[1]["errors"]
+        assert rejected[2]["errors"]["non_field_errors"] == ["item and quantity must be given together."]
+        assert rejected[3]["row"]["__raw__"] == "{not json"
+        assert "customer_phone" in rejected[5]["errors"]
+        assert "6 rejected" in capsys.readouterr().out
+
+    def test_no_errors_file_when_nothing_rejected(self, write_file, tmp_path):
+        path = write_file("orders.csv", CSV_HEADER + "C001,John Doe,+254700000000,phone,1,\n")
+        run_import(path, '--no-sms')
+        assert not (tmp_path / "orders.csv.errors.ndjson").exists()
+        assert Order.objects.get().time is not None
+
+    def test_chunks_commit_independently(self, write_file, mocker):
+        lines = "".join(f"C{i:03d},Customer {i},+2547000000{i:02d},phone,1,\n" for i in range(5))
+        path = write_file("orders.csv", CSV_HEADER + lines)
+        mocker.patch('orders_mgmt.importer.enqueue_confirmations', side_effect=[None, None, RuntimeError("boom")])
+        with pytest.raises(RuntimeError):
+            run_import(path, '--chunk-size', '2')
+        # The first two chunks committed; the failing one rolled back on its own
+        assert Order.objects.count() == 4
+        assert Customer.objects.count() == 4
+
+    def test_round_trip_from_export(self, write_file):
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        order = Order.objects.create(customer=customer, item="phone", quantity=2)
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('staff'))
+        body = b"".join(client.get(reverse('order-export')).streaming_content).decode()
+        Order.objects.all().delete()
+        run_import(write_file("export.csv", body), '--no-sms')
+        imported = Order.objects.get()
+        assert (imported.customer_id, imported.item, imported.quantity, imported.time) == (customer.id, "phone", 2, order.time)
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(CommandError):
+            run_import(tmp_path / "missing.csv")
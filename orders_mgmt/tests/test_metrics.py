@@ -0,0 +1,157 @@
+import multiprocessing
+import re
+import time
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from orders_mgmt.gateway import SMSGatewayClient
+from orders_mgmt.metrics import observe_gateway_call, start_metrics_server
+from orders_mgmt.models import Customer, OutboundSMS
+from orders_mgmt.sms import dispatch_pending
+from orders_mgmt.tests import workers
+from orders_mgmt.tests.stub_gateway import StubGateway
+
+WORKERS = 3
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+    def setup_method(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+
+    def test_latency_and_queries_per_route(self):
+        Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        before = {
+            'count': sample('http_request_duration_seconds_count', method='GET', route='customer-list', status='200'),
+            'queries': sample('http_request_db_queries_sum', route='customer-list'),
+            'db_seconds': sample('http_request_db_duration_seconds_sum', route='customer-list'),
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('customer-list'))
+            self.client.get(reverse('customer-list'))
+        assert sample('http_request_duration_seconds_count', method='GET', route='customer-list', status='200') == before['count'] + 2
+        assert sample('http_request_db_queries_sum', route='customer-list') == before['queries'] + len(queries)
+        assert sample('http_request_db_duration_seconds_sum', route='customer-list') > before['db_seconds']
+
+    def test_detail_routes_share_a_series(self):
+        customers = [Customer.objects.create(name="John Doe", code=f"C00{i}", phone="+254700000000") for i in range(2)]
+        before = sample('http_request_duration_seconds_count', method='GET', route='customer-detail', status='200')
+        for customer in customers:
+            self.client.get(reverse('customer-detail', args=[customer.id]))
+        self.client.get("/no/such/page/")
+        assert sample('http_request_duration_seconds_count', method='GET', route='customer-detail', status='200') == before + 2
+        assert sample('http_request_duration_seconds_count', method='GET', route='<unmatched>', status='404') >= 1
+
+    def test_queries_outside_requests_not_counted(self):
+        before = sample('http_request_db_queries_sum', route='customer-list')
+        list(Customer.objects.all())
+        assert sample('http_request_db_queries_sum', route='customer-list') == before
+
+    def test_async_view(self, settings):
+        settings.SMS_ASYNC_INLINE_SEND = False
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        client = AsyncClient()
+        client.force_login(User.objects.get(username='staff'))
+        before = sample('http_request_db_queries_sum', route='order-create-async')
+        response = async_to_sync(client.post)(
+            reverse('order-create-async'), {"customer": customer.id, "item": "phone", "quantity": 1}, content_type='application/json',
+        )
+        assert response.status_code == 201
+        # The ORM work runs in sync_to_async threads and is still counted against the request
+        assert sample('http_request_db_queries_sum', route='order-create-async') >= before + 3
+
+    def test_metrics_endpoint(self, settings):
+        self.client.get(reverse('customer-list'))
+        # Refused until a token is configured
+        assert self.client.get('/metrics').status_code == 403
+        settings.METRICS_TOKEN = "scrape-token"
+        assert self.client.get('/metrics').status_code == 403
+        assert self.client.get('/metrics', HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION="Bearer scrape-token")
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        body = response.content.decode()
+        assert 'http_request_duration_seconds_bucket{' in body
+        assert 'route="customer-list"' in body
+
+
+class TestGatewayMetrics:
+    def test_calls_and_errors(self, mocker):
+        mocker.patch('orders_mgmt.gateway.backoff_delay', return_value=0)
+        before = {
+            'ok': sample('sms_gateway_request_duration_seconds_count', client='sync', outcome='ok'),
+            'error': sample('sms_gateway_request_duration_seconds_count', client='sync', outcome='error'),
+            '503': sample('sms_gateway_errors_total', client='sync', error='http_503'),
+            'connect': sample('sms_gateway_errors_total', client='sync', error='ConnectionError'),
+        }
+        with StubGateway() as gateway:
+            gateway.failures = [503]
+            SMSGatewayClient(url=gateway.url, username='sandbox', api_key='key').send('+254700000001', 'Hello')
+            url = gateway.url
+        with pytest.raises(Exception):
+            SMSGatewayClient(url=url, username='sandbox', api_key='key', max_retries=0).send('+254700000001', 'Hello')
+        assert sample('sms_gateway_request_duration_seconds_count', client='sync', outcome='ok') == before['ok'] + 1
+        assert sample('sms_gateway_request_duration_seconds_count', client='sync', outcome='error') == before['error'] + 2
+        assert sample('sms_gateway_errors_total', client='sync', error='http_503') == before['503'] + 1
+        assert sample('sms_gateway_errors_total', client='sync', error='ConnectionError') == before['connect'] + 1
+
+    @pytest.mark.django_db
+    def test_send_results(self, mocker):
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        OutboundSMS.objects.bulk_create([OutboundSMS(phone=customer.phone, message="Hi") for _ in range(3)])
+        mocker.patch('orders_mgmt.sms.send_sms', side_effect=RuntimeError("gateway down"))
+        before = sample('sms_messages_total', result='retry')
+        dispatch_pending()
+        assert sample('sms_messages_total', result='retry') == before + 3
+
+
+class TestWorkerMetricsServer:
+    def test_serves_the_process_metrics(self, settings):
+        settings.METRICS_TOKEN = "scrape-token"
+        observe_gateway_call('sync', time.perf_counter(), 'http_503')
+        server = start_metrics_server(0, '127.0.0.1')
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            assert requests.get(url, timeout=5).status_code == 403
+            assert requests.get(f'http://127.0.0.1:{server.server_port}/_ah/start', timeout=5).status_code == 404
+            response = requests.get(url, headers={'Authorization': "Bearer scrape-token"}, timeout=5)
+            assert response.status_code == 200
+            assert 'sms_gateway_errors_total{client="sync",error="http_503"}' in response.text
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @pytest.mark.django_db
+    def test_send_sms_starts_it(self, settings, mocker):
+        start = mocker.patch('orders_mgmt.management.commands.send_sms.start_metrics_server')
+        call_command('send_sms', '--once')
+        start.assert_not_called()
+        settings.SMS_WORKER_METRICS_PORT = 9100
+        call_command('send_sms', '--once')
+        start.assert_called_once_with(9100)
+
+
+def test_totals_across_worker_processes(tmp_path, monkeypatch):
+    # Each spawned process is a separate "gunicorn worker" writing to the shared directory
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(WORKERS, mp_context=context, initializer=workers.setup) as pool:
+        assert list(pool.map(workers.record_gateway_calls, [10] * WORKERS)) == [10] * WORKERS
+    with ProcessPoolExecutor(1, mp_context=context, initializer=workers.setup) as pool:
+        page = pool.submit(workers.scrape).result()
+    assert re.search(r'^sms_gateway_request_duration_seconds_count\{client="sync",outcome="ok"\} 15\.0$', page, re.M)
+    assert re.search(r'^sms_gateway_errors_total\{client="sync",error="http_503"\} 15\.0$', page, re.M)
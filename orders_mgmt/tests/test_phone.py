@@ -0,0 +1,107 @@
+import pytest
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt.models import Customer, Order, OutboundSMS
+from orders_mgmt.phone import InvalidPhoneNumber, lookup, parse, prefix_table
+from orders_mgmt.sms import enqueue_confirmation, enqueue_confirmations
+
+
+class TestParse:
+    @pytest.mark.parametrize('raw', [
+        "+254712345678", "+254 712 345 678", "+254-712-345-678", "00254712345678",
+        "254712345678", "0712345678", "0712 345678", "712345678", "(0712) 345-678",
+    ])
+    def test_kenyan_forms(self, raw):
+        number, info = parse(raw)
+        assert number == "+254712345678"
+        assert (info.country, info.carrier, info.cost_tier) == ("KE", "Safaricom", "local")
+
+    @pytest.mark.parametrize('raw, country, carrier, cost_tier', [
+        ("+254733123456", "KE", "Airtel", "local"),
+        ("+254747123456", "KE", "JTL", "local"),  # a 6-digit range inside no 5-digit one
+        ("+254110123456", "KE", "Safaricom", "local"),
+        ("+256772123456", "UG", "MTN", "regional"),
+        ("+2348031234567", "NG", "", "international"),
+    ])
+    def test_prefix_lookup(self, raw, country, carrier, cost_tier):
+        _, info = parse(raw)
+        assert (info.country, info.carrier, info.cost_tier) == (country, carrier, cost_tier)
+
+    @pytest.mark.parametrize('raw', [
+        "", "+", "phone", "+254 71234567x", "+2547123456789012",
+        "+25420123456",  # Nairobi landline
+        "+25471234567",  # one digit short
+        "+2547123456789",  # one digit long
+        "+14155550123",  # no ranges outside the table
+    ])
+    def test_rejected(self, raw):
+        with pytest.raises(InvalidPhoneNumber):
+            parse(raw)
+
+    def test_default_country(self, settings):
+        settings.PHONE_DEFAULT_COUNTRY_CODE = '256'
+        assert parse("0772123456")[0] == "+256772123456"
+
+    def test_table_keys_have_one_length(self):
+        key_length, table = prefix_table()
+        assert {len(key) for key in table} == {key_length}
+        assert lookup("254712345678") == table["254712"]
+
+
+@pytest.mark.django_db
+class TestPhoneValidation:
+    def setup_method(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+
+    def test_customer_phone_normalized_on_write(self):
+        response = self.client.post(reverse('customer-list'), {"name": "John Doe", "code": "C001", "phone": "0712 345 678"}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['phone'] == "+254712345678"
+        customer = Customer.objects.get()
+        assert customer.phone == "+254712345678"
+        response = self.client.patch(reverse('customer-detail', args=[customer.id]), {"phone": "00254733123456"}, format='json')
+        assert Customer.objects.get().phone == "+254733123456"
+
+    def test_customer_phone_rejected(self):
+        response = self.client.post(reverse('customer-list'), {"name": "John Doe", "code": "C001", "phone": "020 123456"}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'phone' in response.data
+        assert not Customer.objects.exists()
+
+    def test_undeliverable_number_is_never_queued(self):
+        # Rows written before validation existed
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="020123456")
+        order = Order.objects.create(customer=customer, item="phone", quantity=1)
+        sms = enqueue_confirmation(order, claimed=True)
+        assert sms.status == OutboundSMS.Status.FAILED
+        assert sms.attempts == 0
+        assert "deliver" in sms.error
+
+    def test_legacy_number_is_normalized_when_queued(self):
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="0712345678")
+        orders = Order.objects.bulk_create([Order(customer=customer, item="phone", quantity=1)])
+        [sms] = enqueue_confirmations(orders)
+        assert (sms.phone, sms.status) == ("+254712345678", OutboundSMS.Status.PENDING)
+
+    def test_normalize_phones_command(self):
+        Customer.objects.bulk_create([
+            Customer(name="A", code="C001", phone="0712345678"),
+            Customer(name="B", code="C002", phone="+254733123456"),
+            Customer(name="C", code="C003", phone="020123456"),
+            Customer(name="D", code="C004", phone="254 747 123 456"),
+        ])
+        out, err = StringIO(), StringIO()
+        call_command('normalize_phones', '--dry-run', stdout=out, stderr=err)
+        assert "Would normalize 2 of 4" in out.getvalue()
+        assert Customer.objects.get(code="C001").phone == "0712345678"
+
+        call_command('normalize_phones', '--batch-size', '3', stdout=out, stderr=err)
+        assert dict(Customer.objects.values_list('code', 'phone')) == {
+            "C001": "+254712345678", "C002": "+254733123456", "C003": "020123456", "C004": "+254747123456",
+        }
+        assert "C003" in err.getvalue()
@@ -0,0 +1,127 @@
+import sqlite3
+import time
+import pytest
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import replica
+from orders_mgmt.models import Customer, Order
+
+
+@pytest.fixture(scope='class')
+def replica_alias(tmp_path_factory):
+    # A second SQLite database as the replica. Added before the test's database setup, which checks
+    # the aliases a test may use.
+    if connections['default'].vendor != 'sqlite':
+        pytest.skip("replicates with SQLite's backup API")
+    path = tmp_path_factory.mktemp("replica") / "replica.db"
+    connections.settings[replica.REPLICA] = {**connections['default'].settings_dict, 'NAME': str(path)}
+    yield path
+    connections[replica.REPLICA].close()
+    del connections[replica.REPLICA]
+    del connections.settings[replica.REPLICA]
+
+
+@pytest.fixture
+def replicate(replica_alias, transactional_db):
+    # Copies the primary over the replica, as replication would catch up; until then the replica lags behind
+    def replicate():
+        connections['default'].ensure_connection()
+        target = sqlite3.connect(replica_alias)
+        try:
+            connections['default'].connection.backup(target)
+        finally:
+            target.close()
+
+    replicate()
+    return replicate
+
+
+def api_client(username):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username))
+    return client
+
+
+@pytest.mark.usefixtures('replica_alias')
+@pytest.mark.django_db(transaction=True, databases=['default', replica.REPLICA])
+class TestReplicaReads:
+    @pytest.fixture(autouse=True)
+    def data(self, replicate, settings):
+        settings.REPLICA_PIN_SECONDS = 5
+        self.client = api_client('staff')
+        self.customer = Customer.objects.create(name="John Doe", code="C001", phone="+254712345678")
+        self.order = Order.objects.create(customer=self.customer, item="phone", quantity=1)
+        replicate()
+
+    def codes(self, client):
+        return [row["code"] for row in client.get(reverse('customer-list')).json()["results"]]
+
+    def test_safe_reads_use_the_replica(self, replicate):
+        Customer.objects.create(name="Jane Doe", code="C002", phone="+254733123456")  # not replicated yet
+        with CaptureQueriesContext(connections[replica.REPLICA]) as queries:
+            assert self.codes(self.client) == ["C001"]
+            response = self.client.get(reverse('order-detail', args=[self.order.id]))
+            assert response.json()["item"] == "phone"
+            assert self.client.get(reverse('customer-stats', args=[self.customer.id])).status_code == status.HTTP_200_OK
+        assert len(queries) == 4  # the list, the order, and the customer and its stats
+        replicate()
+        assert self.codes(self.client) == ["C001", "C002"]
+
+    def test_export_streams_from_the_replica(self):
+        Order.objects.create(customer=self.customer, item="case", quantity=1)
+        response = self.client.get(reverse('order-export'), {'output': 'ndjson'})
+        assert len(b''.join(response.streaming_content).splitlines()) == 1
+
+    def test_writer_reads_its_own_writes(self, mocker):
+        response = self.client.post(reverse('customer-list'), {"name": "Jane Doe", "code": "C002", "phone": "+254733123456"}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert self.codes(self.client) == ["C001", "C002"]
+        # Other clients keep reading the replica
+        assert self.codes(api_client('other')) == ["C001"]
+        # and so does the writer, once the pin runs out
+        later = time.time() + 6
+        mocker.patch('django.core.cache.backends.locmem.time.time', return_value=later)
+        assert self.codes(self.client) == ["C001"]
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post(reverse('customer-list'), {"name": "Jane Doe"}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        Customer.objects.create(name="Jane Doe", code="C002", phone="+254733123456")
+        assert self.codes(self.client) == ["C001"]
+
+    def test_writes_go_to_the_primary(self):
+        response = self.client.patch(reverse('order-detail', args=[self.order.id]), {"item": "case"}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert Order.objects.get().item == "case"
+        assert Order.objects.using(replica.REPLICA).get().item == "phone"
+        # An instance read from the replica is saved to the primary
+        with replica.request_scope():
+            replica.read_from_replica(User.objects.create_user('reader'))
+            order = Order.objects.get()
+            assert order._state.db == replica.REPLICA
+            order.quantity = 5
+            order.save()
+        assert Order.objects.get().quantity == 5
+
+    def test_transactions_read_the_primary(self):
+        with replica.request_scope():
+            replica.read_from_replica(User.objects.get(username='staff'))
+            assert Customer.objects.db == replica.REPLICA
+            with transaction.atomic():
+                Customer.objects.create(name="Jane Doe", code="C002", phone="+254733123456")
+                assert Customer.objects.count() == 2
+            # Only this app's tables: users, sessions and the cache stay on the primary
+            assert User.objects.db == 'default'
+
+
+@pytest.mark.django_db
+def test_without_a_replica_everything_reads_the_primary():
+    assert not replica.configured()
+    user = User.objects.create_user('staff')
+    with replica.request_scope():
+        replica.read_from_replica(user)
+        assert Customer.objects.db == 'default'
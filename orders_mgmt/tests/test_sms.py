@@ -0,0 +1,190 @@
+import httpx
+import pytest
+import requests
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from django.core.management import call_command
+from django.utils import timezone
+from orders_mgmt.models import Customer, Order, OutboundSMS
+from orders_mgmt.sms import claim_pending, collect_batch, dispatch_pending, enqueue_confirmation, send_claimed_async
+
+
+def gateway_reply(*recipients):
+    return {"SMSMessageData": {"Message": f"Sent to {len(recipients)}", "Recipients": list(recipients)}}
+
+
+def accepted(number, message_id="ATXid_1"):
+    return {"statusCode": 101, "number": number, "status": "Success", "cost": "KES 0.8000", "messageId": message_id}
+
+
+@pytest.fixture
+def order():
+    customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+    return Order.objects.create(customer=customer, item="Laptop", quantity=2)
+
+
+@pytest.mark.django_db
+class TestOutboundQueue:
+    def test_enqueue_confirmation(self, order):
+        sms = enqueue_confirmation(order)
+        assert sms.status == OutboundSMS.Status.PENDING
+        assert sms.phone == "+254700000000"
+        assert "John Doe" in sms.message and "Laptop" in sms.message
+
+    def test_claim_marks_sending(self, order):
+        sms = enqueue_confirmation(order)
+        claimed = claim_pending(10)
+        assert [s.id for s in claimed] == [sms.id]
+        assert claimed[0].status == OutboundSMS.Status.SENDING
+        assert claimed[0].attempts == 1
+        assert claim_pending(10) == []  # already claimed
+
+    def test_stale_claim_is_retried(self, order, settings):
+        sms = enqueue_confirmation(order)
+        claim_pending(10)
+        OutboundSMS.objects.filter(id=sms.id).update(claimed_at=timezone.now() - timedelta(seconds=settings.SMS_CLAIM_TIMEOUT + 1))
+        assert [s.id for s in claim_pending(10)] == [sms.id]
+
+    def test_dispatch_success(self, order, mocker):
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(accepted("+254700000000"))
+        sms = enqueue_confirmation(order)
+        assert dispatch_pending() == 1
+        sms.refresh_from_db()
+        assert sms.status == OutboundSMS.Status.SENT
+        assert sms.sent_at is not None
+        assert sms.provider_message_id == "ATXid_1"
+        assert sms.cost == "KES 0.8000"
+        assert mock_send.call_args.args[0] == "+254700000000"
+
+    def test_dispatch_failure_requeues_then_fails(self, order, mocker, settings):
+        settings.SMS_MAX_ATTEMPTS = 2
+        mocker.patch('orders_mgmt.sms.send_sms', side_effect=Exception("API Error"))
+        sms = enqueue_confirmation(order)
+        dispatch_pending()
+        sms.refresh_from_db()
+        assert sms.status == OutboundSMS.Status.PENDING
+        assert sms.error == "API Error"
+        dispatch_pending()
+        sms.refresh_from_db()
+        assert sms.status == OutboundSMS.Status.FAILED
+        assert sms.attempts == 2
+
+    def test_read_timeout_is_not_sent_again(self, order, mocker):
+        # The gateway may have accepted the message before the reply timed out; a resend could bill twice
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms', side_effect=requests.ReadTimeout("read timed out"))
+        sms = enqueue_confirmation(order)
+        dispatch_pending()
+        sms.refresh_from_db()
+        assert sms.status == OutboundSMS.Status.FAILED
+        assert sms.attempts == 1
+        assert dispatch_pending() == 0
+        assert mock_send.call_count == 1
+
+    def test_async_read_timeout_is_not_sent_again(self, order, mocker):
+        client = mocker.patch('orders_mgmt.sms.get_async_client').return_value
+        client.send = mocker.AsyncMock(side_effect=httpx.ReadTimeout("read timed out"))
+        sms = enqueue_confirmation(order, claimed=True)
+        async_to_sync(send_claimed_async)(sms)
+        sms.refresh_from_db()
+        assert sms.status == OutboundSMS.Status.FAILED
+        assert claim_pending(10) == []
+
+
+@pytest.mark.django_db
+class TestSendSMSCommand:
+    def test_once_drains_queue(self, order, mocker):
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(accepted("+254700000000"))
+        for _ in range(3):
+            enqueue_confirmation(order)
+        call_command('send_sms', '--once', '--batch-size', '1', '--max-wait', '0')
+        assert mock_send.call_count == 3
+        assert not OutboundSMS.objects.exclude(status=OutboundSMS.Status.SENT).exists()
+
+
+@pytest.mark.django_db
+class TestBatchedDispatch:
+    @pytest.fixture
+    def customers(self):
+        return [
+            Customer.objects.create(name=f"Customer {i}", code=f"C{i:03}", phone=f"+25470000000{i}")
+            for i in range(3)
+        ]
+
+    def queue(self, customers, message):
+        return [OutboundSMS.objects.create(phone=c.phone, message=message) for c in customers]
+
+    def test_identical_messages_share_one_call(self, customers, mocker):
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(
+            *[accepted(c.phone, f"ATXid_{c.code}") for c in reversed(customers)]
+        )
+        messages = self.queue(customers, "Promo")
+        assert dispatch_pending(10) == 3
+        mock_send.assert_called_once()
+        assert mock_send.call_args.args[0] == ",".join(c.phone for c in customers)
+        for sms, customer in zip(messages, customers):
+            sms.refresh_from_db()
+            assert sms.status == OutboundSMS.Status.SENT
+            assert sms.provider_message_id == f"ATXid_{customer.code}"
+
+    def test_matching_confirmations_share_one_call(self, mocker):
+        # The built-in confirmation has no per-order fields, so the same order from namesakes is one text
+        customers = [
+            Customer.objects.create(name="John Doe", code=f"J{i:03}", phone=f"+25471000000{i}") for i in range(2)
+        ]
+        for customer in customers:
+            enqueue_confirmation(Order.objects.create(customer=customer, item="Laptop", quantity=2))
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(*[accepted(c.phone) for c in customers])
+        assert dispatch_pending(10) == 2
+        mock_send.assert_called_once()
+        assert mock_send.call_args.args[1] == "Hello John Doe, your order for 2 of Laptop has been placed."
+
+    def test_distinct_messages_are_separate_calls(self, customers, mocker):
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(*[accepted(c.phone) for c in customers])
+        self.queue(customers[:2], "First")
+        self.queue(customers[2:], "Second")
+        dispatch_pending(10)
+        assert mock_send.call_count == 2
+
+    def test_per_recipient_results(self, customers, mocker, settings):
+        settings.SMS_MAX_ATTEMPTS = 1
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(
+            accepted(customers[0].phone),
+            {"statusCode": 403, "number": customers[1].phone, "status": "InvalidPhoneNumber"},
+        )
+        first, second, third = self.queue(customers, "Promo")
+        dispatch_pending(10)
+        first.refresh_from_db(); second.refresh_from_db(); third.refresh_from_db()
+        assert first.status == OutboundSMS.Status.SENT
+        assert second.status == OutboundSMS.Status.FAILED
+        assert second.error == "InvalidPhoneNumber"
+        assert third.status == OutboundSMS.Status.FAILED  # missing from the reply
+        assert third.error == "No recipient entry in gateway response"
+
+    def test_missing_recipient_is_not_sent_again(self, customers, mocker, caplog):
+        # The call was accepted; the entry may only be missing because the number was written differently
+        mock_send = mocker.patch('orders_mgmt.sms.send_sms')
+        mock_send.return_value = gateway_reply(accepted("254700000000"))
+        sms, = self.queue(customers[:1], "Promo")
+        dispatch_pending(10)
+        sms.refresh_from_db()
+        assert sms.status == OutboundSMS.Status.FAILED
+        assert sms.response == mock_send.return_value
+        assert "no recipient entry" in caplog.text
+        assert dispatch_pending(10) == 0
+        assert mock_send.call_count == 1
+
+    def test_collect_batch_waits_for_batch_to_fill(self, customers, mocker):
+        self.queue(customers[:1], "Promo")
+        # Another message arrives while the worker waits for the batch to fill
+        mocker.patch('orders_mgmt.sms.time.sleep', side_effect=lambda _: self.queue(customers[1:2], "Promo"))
+        assert len(collect_batch(2, max_wait=5)) == 2
+
+    def test_collect_batch_stops_at_max_wait(self, customers):
+        self.queue(customers[:1], "Promo")
+        assert len(collect_batch(3, max_wait=0)) == 1
@@ -0,0 +1,126 @@
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt import sms_templates
+from orders_mgmt.models import Customer, MessageTemplate, Order, OutboundSMS
+from orders_mgmt.sms_templates import ORDER_CONFIRMATION, CompiledTemplate, count_segments
+
+
+def fake_order(name="John Doe", language='en'):
+    customer = SimpleNamespace(name=name, code="C001", language=language)
+    return SimpleNamespace(id=7, customer=customer, item="phone", quantity=Decimal('2.00'), time="2025-01-01 10:00")
+
+
+class TestCompiledTemplate:
+    def test_render(self):
+        template = CompiledTemplate("Hi {customer_name} ({customer_code}), order #{order_id}: {quantity} x {item}")
+        assert template.render(fake_order()) == "Hi John Doe (C001), order #7: 2.00 x phone"
+
+    @pytest.mark.parametrize('body, expected', [
+        ("{{ref}} {item} {{end}}", "{ref} phone {end}"),
+        ("100% {item}, 0% {customer_code}", "100% phone, 0% C001"),
+        ("{item}", "phone"),
+        ("No placeholders, 100%", "No placeholders, 100%"),
+    ])
+    def test_literal_text(self, body, expected):
+        assert CompiledTemplate(body).render(fake_order()) == expected
+
+    @pytest.mark.parametrize('body', ["Hi {name}", "{quantity:.0f} items", "{item!r}", "unclosed {item"])
+    def test_invalid_bodies(self, body):
+        with pytest.raises(ValidationError):
+            CompiledTemplate(body)
+
+
+class TestSegments:
+    @pytest.mark.parametrize('text, expected', [
+        ("", ('GSM-7', 0, 0)),
+        ("a" * 160, ('GSM-7', 160, 1)),
+        ("a" * 161, ('GSM-7', 161, 2)),
+        ("a" * 306, ('GSM-7', 306, 2)),
+        ("a" * 307, ('GSM-7', 307, 3)),
+        ("Jambo! Bei ni €5", ('GSM-7', 17, 1)),  # € is an extension character: two septets
+        ("a" * 159 + "[", ('GSM-7', 161, 2)),
+        ("ü" * 160, ('GSM-7', 160, 1)),
+        ("`" * 70, ('UCS-2', 70, 1)),
+        ("Привет" * 12, ('UCS-2', 72, 2)),
+        ("🙂" * 35, ('UCS-2', 70, 1)),
+        ("🙂" * 36, ('UCS-2', 72, 2)),
+    ])
+    def test_count(self, text, expected):
+        assert tuple(count_segments(text)) == expected
+
+    def test_two_unit_characters_are_not_split(self):
+        # 152 septets then an extension character: it moves whole to the second part
+        assert count_segments("a" * 152 + "{" + "a" * 151).count == 2
+        assert count_segments("a" * 152 + "{" + "a" * 152).count == 3
+        assert count_segments("a" + "🙂" * 33 + "a" * 67).count == 2
+        assert count_segments("a" * 66 + "🙂" + "a" * 66).count == 3
+
+
+@pytest.mark.django_db
+class TestTemplateLookup:
+    def test_builtin_default(self):
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order()) == (
+            "Hello John Doe, your order for 2.00 of phone has been placed."
+        )
+
+    def test_language_variant_and_fallback(self):
+        MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='en', body="Order {item} placed")
+        MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='sw', body="Oda ya {item} imepokelewa")
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order(language='sw')) == "Oda ya phone imepokelewa"
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order(language='fr')) == "Order phone placed"
+
+    def test_compiled_once(self, django_assert_num_queries):
+        MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='en', body="Order {item} placed")
+        sms_templates.render(ORDER_CONFIRMATION, fake_order())
+        with django_assert_num_queries(0):
+            for _ in range(100):
+                sms_templates.render(ORDER_CONFIRMATION, fake_order())
+
+    def test_change_invalidates(self):
+        template = MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='en', body="Order {item} placed")
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order()) == "Order phone placed"
+        template.body = "Order {item} received"
+        template.save()
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order()) == "Order phone received"
+        template.delete()
+        assert "has been placed" in sms_templates.render(ORDER_CONFIRMATION, fake_order())
+
+    def test_other_workers_reload_after_ttl(self, settings, mocker):
+        MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='en', body="Order {item} placed")
+        sms_templates.render(ORDER_CONFIRMATION, fake_order())
+        # As another process would: the row changes without this process's signal firing
+        MessageTemplate.objects.update(body="Order {item} received")
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order()) == "Order phone placed"
+        later = sms_templates.time.monotonic() + settings.SMS_TEMPLATE_CACHE_TTL + 1
+        mocker.patch('orders_mgmt.sms_templates.time.monotonic', return_value=later)
+        assert sms_templates.render(ORDER_CONFIRMATION, fake_order()) == "Order phone received"
+
+    def test_model_validation(self):
+        with pytest.raises(ValidationError) as e:
+            MessageTemplate(name=ORDER_CONFIRMATION, language='en', body="Hi {name}").full_clean()
+        assert 'body' in e.value.message_dict
+
+    def test_order_uses_customer_language(self):
+        MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='sw', body="Habari {customer_name}, oda yako ya {item} imepokelewa. Asante!")
+        customer = Customer.objects.create(name="Amina", code="C002", phone="+254700000001", language='sw')
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('staff'))
+        response = client.post(reverse('order-list'), {"customer": customer.id, "item": "phone", "quantity": 1}, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        sms = OutboundSMS.objects.get(order=Order.objects.get())
+        assert sms.message == "Habari Amina, oda yako ya phone imepokelewa. Asante!"
+        assert sms.segments == 1
+
+    def test_segments_recorded(self):
+        MessageTemplate.objects.create(name=ORDER_CONFIRMATION, language='en', body="Привет {customer_name}! " * 5)
+        customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('staff'))
+        client.post(reverse('order-bulk'), [{"customer": customer.id, "item": "phone", "quantity": 1}] * 2, format='json')
+        assert list(OutboundSMS.objects.values_list('segments', flat=True)) == [2, 2]
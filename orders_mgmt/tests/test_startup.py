@@ -0,0 +1,30 @@
+from benchmarks.bench_startup import import_times, total_seconds
+from orders_sms_service import secret_manager
+
+# Loaded only where used: Secret Manager by secret_manager.get_secret, httpx by the async gateway client
+LAZY_MODULES = {'google.cloud.secretmanager', 'grpc', 'google.protobuf', 'africastalking', 'httpx'}
+# About 0.25s on a laptop; the budget leaves room for slow CI runners
+STARTUP_BUDGET_SECONDS = 0.75
+
+
+def test_startup_skips_heavy_imports():
+    loaded = {i.module for i in import_times()}
+    assert 'orders_mgmt.views' in loaded
+    assert not loaded & LAZY_MODULES
+
+
+def test_startup_within_budget():
+    # Best of three, so one slow run on a busy machine doesn't fail the build
+    assert min(total_seconds(import_times()) for _ in range(3)) < STARTUP_BUDGET_SECONDS
+
+
+def test_secret_fetched_once_per_process(mocker):
+    client = mocker.patch('orders_sms_service.secret_manager.client')
+    client.return_value.access_secret_version.return_value.payload.data = b"s3cret"
+    secret_manager.get_secret.cache_clear()
+    try:
+        assert secret_manager.get_secret("DJANGO_SECRET_KEY", "orders") == "s3cret"
+        assert secret_manager.get_secret("DJANGO_SECRET_KEY", "orders") == "s3cret"
+    finally:
+        secret_manager.get_secret.cache_clear()
+    client.return_value.access_secret_version.assert_called_once_with(name="projects/orders/secrets/DJANGO_SECRET_KEY/versions/latest")
@@ -0,0 +1,114 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders_mgmt.models import Customer, CustomerOrderStats, Order
+from orders_mgmt.stats import rebuild_stats, record_orders, remove_orders
+
+
+@pytest.fixture
+def customer():
+    return Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+
+
+def stats_for(customer):
+    return CustomerOrderStats.objects.get(customer=customer)
+
+
+@pytest.mark.django_db
+class TestIncrementalStats:
+    def test_record_orders_upserts(self, customer):
+        first = Order.objects.create(customer=customer, item="phone", quantity=Decimal("1.50"))
+        record_orders([first])
+        second = Order.objects.create(customer=customer, item="laptop", quantity=2)
+        record_orders([second])
+        stats = stats_for(customer)
+        assert stats.order_count == 2
+        assert stats.total_quantity == Decimal("3.50")
+        assert stats.last_order_time == second.time
+
+    def test_older_order_keeps_last_time(self, customer):
+        newer = Order.objects.create(customer=customer, item="phone", quantity=1)
+        older = Order.objects.create(customer=customer, item="phone", quantity=1)
+        record_orders([newer])
+        older.time = newer.time.replace(year=newer.time.year - 1)
+        record_orders([older])
+        assert stats_for(customer).last_order_time == newer.time
+
+    def test_remove_latest_order_recomputes_last_time(self, customer):
+        orders = [Order.objects.create(customer=customer, item="phone", quantity=1) for _ in range(3)]
+        record_orders(orders)
+        orders[-1].delete()
+        remove_orders([orders[-1]])
+        stats = stats_for(customer)
+        assert stats.order_count == 2
+        assert stats.total_quantity == 2
+        assert stats.last_order_time == orders[1].time
+
+    def test_remove_last_order(self, customer):
+        order = Order.objects.create(customer=customer, item="phone", quantity=1)
+        record_orders([order])
+        order.delete()
+        remove_orders([order])
+        stats = stats_for(customer)
+        assert (stats.order_count, stats.total_quantity, stats.last_order_time) == (0, 0, None)
+
+    def test_rebuild_matches_incremental(self, customer):
+        other = Customer.objects.create(name="Jane Doe", code="C002", phone="+254700000001")
+        orders = [Order.objects.create(customer=c, item="phone", quantity=i + 1) for i, c in enumerate([customer, other, customer])]
+        record_orders(orders)
+        expected = {s.customer_id: (s.order_count, s.total_quantity, s.last_order_time) for s in CustomerOrderStats.objects.all()}
+        CustomerOrderStats.objects.update(order_count=99)
+        assert rebuild_stats() == 2
+        assert {s.customer_id: (s.order_count, s.total_quantity, s.last_order_time) for s in CustomerOrderStats.objects.all()} == expected
+
+    def test_rebuild_command(self, customer, capsys):
+        Order.objects.create(customer=customer, item="phone", quantity=1)
+        call_command('rebuild_order_stats')
+        assert stats_for(customer).order_count == 1
+        assert "1 customer(s)" in capsys.readouterr().out
+
+
+@pytest.mark.django_db
+class TestStatsThroughAPI:
+    def setup_method(self):
+        self.client = APIClient()
+
+    def stats(self, customer):
+        response = self.client.get(reverse('customer-stats', kwargs={'pk': customer.id}))
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def test_stats_follow_create_update_delete(self, customer):
+        other = Customer.objects.create(name="Jane Doe", code="C002", phone="+254700000001")
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+        assert self.stats(customer)['order_count'] == 0
+
+        created = self.client.post(reverse('order-list'), {"customer": customer.id, "item": "phone", "quantity": 2}).data
+        self.client.post(reverse('order-bulk'), [{"customer": customer.id, "item": "cable", "quantity": 3}], format='json')
+        stats = self.stats(customer)
+        assert stats['order_count'] == 2
+        assert Decimal(stats['total_quantity']) == 5
+
+        url = reverse('order-detail', kwargs={'pk': created['id']})
+        self.client.patch(url, {"customer": other.id, "quantity": 4}, format='json')
+        assert self.stats(customer)['order_count'] == 1
+        assert Decimal(self.stats(other)['total_quantity']) == 4
+
+        self.client.delete(url)
+        assert self.stats(other)['order_count'] == 0
+        assert self.stats(other)['last_order_time'] is None
+
+    def test_stats_is_single_lookup(self, customer, django_assert_max_num_queries):
+        self.client.force_authenticate(user=User.objects.create_user('staff'))
+        Order.objects.bulk_create([Order(customer=customer, item="phone", quantity=1) for _ in range(50)])
+        rebuild_stats()
+        with django_assert_max_num_queries(2):
+            assert self.stats(customer)['order_count'] == 50
+
+    def test_stats_unauthenticated(self, customer):
+        response = self.client.get(reverse('customer-stats', kwargs={'pk': customer.id}))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,78 @@
+"""Worker processes for the cross-process tests in test_cache.py, test_idempotency.py and test_metrics.py.
+
+Kept apart from the test modules so spawned processes can import them before
+django.setup(). The database, cache backend and rates come from the environment.
+"""
+import time
+from types import SimpleNamespace
+
+THROTTLE_ATTEMPTS = 25
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def create_cache_table():
+    from django.core.management import call_command
+    call_command('createcachetable')
+
+
+def run_throttle(start_at):
+    """Wait until `start_at`, then make THROTTLE_ATTEMPTS requests as user 1. Returns how many were allowed."""
+    from orders_mgmt.throttling import SlidingWindowThrottle
+
+    request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=1), META={})
+    view = SimpleNamespace(throttle_scope='orders')
+    time.sleep(max(start_at - time.time(), 0))
+    return sum(SlidingWindowThrottle().allow_request(request, view) for _ in range(THROTTLE_ATTEMPTS))
+
+
+def prepare_orders_database():
+    """Migrate a scratch SQLite database (WAL, so readers don't block the writer). Returns (user id, customer id)."""
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from orders_mgmt.models import Customer
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('staff')
+    customer = Customer.objects.create(name="John Doe", code="C001", phone="+254700000000")
+    return user.pk, customer.pk
+
+
+def post_order(start_at, user_id, data, idempotency_key):
+    """Wait until `start_at`, then POST the order. Returns (status code, replayed, order id)."""
+    from django.contrib.auth.models import User
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    client = APIClient(SERVER_NAME='localhost')  # outside the test runner 'testserver' isn't an allowed host
+    client.force_authenticate(user=User.objects.get(pk=user_id))
+    time.sleep(max(start_at - time.time(), 0))
+    response = client.post(reverse('order-list'), data, format='json', HTTP_IDEMPOTENCY_KEY=idempotency_key)
+    return response.status_code, 'Idempotent-Replayed' in response, response.data.get('id')
+
+
+def count_rows():
+    from orders_mgmt.models import Order, OutboundSMS
+    return Order.objects.count(), OutboundSMS.objects.count()
+
+
+def record_gateway_calls(count):
+    """Record `count` gateway calls, every other one failing with a 503."""
+    from orders_mgmt import metrics
+    for i in range(count):
+        metrics.observe_gateway_call('sync', time.perf_counter(), 'http_503' if i % 2 else None)
+    return count
+
+
+def scrape():
+    """The /metrics page, as a server process would render it."""
+    from django.test import RequestFactory, override_settings
+    from orders_mgmt.metrics import metrics_view
+    with override_settings(METRICS_TOKEN="scrape-token"):
+        return metrics_view(RequestFactory().get('/metrics', HTTP_AUTHORIZATION="Bearer scrape-token")).content.decode()
@@ -0,0 +1,63 @@
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Per-user (or per-IP) rate limit over a sliding window, scoped by the view's `throttle_scope`.
+
+    Keeps one counter per fixed window and estimates the sliding count as
+    previous * (share of the previous window still in range) + current. A request
+    costs one atomic cache increment and one read, instead of the read-modify-write
+    of a timestamp list that SimpleRateThrottle does, so counts hold across workers
+    sharing the cache. Rejected requests are counted too, so a client that keeps
+    retrying stays limited until it backs off.
+    """
+    default_scope = 'user'
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+
+    def __init__(self):
+        # The scope comes from the view, so the rate is parsed in allow_request()
+        pass
+
+    def get_rate(self):
+        # Read the rates on each request rather than SimpleRateThrottle's import-time copy
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None) or self.default_scope
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+
+        now = self.timer()
+        window, offset = divmod(now, self.duration)
+        self.elapsed = offset / self.duration
+        self.current = self.increment(f'{self.key}:{int(window)}')
+        self.previous = self.cache.get(f'{self.key}:{int(window) - 1}', 0)
+        return self.previous * (1 - self.elapsed) + self.current <= self.num_requests
+
+    def increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # First request in this window; the key outlives the next window, which weighs it
+            if self.cache.add(key, 1, self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def wait(self):
+        if self.current > self.num_requests:
+            # Over the limit on this window alone: wait for the next one
+            return self.duration * (1 - self.elapsed)
+        # Wait until enough of the previous window has slid out of range
+        needed = 1 - (self.num_requests - self.current) / self.previous
+        return max(needed - self.elapsed, 0) * self.duration
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # from .views import SendConfirmationSMSView
-from orders_mgmt.views import OrderViewSet, CustomerViewSet
+from orders_mgmt.views import AsyncOrderCreateView, DeliveryReportView, OrderViewSet, CustomerViewSet
 
 
 router = DefaultRouter()
@@ -9,6 +9,9 @@ router.register(r'customers', CustomerViewSet)
 router.register(r'orders', OrderViewSet)
 
 urlpatterns = [
+    # Ahead of the router so 'async' isn't taken for an order pk
+    path('orders/async/', AsyncOrderCreateView.as_view(), name='order-create-async'),
+    path('sms/delivery-reports/', DeliveryReportView.as_view(), name='sms-delivery-reports'),
     path('', include(router.urls)), 
     # path('send-confirmation/', SendConfirmationSMSView.as_view(), name='send-confirmation')
 ]
@@ -1,67 +1,314 @@
+import hmac
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, HttpResponse, HttpResponseRedirect
-from rest_framework import viewsets
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.renderers import TemplateHTMLRenderer
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from orders_mgmt.models import Customer, Order
-from orders_mgmt.serializers import CustomerSerializer, OrderSerializer
-import africastalking as africastalking
-import os
-import requests
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from rest_framework.views import APIView
+from orders_mgmt.export import CONTENT_TYPES, stream_export, stream_rows
+from orders_mgmt import archive, customer_cache, delivery, idempotency, replica
+from orders_mgmt.models import Customer, CustomerOrderStats, Order, OutboundSMS
+from orders_mgmt.pagination import CustomerCursorPagination, OrderCursorPagination
+from orders_mgmt.renderers import ORJSONRenderer
+from orders_mgmt.serializers import CustomerOrderStatsSerializer, CustomerSerializer, OrderSerializer
+from orders_mgmt.sms import enqueue_confirmation, enqueue_confirmations, send_claimed_async
+from orders_mgmt.stats import record_orders, remove_orders
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+
+def parse_id(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an integer id.'})
+
+
+def parse_time_param(value, name):
+    # A bare date means midnight at the start of that day in the current time zone
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = day and datetime.combine(day, datetime.min.time())
+    except ValueError:  # well-formed but out of range, e.g. 2025-02-30
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Must be an ISO 8601 date or datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class FastListMixin:
+    # List pages for the orjson renderer are read with values() and encoded as they come back,
+    # skipping a model instance and a serializer field call per value. `list_values` maps each
+    # output field to its lookup and must produce exactly what serializer_class would; the
+    # browsable API and ?expand= still go through the serializer.
+    list_values = {}
+
+    def list(self, request, *args, **kwargs):
+        if not isinstance(request.accepted_renderer, ORJSONRenderer) or request.query_params.get('expand'):
+            return super().list(request, *args, **kwargs)
+        names = list(self.list_values)
+        # Cursor pagination reads its position from the row dicts, by the ordering fields' names
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.list_values.values())
+        page = self.paginate_queryset(queryset)
+        rows = [dict(zip(names, row.values())) for row in (queryset if page is None else page)]
+        return Response(rows) if page is None else self.get_paginated_response(rows)
+
+
+class ReplicaReadMixin:
+    # Safe requests read from the replica database when there is one (orders_mgmt.replica), once
+    # authentication has said who the client is. A successful write pins the client to the primary.
+    def dispatch(self, request, *args, **kwargs):
+        with replica.request_scope():
+            response = super().dispatch(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            replica.pin(self.request.user)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            replica.read_from_replica(request.user)
+
 
 # View instantiates the serializer class, passing the parsed(incoming JSON to python datatype e.g dictionary) data from the request to it.
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    list_values = {name: name for name in CustomerSerializer.Meta.fields}
     permission_classes = [IsAuthenticated]
+    pagination_class = CustomerCursorPagination
+    throttle_scope = 'customers'
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        # GET /api/customers/<id>/stats/ reads the precomputed row, never the Order table
+        customer = self.get_object()
+        stats = CustomerOrderStats.objects.filter(customer=customer).first() or CustomerOrderStats(customer=customer)
+        return Response(CustomerOrderStatsSerializer(stats).data)
+
+    @action(detail=False, url_path=r'by-code/(?P<code>[^/]+)')
+    def by_code(self, request, code=None):
+        # GET /api/customers/by-code/<code>/ from the per-process cache, so hot customers skip the database
+        customer = customer_cache.get(code)
+        if customer is None:
+            raise NotFound(f"No customer with code '{code}'.")
+        return Response(self.get_serializer(customer).data)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer 
+    list_values = {
+        'id': 'id', 'customer': 'customer_id', 'item': 'item', 'quantity': 'quantity', 'time': 'time',
+        'delivery_status': 'delivery_status',
+    }
     permission_classes = [IsAuthenticated]   
+    pagination_class = OrderCursorPagination
+    throttle_scope = 'orders'
+
+    def get_expand(self):
+        if self.request is None or self.request.method not in ('GET', 'HEAD'):
+            return set()
+        return set(filter(None, self.request.query_params.get('expand', '').split(',')))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'export'):
+            queryset = self.filter_queryset_by_params(queryset)
+        if self.action != 'export':
+            queryset = queryset.annotate(delivery_status=self.delivery_status())
+        if 'customer' in self.get_expand():
+            queryset = queryset.select_related('customer')
+        return queryset
+
+    @staticmethod
+    def delivery_status():
+        # The order's latest confirmation SMS: its delivery report status once there is one, else its queue status
+        latest = OutboundSMS.objects.filter(order=OuterRef('pk')).order_by('-id')
+        return Subquery(latest.values(state=Coalesce(NullIf('delivery_status', Value('')), 'status'))[:1])
+
+    def filter_queryset_by_params(self, queryset):
+        # ?customer=<id>, ?customer_code=, ?since= / ?until= (ISO date or datetime), ?item=
+        # customer + time range is served by order_customer_time_idx, time range alone by order_time_idx
+        params = self.request.query_params
+        if params.get('customer'):
+            queryset = queryset.filter(customer_id=parse_id(params['customer'], 'customer'))
+        if params.get('customer_code'):
+            queryset = queryset.filter(customer__code=params['customer_code'])
+        if params.get('since'):
+            queryset = queryset.filter(time__gte=parse_time_param(params['since'], 'since'))
+        if params.get('until'):
+            queryset = queryset.filter(time__lt=parse_time_param(params['until'], 'until'))
+        if params.get('item'):
+            queryset = queryset.filter(item=params['item'])
+        return queryset
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
+    @idempotency.idempotent
     def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data) 
-        # validation checks
-        serializer.is_valid(raise_exception=True)
-        # If valid: The serializer's validated_data attribute is populated with the clean, validated Python data. view also saves the new order instance to the database by triggering perform_create or create() method.
-        self.perform_create(serializer)
-        order = serializer.instance
-        customer = order.customer
+        return super().create(request, *args, **kwargs)
 
-        customer_phone = customer.phone
+    def perform_create(self, serializer):
+        # The order and its confirmation SMS commit together; the send_sms worker delivers the message,
+        # so the response no longer waits on the gateway.
+        with transaction.atomic():
+            order = serializer.save()
+            enqueue_confirmation(order)
+            record_orders([order])
 
-        message = f"Hello {customer.name}, your order for {order.quantity} of {order.item} at {order.time} has been placed."
+    def perform_update(self, serializer):
+        # Move the order's old customer/quantity out of the stats and the new ones in
+        with transaction.atomic():
+            previous = Order.objects.select_for_update().get(pk=serializer.instance.pk)
+            order = serializer.save()
+            remove_orders([previous])
+            record_orders([order])
 
-        username = "sandbox"
-        api_key = os.getenv('AFRICASTALKING_API_KEY')
-        url = os.getenv('MESSAGING_URL')
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            remove_orders([instance])
 
-        headers = {
-            'Accept': 'application/json',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'apiKey': api_key
-        }
+    @action(detail=False)
+    def export(self, request):
+        # GET /api/orders/export/?output=csv|ndjson, same filters as the list. Rows are streamed
+        # as they're read, so memory use doesn't depend on the size of the date range.
+        output = self.get_output()
+        queryset = self.get_queryset()
+        # The rows are read while the response streams, after the view has returned: pick the database now
+        chunks = stream_export(queryset.using(queryset.db), output, settings.ORDERS_EXPORT_CHUNK_SIZE)
+        return self.attachment(chunks, output, 'orders')
 
-        data = {
-            'username': username,
-            'to': customer_phone,
-            'message': message
-        }
+    @action(detail=False)
+    def archived(self, request):
+        # GET /api/orders/archived/?since=&until= streams orders moved out of the table by archive_orders,
+        # in the export format. Both bounds are required: each day in the range is a file to read.
+        params = request.query_params
+        missing = {name: 'This parameter is required.' for name in ('since', 'until') if not params.get(name)}
+        if missing:
+            raise ValidationError(missing)
+        output = self.get_output()
+        rows = archive.read_orders(
+            parse_time_param(params['since'], 'since'),
+            parse_time_param(params['until'], 'until'),
+            customer_id=parse_id(params['customer'], 'customer') if params.get('customer') else None,
+            customer_code=params.get('customer_code') or None,
+            item=params.get('item') or None,
+        )
+        return self.attachment(stream_rows(rows, output, settings.ORDERS_EXPORT_CHUNK_SIZE), output, 'archived-orders')
 
-        try:
-            # send response to africastalking gateway
-            response = requests.post(url, headers=headers, data=data)
-            response_data = response.json()
-        # Serializer serializes saved Python object back into a native Python dictionary. DRF's renderer classes then convert this dictionary into a JSON response.
-            return Response(response_data, status=201)
-        # error handling    
-        except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+    def get_output(self):
+        output = self.request.query_params.get('output', 'csv')
+        if output not in CONTENT_TYPES:
+            raise ValidationError({'output': f"Must be one of: {', '.join(CONTENT_TYPES)}."})
+        return output
+
+    @staticmethod
+    def attachment(chunks, output, name):
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="{name}.{output}"'
+        return response
+
+    @action(detail=False, methods=['post'])
+    @idempotency.idempotent
+    def bulk(self, request):
+        # POST /api/orders/bulk/ with a list of orders: one customer lookup, one multi-row
+        # insert for the orders and one for their confirmation SMS, all in one transaction.
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            orders = serializer.save()
+            enqueue_confirmations(orders)
+            record_orders(orders)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
    
+class DeliveryReportView(APIView):
+    # POST /api/sms/delivery-reports/?token=... is Africa's Talking's delivery report callback. The
+    # gateway can't authenticate, so it carries SMS_DELIVERY_REPORT_TOKEN in the URL instead; reports
+    # are buffered and applied in batches (orders_mgmt.delivery).
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = []
+    parser_classes = [FormParser, JSONParser]
+
+    def post(self, request):
+        expected = settings.SMS_DELIVERY_REPORT_TOKEN
+        token = request.query_params.get('token', '')
+        if not expected or not hmac.compare_digest(token.encode(), expected.encode()):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        delivery.buffer.add(delivery.parse_report(request.data))
+        return Response(status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name='dispatch')  # as for DRF views; SessionAuthentication enforces CSRF itself
+class AsyncOrderCreateView(View):
+    # POST /api/orders/async/ for ASGI deployments. DRF views are sync only, so authentication,
+    # throttling and validation go through OrderViewSet in a single thread hop, while the
+    # gateway call runs on the event loop and doesn't tie up a worker thread.
+    async def post(self, request, *args, **kwargs):
+        view, serializer, claim, early_response = await sync_to_async(self.validate)(request)
+        if early_response is not None:
+            return early_response
+        inline = settings.SMS_ASYNC_INLINE_SEND
+        sms, response = await sync_to_async(self.save)(serializer, inline, claim)
+        if inline and sms.status == OutboundSMS.Status.SENDING:
+            # The row is already durable; a failed send is left pending for the send_sms worker.
+            await send_claimed_async(sms)
+        return view.finalize_response(view.request, response).render()
+
+    def validate(self, request):
+        # Mirrors APIView.dispatch up to the handler call
+        view = OrderViewSet(action_map={'post': 'create'}, args=(), kwargs={})
+        view.request = view.initialize_request(request)
+        view.headers = view.default_response_headers
+        try:
+            view.initial(view.request)
+            serializer = view.get_serializer(data=view.request.data)
+            serializer.is_valid(raise_exception=True)
+            claim, replayed = idempotency.begin(view.request)
+        except Exception as exc:
+            response = view.finalize_response(view.request, view.handle_exception(exc))
+            return view, None, None, response.render()
+        if replayed is not None:
+            return view, None, None, view.finalize_response(view.request, replayed).render()
+        return view, serializer, claim, None
+
+    def save(self, serializer, inline, claim=None):
+        try:
+            with transaction.atomic():
+                order = serializer.save()
+                record_orders([order])
+                sms = enqueue_confirmation(order, claimed=inline)
+                response = Response(serializer.data, status=status.HTTP_201_CREATED)
+                if claim is not None:
+                    idempotency.complete(claim, response)
+        except Exception:
+            if claim is not None:
+                idempotency.release(claim)
+            raise
+        replica.pin(serializer.context['request'].user)
+        return sms, response
+
+
 def index(request):
     if request.user.is_authenticated:
         return render(request, 'dashboard.html', {'user': request.user})
@@ -0,0 +1,22 @@
+"""PostgreSQL with a psycopg 3 connection pool per process.
+
+pooled() turns a DATABASES entry from dj_database_url into one that uses
+this package's backend (base.py): Django's PostgreSQL backend with its pool
+reported to Prometheus. Each request checks a connection out and gives it back
+when Django closes it at the end of the request. With CONN_HEALTH_CHECKS, the
+pool tests a connection before handing it out, so one dropped while idle (e.g.
+by a Cloud SQL failover) is replaced rather than failing the request.
+"""
+ENGINE = 'orders_sms_service.postgresql'
+
+
+def pooled(config, **options):
+    """`config` switched to the pooled backend with psycopg_pool.ConnectionPool `options`; other databases as they are."""
+    if config.get('ENGINE') != 'django.db.backends.postgresql':
+        return config
+    return {
+        **config,
+        'ENGINE': ENGINE,
+        'CONN_MAX_AGE': 0,  # the pool keeps connections open; Django refuses persistent ones with a pool
+        'OPTIONS': {**config.get('OPTIONS', {}), 'pool': options},
+    }
@@ -0,0 +1,27 @@
+import time
+
+from django.db.backends.postgresql import base
+from psycopg_pool import PoolTimeout
+
+from orders_mgmt.metrics import observe_db_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if not pool:
+            return super().get_new_connection(conn_params)
+        started = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except PoolTimeout:
+            observe_db_pool(self.alias, pool.pop_stats(), time.perf_counter() - started, timed_out=True)
+            raise
+        observe_db_pool(self.alias, pool.pop_stats(), time.perf_counter() - started)
+        return connection
+
+    def close(self):
+        checked_out = self.connection is not None
+        super().close()
+        if checked_out and self.pool:
+            observe_db_pool(self.alias, self.pool.pop_stats())
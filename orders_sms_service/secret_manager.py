@@ -0,0 +1,21 @@
+"""Secrets from Google Secret Manager, fetched once per process.
+
+The client library brings in grpc and protobuf, which take longer to import
+than the rest of startup. It is imported on the first lookup rather than with
+the settings, so processes that never read a secret don't pay for it.
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def client():
+    from google.cloud import secretmanager
+
+    return secretmanager.SecretManagerServiceClient()
+
+
+@lru_cache(maxsize=None)
+def get_secret(secret_id, project_id, version='latest'):
+    """The secret's value as text. Raises the client's error if it can't be read."""
+    name = f'projects/{project_id}/secrets/{secret_id}/versions/{version}'
+    return client().access_secret_version(name=name).payload.data.decode('UTF-8')
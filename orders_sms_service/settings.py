@@ -3,7 +3,8 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 import dj_database_url
-from google.cloud import secretmanager
+from orders_sms_service.postgresql import pooled
+from orders_sms_service.secret_manager import get_secret
 
 # Load environment variables
 load_dotenv()
@@ -61,6 +62,12 @@ OIDC_RP_SIGN_ALGO = 'RS256'
 OIDC_OP_JWKS_ENDPOINT = 'https://dev-qlfgtecl6j1fbku7.us.auth0.com/.well-known/jwks.json'
 OIDC_REDIRECT_URL = 'http://localhost:8000/oidc/callback/'
 OIDC_OP_LOGOUT_URL = 'dev-qlfgtecl6j1fbku7.us.auth0.com/v2/logout/'
+# Bearer tokens on the API (orders_mgmt.authentication.CachedOIDCAuthentication)
+OIDC_TOKEN_CACHE_TTL = int(os.getenv('OIDC_TOKEN_CACHE_TTL', '600'))  # cap on how long a verified token is trusted
+OIDC_TOKEN_AUDIENCE = os.getenv('OIDC_TOKEN_AUDIENCE')  # checked against the JWT aud claim when set
+OIDC_TOKEN_LEEWAY = int(os.getenv('OIDC_TOKEN_LEEWAY', '30'))  # clock skew allowed on exp/nbf, seconds
+OIDC_JWKS_CACHE_TTL = int(os.getenv('OIDC_JWKS_CACHE_TTL', '3600'))
+OIDC_JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('OIDC_JWKS_MIN_REFRESH_INTERVAL', '60'))
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/oidc/authenticate/'
@@ -69,20 +76,115 @@ AFRICASTALKING_USERNAME = 'sandbox'
 AFRICASTALKING_API_KEY = os.getenv('AFRICASTALKING_API_KEY')
 MESSAGING_URL = os.getenv('AFRICASTALKING_MESSAGING_URL')
 
+# Largest list accepted by POST /api/orders/bulk/
+ORDERS_BULK_MAX_SIZE = int(os.getenv('ORDERS_BULK_MAX_SIZE', '5000'))
+# Rows fetched per round trip (and per streamed chunk) by /api/orders/export/
+ORDERS_EXPORT_CHUNK_SIZE = int(os.getenv('ORDERS_EXPORT_CHUNK_SIZE', '2000'))
+# Where `manage.py archive_orders` writes orders moved out of the table, read back by /api/orders/archived/.
+# No default: it must be durable storage outside the app tree, which is ephemeral on App Engine/Cloud Run
+ORDERS_ARCHIVE_DIR = os.getenv('ORDERS_ARCHIVE_DIR', '')
+# Admin changelists of tables with more rows than this (by PostgreSQL's estimate) show the estimate instead of COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '100000'))
+
+# PostgreSQL: a psycopg 3 connection pool per process (orders_sms_service/postgresql), see /metrics db_pool_*
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'true').lower() == 'true'
+DATABASE_POOL_MIN_SIZE = int(os.getenv('DATABASE_POOL_MIN_SIZE', '1'))  # kept open per process, even when idle
+DATABASE_POOL_MAX_SIZE = int(os.getenv('DATABASE_POOL_MAX_SIZE', '4'))
+DATABASE_POOL_TIMEOUT = float(os.getenv('DATABASE_POOL_TIMEOUT', '10'))  # seconds to wait for a connection before the request fails
+DATABASE_HEALTH_CHECKS = os.getenv('DATABASE_HEALTH_CHECKS', 'true').lower() == 'true'  # test a connection before reusing it
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '600'))  # persistent connections when the pool is off
+# Read-only copy for the order and customer API's safe reads (orders_mgmt/replica.py)
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL', '')
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))  # a client reads from the primary this long after a write
+
+# SMS gateway HTTP client (orders_mgmt.gateway)
+SMS_GATEWAY_CONNECT_TIMEOUT = float(os.getenv('SMS_GATEWAY_CONNECT_TIMEOUT', '3.05'))
+SMS_GATEWAY_READ_TIMEOUT = float(os.getenv('SMS_GATEWAY_READ_TIMEOUT', '10'))
+SMS_GATEWAY_MAX_RETRIES = int(os.getenv('SMS_GATEWAY_MAX_RETRIES', '3'))
+SMS_GATEWAY_BACKOFF_BASE = float(os.getenv('SMS_GATEWAY_BACKOFF_BASE', '0.5'))
+SMS_GATEWAY_BACKOFF_MAX = float(os.getenv('SMS_GATEWAY_BACKOFF_MAX', '8'))
+SMS_GATEWAY_POOL_SIZE = int(os.getenv('SMS_GATEWAY_POOL_SIZE', '10'))
+
+# Outbound SMS queue, drained by `python manage.py send_sms`
+SMS_MAX_ATTEMPTS = int(os.getenv('SMS_MAX_ATTEMPTS', '5'))
+SMS_CLAIM_TIMEOUT = int(os.getenv('SMS_CLAIM_TIMEOUT', '300'))  # seconds before a stuck 'sending' row is retried
+SMS_WORKER_POLL_INTERVAL = float(os.getenv('SMS_WORKER_POLL_INTERVAL', '2'))
+SMS_BATCH_SIZE = int(os.getenv('SMS_BATCH_SIZE', '100'))
+SMS_BATCH_MAX_WAIT = float(os.getenv('SMS_BATCH_MAX_WAIT', '1'))  # seconds to wait for a batch to fill
+# /api/orders/async/ sends the confirmation from the event loop instead of leaving it to the worker
+SMS_ASYNC_INLINE_SEND = os.getenv('SMS_ASYNC_INLINE_SEND', 'true').lower() == 'true'
+# MessageTemplate language used when a customer's language has no variant
+SMS_DEFAULT_LANGUAGE = os.getenv('SMS_DEFAULT_LANGUAGE', 'en')
+SMS_TEMPLATE_CACHE_TTL = float(os.getenv('SMS_TEMPLATE_CACHE_TTL', '60'))  # seconds a worker keeps a compiled template
+# Bearer token required by /metrics (orders_mgmt.metrics); multi-worker totals need PROMETHEUS_MULTIPROC_DIR
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # every scrape is refused while unset
+SMS_WORKER_METRICS_PORT = int(os.getenv('SMS_WORKER_METRICS_PORT', '0'))  # send_sms serves its metrics here; 0 turns it off
+# Per-worker cache of customers looked up by code (orders_mgmt.customer_cache)
+CUSTOMER_CACHE_SIZE = int(os.getenv('CUSTOMER_CACHE_SIZE', '10000'))  # customers kept per worker
+CUSTOMER_CACHE_TTL = float(os.getenv('CUSTOMER_CACHE_TTL', '30'))  # seconds; bounds staleness after edits in other workers
+# Country code for numbers entered in national format, e.g. 0712345678 (orders_mgmt.phone)
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv('PHONE_DEFAULT_COUNTRY_CODE', '254')
+# Delivery reports posted by the gateway to /api/sms/delivery-reports/?token=<SMS_DELIVERY_REPORT_TOKEN>
+SMS_DELIVERY_REPORT_TOKEN = os.getenv('SMS_DELIVERY_REPORT_TOKEN', '')  # the endpoint rejects every report while unset
+SMS_DELIVERY_BATCH_SIZE = int(os.getenv('SMS_DELIVERY_BATCH_SIZE', '500'))  # buffered reports that trigger a flush
+SMS_DELIVERY_FLUSH_INTERVAL = float(os.getenv('SMS_DELIVERY_FLUSH_INTERVAL', '1'))  # seconds; 0 applies each report at once
+SMS_DELIVERY_REPORT_MAX_AGE = int(os.getenv('SMS_DELIVERY_REPORT_MAX_AGE', '300'))  # seconds to retry a report for an unknown message id
+
+# Idempotency-Key on order-creating POSTs (orders_mgmt.idempotency)
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))  # seconds a key replays its response
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '10'))  # wait for a duplicate in flight before 409
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '60'))  # an unfinished claim older than this is abandoned
+
+
+# Shared by all workers (throttle counters, verified OIDC tokens). CACHE_BACKEND is database
+# (the django_cache table, created by migration), file (a directory on a shared disk) or locmem.
+CACHE_BACKENDS = {
+    'database': ('orders_mgmt.cache.DatabaseCache', 'django_cache'),
+    'file': ('orders_mgmt.cache.FileBasedCache', '/tmp/orders_sms_cache'),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'database')
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '100000'))  # past this, live entries are culled too
+CACHE_PURGE_INTERVAL = int(os.getenv('CACHE_PURGE_INTERVAL', '60'))  # seconds between purges of expired entries, per process
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        # Django culls a third of the cache, live entries included, past 300 by default, which would reset
+        # throttle counters and drop cached tokens and replica pins. orders_mgmt.cache purges expired
+        # entries every PURGE_INTERVAL, so MAX_ENTRIES only has to cover the live ones.
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES, 'PURGE_INTERVAL': CACHE_PURGE_INTERVAL},
+    },
+}
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'mozilla_django_oidc.contrib.drf.OIDCAuthentication',
+        'orders_mgmt.authentication.CachedOIDCAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_THROTTLE_CLASSES': ['rest_framework.throttling.UserRateThrottle'],
-    'DEFAULT_THROTTLE_RATES': {'user': '100/hour'}
+    # orjson for JSON responses; list endpoints then skip the serializers (FastListMixin)
+    'DEFAULT_RENDERER_CLASSES': [
+        'orders_mgmt.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Sliding-window limits counted in the shared cache; views pick a rate with throttle_scope
+    'DEFAULT_THROTTLE_CLASSES': ['orders_mgmt.throttling.SlidingWindowThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.getenv('API_USER_THROTTLE_RATE', '100/hour'),
+        'orders': os.getenv('API_ORDERS_THROTTLE_RATE', os.getenv('API_USER_THROTTLE_RATE', '100/hour')),
+        'customers': os.getenv('API_CUSTOMERS_THROTTLE_RATE', os.getenv('API_USER_THROTTLE_RATE', '100/hour')),
+    },
+    # List endpoints use cursor pagination (orders_mgmt/pagination.py); ?page_size= overrides
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
+# PAGE_SIZE is used by the per-view pagination classes rather than a DEFAULT_PAGINATION_CLASS
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
 
 MIDDLEWARE = [
+    'orders_mgmt.metrics.metrics_middleware',  # first, so its timings cover the other middleware
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -125,6 +227,9 @@ WSGI_APPLICATION = 'orders_sms_service.wsgi.application'
 #         }
 #     }
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'SEC')
+SECRET_MANAGER_PROJECT = os.getenv('SECRET_MANAGER_PROJECT', '')  # read unset secrets from this GCP project
+if SECRET_MANAGER_PROJECT and 'DJANGO_SECRET_KEY' not in os.environ:
+    SECRET_KEY = get_secret('DJANGO_SECRET_KEY', SECRET_MANAGER_PROJECT)
 
 
 if not DEBUG:
@@ -132,9 +237,25 @@ if not DEBUG:
     DATABASES = {
         'default': dj_database_url.config(
             default=database_url,
-            conn_max_age=600,
+            conn_max_age=DATABASE_CONN_MAX_AGE,
+            conn_health_checks=DATABASE_HEALTH_CHECKS,
         )
     }
+    if DATABASE_REPLICA_URL:
+        DATABASES['replica'] = dj_database_url.parse(
+            DATABASE_REPLICA_URL,
+            conn_max_age=DATABASE_CONN_MAX_AGE,
+            conn_health_checks=DATABASE_HEALTH_CHECKS,
+            test_options={'MIRROR': 'default'},  # tests read the primary through it
+        )
+    if DATABASE_POOL:
+        for alias in DATABASES:
+            DATABASES[alias] = pooled(
+                DATABASES[alias],
+                min_size=DATABASE_POOL_MIN_SIZE,
+                max_size=DATABASE_POOL_MAX_SIZE,
+                timeout=DATABASE_POOL_TIMEOUT,
+            )
 else:
     DATABASES = {
         'default': {
@@ -142,20 +263,10 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+# Writes and transactions on the primary; safe API reads on the replica when there is one
+DATABASE_ROUTERS = ['orders_mgmt.replica.ReplicaRouter']
 
 
-# def get_secret_value(secret_id, project_id="sms-service-474413"):
-#     """Fetches a secret from Secret Manager."""
-#     try:
-#         client = secretmanager.SecretManagerServiceClient()
-#         name = f"projects/{project_id}/secrets/{secret_id}/versions/latest"
-#         response = client.access_secret_version(name=name)
-#         return response.payload.data.decode('UTF-8')
-#     except Exception as e:
-#         # Handling error appropriately (e.g., fallback or raise)
-#         print(f"Failed to fetch secret '{secret_id}': {e}")
-#         return None
-
 # # Check if running on Google Cloud App Engine
 # if os.getenv('GAE_APPLICATION') or os.getenv('GAE_ENV') == 'standard':
 #     # Production settings on App Engine
@@ -3,11 +3,13 @@
 
 from django.contrib import admin
 from django.urls import path, include
+from orders_mgmt.metrics import metrics_view
 from orders_mgmt.views import index
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('orders_mgmt.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', index, name='index'),
     path('oidc/', include('mozilla_django_oidc.urls')),
 ]